@@ -0,0 +1,106 @@
+"""
+Async MySQL access for the ASGI entry point (asgi.py), on aiomysql.
+
+Same database, credentials and pool sizing env vars as db.py. The pool
+is created lazily inside the running event loop.
+"""
+import asyncio
+import os
+import ssl
+import time
+
+import aiomysql
+from dotenv import load_dotenv
+load_dotenv()
+
+import metrics
+from db import columns_from_rows, query_key
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+def _ssl_context():
+    # Same as db.py's ssl={"ssl": {}}: TLS on, no CA pinned
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+async def get_pool():
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await aiomysql.create_pool(
+                    host=os.getenv("DB_HOST"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASS"),
+                    port=int(os.getenv("DB_PORT")),
+                    db=os.getenv("DB_NAME"),
+                    cursorclass=aiomysql.DictCursor,
+                    autocommit=True,
+                    ssl=_ssl_context(),
+                    minsize=1,
+                    maxsize=int(os.getenv("DB_POOL_SIZE", 10)),
+                    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+                )
+    return _pool
+
+
+# key → Task of the query currently in flight (see db.SingleFlight)
+_in_flight = {}
+
+
+async def _single_flight(key, make_coro):
+    task = _in_flight.get(key)
+    if task is None:
+        task = _in_flight[key] = asyncio.ensure_future(make_coro())
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: one caller going away must not cancel the query for the rest
+    return await asyncio.shield(task)
+
+
+async def _fetch(sql, args, mode):
+    """mode: 'one' / 'all' (dict rows) or 'columns' (tuple rows → db.columns_from_rows)."""
+    pool = await get_pool()
+    start = time.perf_counter()
+    cursorclass = aiomysql.Cursor if mode == "columns" else aiomysql.DictCursor
+    async with pool.acquire() as conn, conn.cursor(cursorclass) as cur:
+        acquired = time.perf_counter()
+        metrics.acquire_seconds.observe(acquired - start)
+        metrics.record("acquire", acquired - start)
+
+        await cur.execute(sql, args)
+        result = await (cur.fetchone() if mode == "one" else cur.fetchall())
+        description = cur.description
+
+    rows = (result is not None) if mode == "one" else len(result)
+    metrics.observe_query(sql, time.perf_counter() - acquired, rows)
+
+    if mode == "columns":
+        with metrics.timed("parse", metrics.parse_seconds, "columns"):
+            result = columns_from_rows(description, result)
+    return result
+
+
+async def fetch_all(sql, args=None):
+    return await _single_flight(("all",) + query_key(sql, args), lambda: _fetch(sql, args, "all"))
+
+
+async def fetch_one(sql, args=None):
+    return await _single_flight(("one",) + query_key(sql, args), lambda: _fetch(sql, args, "one"))
+
+
+async def fetch_columns(sql, args=None):
+    """{name: ndarray} like db.fetch_columns(); the arrays are shared, so don't write to them."""
+    return await _single_flight(("columns",) + query_key(sql, args), lambda: _fetch(sql, args, "columns"))
+
+
+async def close():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
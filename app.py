@@ -1,16 +1,41 @@
-from flask import Flask, render_template, jsonify, request
-from db import connect_db
+from flask import Flask, Response, render_template, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from db import pool_stats, fetch_all, fetch_one, fetch_columns, run_parallel
+from series import investments, historical_roi
+import kpis
+import downsample
+import deploy_history
+import archive
+from rollups import portfolio_rollups
+import rolling
+import resample
+from conditional import conditional
+import columnar
+from cache import cache, watermarks
+import live
+import metrics
 from decimal import Decimal
-import pymysql
+import json
+import os
 from datetime import datetime, timezone, timedelta
 import pytz
 from dotenv import load_dotenv
-from math import floor
+from math import floor, ceil
+import time
+import queue
 import numpy as np
 load_dotenv()
 
 
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with metrics.timed("serialize", metrics.serialize_seconds, "json"):
+            return super().dumps(obj, **kwargs)
+
+
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
+metrics.init_app(app)
 
 
 # ============ HELPERS ==========================================
@@ -94,43 +119,102 @@ def fmt_currency(v):
     return f"${v:,.2f}"
 
 
-def get_daily_closes(tz):
-    connection = connect_db()
-    phx = pytz.timezone("America/Phoenix")
-    utc = pytz.UTC
+def finite_or_none(values):
+    """Float array → list with NaN as None (JSON has no NaN)."""
+    return [None if v != v else v for v in values.tolist()]
+
+
+def utc_days_ago(days):
+    """Naive UTC cutoff, comparable with timestamp_utc values from MySQL."""
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+
+def epoch_days_ago(days):
+    """First whole epoch second inside the last `days` days."""
+    return ceil(time.time() - days * kpis.DAY)
+
+
+# ---------- Validators for conditional GET ----------
+def investments_version(*_):
+    """Watermark + row count of investments_timeseries (one cheap tail query at most)."""
+    investments.refresh()
+    return (investments.watermark, len(investments)), investments.watermark
+
+
+PORTFOLIO_STATS_VERSION_SQL = """
+    SELECT d.id,
+           (SELECT MAX(h.timestamp_utc)
+            FROM portfolio_history h
+            WHERE h.deploy_id = d.id) AS snap_ts
+    FROM deploys d
+    ORDER BY d.timestamp_utc DESC
+    LIMIT 1
+"""
+
+
+def portfolio_stats_validator(row):
+    if not row:
+        return None, None
+    return (row["id"], row["snap_ts"]), row["snap_ts"]
+
+
+def portfolio_stats_version(*_):
+    """Latest deploy id + its latest snapshot time."""
+    return portfolio_stats_validator(fetch_one(PORTFOLIO_STATS_VERSION_SQL))
+
 
-    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-        cursor.execute("""
-            SELECT timestamp_utc, portfolio_value
-            FROM investments_timeseries
-            WHERE timestamp_utc >= NOW() - INTERVAL 8 DAY
-            ORDER BY timestamp_utc ASC
-        """)
-        rows = cursor.fetchall()
+DEPLOY_HISTORY_VERSION_SQL = """
+    SELECT MAX(timestamp_utc) AS snap_ts
+    FROM portfolio_history
+    WHERE deploy_id = %s
+"""
 
-    # Group by day → pick last row of each day
-    daily = {}
-    for r in rows:
-        ts_utc = r["timestamp_utc"]
 
-        if ts_utc.tzinfo is None:
-            ts_utc = utc.localize(ts_utc)
+def deploy_history_validator(deploy_id, row):
+    snap_ts = row["snap_ts"] if row else None
+    return (deploy_id, snap_ts), snap_ts
 
-        ts_local = ts_utc.astimezone(tz)
-        day_key = ts_local.strftime("%Y-%m-%d")
-        daily[day_key] = r  # overwrite → ensures last row of day is the close
 
-    # Convert to sorted list, newest first
-    sorted_days = sorted(daily.items(), key=lambda x: x[0], reverse=True)
+def rolling_version(*_):
+    """The fund's investments version, or one deploy's latest snapshot time."""
+    deploy_id = request.args.get("deploy", None, type=int)
+    if deploy_id is None:
+        return investments_version()
+    return deploy_history_validator(deploy_id, fetch_one(DEPLOY_HISTORY_VERSION_SQL, (deploy_id,)))
+
+
+def investments_watermark():
+    investments.refresh()
+    return investments.watermark
+
+
+def historical_roi_watermark():
+    historical_roi.refresh()
+    return historical_roi.watermark
+
+
+# Cache keys follow these instead of a MAX(timestamp_utc) per table
+watermarks.register("investments_timeseries", investments_watermark, min_interval=0)
+watermarks.register("historical_roi", historical_roi_watermark, min_interval=0)
+watermarks.register("portfolio_history", lambda: portfolio_stats_version()[0])
+
+
+@cache.memoize(ttl=300, sources=["investments_timeseries"])
+def get_daily_closes(tz):
+    phx = pytz.timezone("America/Phoenix")
+
+    # Last tick of each local day → the close
+    days = resample.ohlc(portfolio_rollups, kpis.DAY, tz, since=epoch_days_ago(8))
+    closes = days["close"].tolist()[::-1]        # newest first
+    last_ts = days["last_ts"].tolist()[::-1]
 
     results = []
-    for idx, (day_key, rec) in enumerate(sorted_days):
-        ts = rec["timestamp_utc"].astimezone(phx)
-        value = rec["portfolio_value"]
+    for idx, (value, close_ts) in enumerate(zip(closes, last_ts)):
+        ts = datetime.fromtimestamp(close_ts, timezone.utc).astimezone(phx)
 
         # Compute percent change vs previous day
-        if idx + 1 < len(sorted_days):
-            prev_value = sorted_days[idx + 1][1]["portfolio_value"]
+        if idx + 1 < len(closes):
+            prev_value = closes[idx + 1]
             pct_change = ((value - prev_value) / prev_value) * 100 if prev_value else 0
         else:
             pct_change = 0
@@ -146,197 +230,99 @@ def get_daily_closes(tz):
     return results[:7]   # 7 most recent days
 
 
+@cache.memoize(ttl=300, sources=["investments_timeseries"])
 def get_daily_earnings():
-    connection = connect_db()
     phx = pytz.timezone("America/Phoenix")
 
-    with connection.cursor(pymysql.cursors.DictCursor) as cursor:
-        cursor.execute("""
-            SELECT timestamp_utc, portfolio_value
-            FROM investments_timeseries
-            WHERE timestamp_utc >= NOW() - INTERVAL 30 DAY
-            ORDER BY timestamp_utc ASC
-        """)
-        rows = cursor.fetchall()
-
-    # Group closes by day
-    closes = {}
-    for r in rows:
-        ts = r["timestamp_utc"].astimezone(phx)
-        day_key = ts.strftime("%Y-%m-%d")
-        closes[day_key] = r["portfolio_value"]  # last value becomes daily close
-
-    # Convert to list sorted oldest → newest
-    day_items = sorted(closes.items())
+    # Phoenix-day closes, oldest → newest
+    days = resample.ohlc(portfolio_rollups, kpis.DAY, phx, since=epoch_days_ago(30))
 
     earnings = []
     prev_val = None
 
-    for day, value in day_items:
+    for bucket, value in zip(days["bucket"].tolist(), days["close"].tolist()):
         if prev_val is not None:
             earnings.append({
-                "day": day,
-                "earn": value - prev_val
+                "day": resample.bucket_label(bucket, kpis.DAY),
+                "earn": round(value - prev_val, 2)   # cents, as the DECIMAL column had it
             })
         prev_val = value
     return earnings[-7:]  # last 7 days for chart
 
 
+def dashboard_snapshot(tz):
+    """
+    Everything the index dashboard needs, in one pass.
+
+    The series store is brought up to date once (a single tail query at
+    most), then the latest row, today's first row, the daily closes and
+    the daily earnings are all derived from memory — the 8-day closes and
+    the 30-day earnings come out of the same rollups instead of two scans.
+    """
+    investments.refresh()
+
+    midnight_utc = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    return {
+        "latest": investments.latest(),
+        "midnight": investments.first_at_or_after(midnight_utc.replace(tzinfo=None)),
+        "daily_closes": get_daily_closes(tz=tz),
+        "earnings": get_daily_earnings(),
+    }
+
+
 # ============ PAGES ==========================================
 
 
+START_TIME = datetime(2025, 11, 22, 6, 0, 0, tzinfo=timezone.utc)
+
+
+def fund_kpi_result():
+    """The /kpis payload, or None while there are fewer than two ticks."""
+    ts, cols = investments.arrays()
+
+    if len(ts) < 2:
+        return None
+
+    daily = portfolio_rollups.ohlc(kpis.DAY)
+    return kpis.fund_kpis(ts, cols["portfolio_value"], START_TIME, closes=daily["close"])
+
+
+# One watcher pushes new ticks + KPI changes to every /api/stream client
+live_feed = live.LiveFeed(investments, fund_kpi_result, interval=investments.min_interval)
+
+# Under WSGI every open stream pins a worker thread, so dashboards only
+# subscribe with LIVE_UPDATES=1; asgi.py turns it on (streams cost no thread there)
+app.config["LIVE_UPDATES"] = os.getenv("LIVE_UPDATES") == "1"
+
+
 @app.route("/kpis")
+@conditional(investments_version)
 def get_kpis():
-    connection = connect_db()
-    with connection.cursor(pymysql.cursors.DictCursor) as cur:
-        cur.execute("""
-            SELECT timestamp_utc, portfolio_value
-            FROM investments_timeseries
-            ORDER BY timestamp_utc ASC
-        """)
-        rows = cur.fetchall()
-
-    if len(rows) < 2:
-        return jsonify({"error": "Not enough data"}), 400
+    result = fund_kpi_result()
 
-    # Convert timestamps to aware UTC
-    for r in rows:
-        r["timestamp_utc"] = r["timestamp_utc"].replace(tzinfo=timezone.utc)
-
-    ts = [r["timestamp_utc"] for r in rows]
-    eq = [float(r["portfolio_value"]) for r in rows]
-
-    first_eq = eq[0]
-    last_eq = eq[-1]
-    now_ts = ts[-1]
-
-    # -------------------------------
-    # Helper: get equity at/before time
-    # -------------------------------
-    def equity_at_or_before(target):
-        prior = [r for r in rows if r["timestamp_utc"] <= target]
-        return float(prior[-1]["portfolio_value"]) if prior else None
-
-    # ======================
-    # 1. Runtime (Days)
-    # ======================
-    START_TIME = datetime(2025, 11, 22, 6, 0, 0, tzinfo=timezone.utc)
-    runtime_days = max(0, int((now_ts - START_TIME).total_seconds() // 86400))
-
-    # ======================
-    # 2. Daily Return %
-    # ======================
-    ts_24h = now_ts - timedelta(hours=24)
-    eq_24h = equity_at_or_before(ts_24h)
-
-    total_return_pct = (last_eq / first_eq - 1) * 100
-    eff_total_return_pct = (last_eq / 20000 - 1) * 100
-
-    total_return = last_eq - first_eq
-    eff_total_return = last_eq - 20000
-
-    dpr = total_return_pct / runtime_days if runtime_days > 0 else None
-
-    # ======================
-    # 3. Weekly Return %
-    # ======================
-    ts_7d = now_ts - timedelta(days=7)
-    eq_7d = equity_at_or_before(ts_7d)
-    wpr = dpr * 7 if dpr is not None else None
-
-    # ======================
-    # 4. Annual Percentage Return
-    # ======================
-    total_days = (now_ts - ts[0]).total_seconds() / 86400
-    apr = ((last_eq / first_eq) ** (365 / total_days) - 1) * 100 if total_days > 0 else None
-
-    # ======================
-    # 4. Max Drawdown (%)
-    # ======================
-    running_max = eq[0]
-    max_dd = 0.0
-
-    for value in eq:
-        running_max = max(running_max, value)
-        dd = (value - running_max) / running_max   # negative %
-        max_dd = min(max_dd, dd)
-
-    max_dd_pct = max_dd * 100
-
-    # ======================
-    # 5. Returns This Week (Dollars)
-    # ======================
-    weekday = now_ts.weekday()   # Monday=0 ... Sunday=6
-    sunday_offset = (weekday + 1) % 7
-
-    # Sunday 00:00 UTC
-    sunday_start = datetime(
-        now_ts.year, now_ts.month, now_ts.day,
-        tzinfo=timezone.utc
-    ) - timedelta(days=sunday_offset, hours=now_ts.hour, minutes=now_ts.minute)
-
-    eq_sunday = equity_at_or_before(sunday_start)
-    rtw_dollars = last_eq - eq_sunday if eq_sunday else None
-
-    # -------------------------------------------
-    # LOWEST DAILY RETURN (LDR)
-    # -------------------------------------------
-
-    # Build day → last equity of that day
-    by_day = {}
-    for t, e in zip(ts, eq):
-        day = t.date()
-        by_day[day] = e  # last value for the day
-
-    # Sort by date
-    daily_vals = [by_day[d] for d in sorted(by_day.keys())]
-
-    daily_returns = []
-    for i in range(1, len(daily_vals)):
-        dr = (daily_vals[i] / daily_vals[i - 1] - 1) * 100
-        daily_returns.append(dr)
-
-    lowest_daily_return = min(daily_returns) if daily_returns else None
-
-    # ======================
-    # 6. Returns This Month (Dollars)
-    # ======================
-    month_start = datetime(now_ts.year, now_ts.month, 1, tzinfo=timezone.utc)
-    eq_month = equity_at_or_before(month_start)
-    rtm_dollars = last_eq - eq_month if eq_month else None
-
-    print(runtime_days)
+    if result is None:
+        return jsonify({"error": "Not enough data"}), 400
 
-    return jsonify({
-        "runtime_days": runtime_days,
-        "dpr_pct": dpr,
-        "wpr_pct": wpr,
-        "apr_pct": apr,
-        "rtw_dollars": rtw_dollars,
-        "rtm_dollars": rtm_dollars,
-        "equity": last_eq,
-        "lowest_daily_return": lowest_daily_return,
-        "eff_total_return_pct": eff_total_return_pct,
-        "eff_total_return": eff_total_return
-    })
+    return jsonify(result)
 
 
 # dashboards
 @app.route('/')
 @app.route("/index")
 def index():
+    tz_arg = request.args.get("tz", "phx")   # default Phoenix
 
-    conn = connect_db()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    cursor.execute("""
-        SELECT invested_value, portfolio_value, total_returns
-        FROM investments_timeseries
-        ORDER BY timestamp_utc DESC
-        LIMIT 1
-    """)
+    if tz_arg == "utc":
+        tz = pytz.UTC
+    else:
+        tz = pytz.timezone("America/Phoenix")
 
-    row = cursor.fetchone()
+    snap = dashboard_snapshot(tz)
+    row = snap["latest"]
+    midnight_row = snap["midnight"]
+    daily_closes = snap["daily_closes"]
+    earnings = snap["earnings"]
 
     # Default values
     invested = 0.0
@@ -352,20 +338,6 @@ def index():
         if invested > 0:
             return_rate = (portfolio - invested) / invested * 100
 
-    # Determine today's midnight (UTC)
-    now = datetime.now(timezone.utc)
-    midnight_utc = now.replace(hour=0, minute=0, second=0, microsecond=0)
-
-    cursor.execute("""
-        SELECT portfolio_value
-        FROM investments_timeseries
-        WHERE timestamp_utc >= %s
-        ORDER BY timestamp_utc ASC
-        LIMIT 1
-    """, (midnight_utc,))
-
-    midnight_row = cursor.fetchone()
-
     if midnight_row:
         midnight_portfolio = float(midnight_row["portfolio_value"])
         latest_portfolio = float(row["portfolio_value"])
@@ -377,16 +349,6 @@ def index():
         kpi_today_change = 0
         kpi_today_change_pct = 0
 
-    tz_arg = request.args.get("tz", "phx")   # default Phoenix
-
-    if tz_arg == "utc":
-        tz = pytz.UTC
-    else:
-        tz = pytz.timezone("America/Phoenix")
-
-    daily_closes = get_daily_closes(tz=tz)
-    earnings = get_daily_earnings()
-
     # Convert day (YYYY-MM-DD) → 'Dec 02'
     earnings_labels = [
         datetime.strptime(e["day"], "%Y-%m-%d").strftime("%b %d")
@@ -396,8 +358,6 @@ def index():
     # Convert Decimal → float
     earnings_values = [float(e["earn"]) for e in earnings]
 
-    conn.close()
-
     return render_template(
         "components/dashboards/index.html",
         kpi_invested=invested,
@@ -417,384 +377,751 @@ def index():
 
         earnings_data=earnings,
         earnings_labels=earnings_labels,
-        earnings_values=earnings_values
+        earnings_values=earnings_values,
+        live_updates=app.config["LIVE_UPDATES"]
     )
 
 
+def historical_labels(epoch):
+    """Epoch seconds → 'YYYY-MM-DD HH:MM' labels."""
+    stamps = np.datetime_as_string(epoch.astype("datetime64[s]"), unit="m")
+    return np.char.replace(stamps, "T", " ").tolist()
+
+
 @app.route("/historical")
 def historical():
-    conn = connect_db()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    # The chart fetches /api/historical/series as binary columns
+    return render_template(
+        "components/historical/historical.html",
+        wed_summaries=historical_wednesdays(),
+    )
 
-    # ---------- Full series for chart ----------
-    cursor.execute("""
-        SELECT timestamp_utc, cum_roi
-        FROM historical_roi
-        ORDER BY timestamp_utc ASC
-    """)
-    all_rows = cursor.fetchall()
 
-    chart_labels = [
-        row["timestamp_utc"].strftime("%Y-%m-%d %H:%M")
-        for row in all_rows
-    ]
-    chart_values = [float(row["cum_roi"]) for row in all_rows]
+@cache.memoize(ttl=600, sources=["historical_roi"])
+def historical_wednesdays():
+    epoch, cols = historical_roi.arrays()
+    cum_roi = cols["cum_roi"]
 
-    series_payload = {
-        "labels": chart_labels,
-        "values": chart_values,
-    }
+    # Wednesday 19:00 UTC snapshot table (1970-01-01 was a Thursday → weekday 3)
+    weekday = (epoch // kpis.DAY + 3) % 7
+    minute_of_day = (epoch % kpis.DAY) // 60
+    wed = (weekday == 2) & (minute_of_day == 19 * 60)
 
-    # ---------- Wednesday 19:00 UTC snapshot table ----------
-    cursor.execute("""
-        SELECT timestamp_utc, cum_roi
-        FROM historical_roi
-        WHERE WEEKDAY(timestamp_utc) = 2   -- 0=Mon,1=Tue,2=Wed
-          AND HOUR(timestamp_utc) = 19
-          AND MINUTE(timestamp_utc) = 0
-        ORDER BY timestamp_utc ASC
-    """)
-    wed_rows = cursor.fetchall()
-    conn.close()
+    wed_dates = np.datetime_as_string(epoch[wed].astype("datetime64[s]"), unit="D").tolist()
 
     wed_summaries = []
     prev_cum = None
-    for row in wed_rows:
-        cum = float(row["cum_roi"])
+    for date, cum in zip(wed_dates, cum_roi[wed].tolist()):
         week_change = cum - prev_cum if prev_cum is not None else None
 
         wed_summaries.append({
-            "date_utc": row["timestamp_utc"].strftime("%Y-%m-%d"),
+            "date_utc": date,
             "cum_roi": cum,
             "week_change": week_change,
         })
         prev_cum = cum
 
-    return render_template(
-        "components/historical/historical.html",
-        series_payload=series_payload,
-        wed_summaries=wed_summaries,
-    )
+    return wed_summaries
 
 
-@app.route("/deploys")
-def deploys():
-    conn = connect_db()
-    cur = conn.cursor(pymysql.cursors.DictCursor)
+# Columns the deploys table shows (R16..R30 aren't rendered)
+DEPLOYS_TABLE_COLUMNS = ["id", "timestamp_utc"] + [f"R{i}" for i in range(1, 16)]
 
-    cur.execute("SELECT * FROM deploys ORDER BY timestamp_utc ASC")
-    rows = cur.fetchall()
+# Columns /api/deploys can project
+DEPLOY_FIELDS = {"id", "timestamp_utc"} | {f"R{i}" for i in range(1, 31)}
 
-    cur.close()
-    conn.close()
 
-    # rows used for main table; deploys_list used for sidebar
+@app.route("/deploys")
+def deploys():
+    rows = fetch_all(f"""
+        SELECT {", ".join(DEPLOYS_TABLE_COLUMNS)}
+        FROM deploys
+        ORDER BY timestamp_utc ASC
+    """)
+
     return render_template(
         "components/deploys/deploys.html",
         rows=rows,
-        deploys_list=rows,
         show_deploy_sidebar=True
     )
 
 
-@app.route("/deploys/<int:deploy_id>")
-def deploy_detail(deploy_id):
-    conn = connect_db()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    # --- Fetch Deploy Metadata ---
-    cursor.execute("""
+def fetch_deploy(deploy_id):
+    return fetch_one("""
         SELECT *
         FROM deploys
         WHERE id = %s
         LIMIT 1
     """, (deploy_id,))
-    deploy = cursor.fetchone()
 
-    if not deploy:
-        conn.close()
-        return f"Deploy {deploy_id} not found", 404
 
-    # --- Fetch all deploys for sidebar nav (descending so most recent on top) ---
-    cursor.execute("""
-        SELECT id, timestamp_utc
-        FROM deploys
-        ORDER BY timestamp_utc DESC
-    """)
-    deploys_list = cursor.fetchall()
+def fetch_deploys_list():
+    # Descending so most recent on top of the sidebar nav; cached until a new deploy appears
+    return deploy_history.deploy_index.get()
 
-    # --- Fetch Portfolio History Rows (expected ~216 rows) ---
-    cursor.execute("""
-        SELECT *
-        FROM portfolio_history
-        WHERE deploy_id = %s
-        ORDER BY timestamp_utc ASC
-    """, (deploy_id,))
-    rows = cursor.fetchall()
-    conn.close()
-
-    if not rows:
-        # No history rows; render page with empty charts
-        return render_template(
-            "components/deploys/detail.html",
-            deploy=deploy,
-            deploys_list=deploys_list,
-            show_deploy_sidebar=True,
-            timestamps=[],
-            balance=[],
-            roi=[],
-            asset_series={},
-            active_deploy_id=deploy_id,
-        )
 
-    # =============================
-    # Format for charts
-    # =============================
-    timestamps = [r["timestamp_utc"].isoformat() for r in rows]
-    balance = [float(r["portfolio_balance"]) for r in rows]
-    roi = [float(r["portfolio_roi"]) for r in rows]
+DEPLOY_HISTORY_SQL = """
+    SELECT *
+    FROM portfolio_history
+    WHERE deploy_id = %s
+    ORDER BY timestamp_utc ASC
+"""
 
 
-    # --------------------------------------------------------
-    # DEPLOY-LEVEL KPIs
-    # --------------------------------------------------------
+def history_from_columns(cols):
+    """DeployHistory from one deploy's portfolio_history columns, or None if there are no rows."""
+    if not len(cols["timestamp_utc"]):
+        return None
+    return deploy_history.DeployHistory.from_columns(cols)
 
-    # 1. Total Return (%)
-    initial_bal = balance[0]
-    final_bal = balance[-1]
-    total_return_pct = ((final_bal / initial_bal) - 1) * 100 if initial_bal else 0
-    eff_total_returb_pct = ((final_bal / 20000) - 1) * 100 if initial_bal else 0
 
-    # 2. Max Drawdown (%)
-    equity_curve = [1 + r for r in roi]   # synthetic curve
-    running_max = equity_curve[0]
-    max_dd = 0.0
+def fetch_deploy_history(deploy_id):
+    """DeployHistory for one deploy (expected ~216 rows), or None if it has none."""
+    return history_from_columns(fetch_columns(DEPLOY_HISTORY_SQL, (deploy_id,)))
 
-    for v in equity_curve:
-        if v > running_max:
-            running_max = v
-        dd = (v - running_max) / running_max   # negative fraction
-        if dd < max_dd:
-            max_dd = dd
 
-    max_dd_pct = max_dd * 100
+def known_history(deploy_id):
+    """One deploy's DeployHistory from memory or the disk archive, or None."""
+    hit = deploy_history.cached(deploy_id)
+    return hit[1] if hit else archive.load(deploy_id)
 
-    # 3. BTC Performance (%)
-    btc_vals = [float(r["BTC_close"]) for r in rows]
-    btc_perf_pct = ((btc_vals[-1] / btc_vals[0]) - 1) * 100 if btc_vals[0] else 0
 
-    # 4. Volatility (std deviation of ROI curve)
-    roi_floats = np.array([float(x) for x in roi])
-    volatility = float(np.std(roi_floats))
+def known_histories(deploy_ids):
+    """({deploy_id: DeployHistory} from memory / disk, [ids still to fetch])."""
+    histories = {}
+    missing = []
+    for deploy_id in deploy_ids:
+        history = known_history(deploy_id)
+        if history is not None:
+            histories[deploy_id] = history
+        else:
+            missing.append(deploy_id)
+    return histories, missing
 
-    # 5. Stop Losses (-8.5%)
-    STOP_LOSS_TARGET = -0.085
-    stop_loss_count = 0
 
-    for col in [c for c in rows[0].keys() if c.endswith("_roi")]:
-        raw_val = rows[-1][col]
-        normalized = parse_roi_decimal(raw_val)   # → always returns decimal or None
+def deploy_histories_sql(count):
+    return f"""
+        SELECT *
+        FROM portfolio_history
+        WHERE deploy_id IN ({", ".join(["%s"] * count)})
+        ORDER BY deploy_id ASC, timestamp_utc ASC
+    """
 
-        if normalized is None:
-            continue
 
-        # check if it equals -0.085 within tolerance
-        if abs(normalized - STOP_LOSS_TARGET) < 1e-6:
-            stop_loss_count += 1
+def split_histories(cols, deploys_list):
+    """deploy_histories_sql() columns → {deploy_id: DeployHistory}; closed deploys get archived."""
+    # Rows come grouped by deploy_id: cut the columns at each change
+    ids = cols["deploy_id"]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else []
+    ends = np.r_[starts[1:], len(ids)] if len(ids) else []
 
-    # 6. Average ROI (%)
-    avg_roi_pct = float(np.mean(roi_floats)) * 100
+    histories = {}
+    for lo, hi in zip(starts, ends):
+        deploy_id = int(ids[lo])
+        history = deploy_history.DeployHistory.from_columns({k: v[lo:hi] for k, v in cols.items()})
+        if deploy_history.is_closed(deploy_id, deploys_list):
+            archive.store(deploy_id, history)
+        histories[deploy_id] = history
+    return histories
 
-    lowest_roi_pct = min(roi) * 100 if roi else 0
 
+def load_deploy_histories(deploy_ids, deploys_list):
+    """
+    {deploy_id: DeployHistory} for every id with history rows.
 
+    Cached and archived deploys come from memory / disk; whatever is left
+    is fetched in one batched portfolio_history query, and the closed ones
+    among those are archived on the way through.
+    """
+    histories, missing = known_histories(deploy_ids)
+    if missing:
+        cols = fetch_columns(deploy_histories_sql(len(missing)), missing)
+        histories.update(split_histories(cols, deploys_list))
+    return histories
 
-    # ---------------------------------------
-    # DETECT WHICH ASSET ROI COLUMNS ARE REAL
-    # ---------------------------------------
-    # All ROI-like columns except portfolio-level ones
-    roi_columns = [
-        c for c in rows[0].keys()
-        if c.endswith("_roi") and c not in ("portfolio_roi", "portfolio_roi_lev")
-    ]
 
-    asset_series = {}
+@app.route("/deploys/<int:deploy_id>")
+def deploy_detail(deploy_id):
+    hit = deploy_history.cached(deploy_id)
 
-    # Build per-asset series, but only keep columns that have *any* non-null data
-    for col in roi_columns:
-        series = [parse_roi_decimal(r[col]) for r in rows]
-        # keep only non-empty assets (at least one non-None value)
-        if any(v is not None for v in series):
-            asset_name = col.replace("_roi", "").upper()
-            asset_series[asset_name] = series
+    if hit:
+        # Closed deploy: only the sidebar can have changed
+        deploy, _, view = hit
+        deploys_list = fetch_deploys_list()
+    else:
+        history = archive.load(deploy_id)
+
+        # The lookups are independent: run them side by side.
+        # Archived deploys skip the portfolio_history query entirely.
+        deploy, deploys_list, fetched = run_parallel(
+            lambda: fetch_deploy(deploy_id),
+            fetch_deploys_list,
+            lambda: None if history is not None else fetch_deploy_history(deploy_id),
+        )
+
+        if not deploy:
+            return f"Deploy {deploy_id} not found", 404
+
+        if history is None:
+            history = fetched
+        if history is None:
+            # No history rows; render page with empty charts
+            return render_template(
+                "components/deploys/detail.html",
+                deploy=deploy,
+                deploys_list=deploys_list,
+                show_deploy_sidebar=True,
+                timestamps=[],
+                balance=[],
+                roi=[],
+                asset_series={},
+                active_deploy_id=deploy_id,
+            )
+
+        # Charts + KPIs, all from one parse of the rows
+        view = history.view()
+
+        if deploy_history.is_closed(deploy_id, deploys_list):
+            archive.store(deploy_id, history)
+            deploy_history.remember(deploy_id, deploy, history, view)
 
     return render_template(
         "components/deploys/detail.html",
         deploy=deploy,
         deploys_list=deploys_list,
         show_deploy_sidebar=True,
-        timestamps=timestamps,
-        balance=balance,
-        roi=roi,
-        asset_series=asset_series,
-            # NEW KPIs
-        total_return_pct=total_return_pct,
-        max_dd_pct=max_dd_pct,
-        btc_perf_pct=btc_perf_pct,
-        volatility=volatility,
-        stop_loss_count=stop_loss_count,
-        avg_roi_pct=avg_roi_pct,
-        lowest_roi_pct=lowest_roi_pct
-
+        **view,
     )
 
 
 # ============ DATA ==========================================
 
+def timeseries_args(args):
+    """?days / ?max_points / ?method / ?stream / ?chunk_size → tuple. Raises ValueError."""
+    days = int_arg(args, "days")
+    if days is None and args.get("days"):
+        raise ValueError("days must be an integer")
+    max_points = int_arg(args, "max_points")
+    method = args.get("method", "lttb")
+
+    if method not in downsample.METHODS:
+        raise ValueError(f"method must be one of {', '.join(downsample.METHODS)}")
+    if max_points is not None and max_points < 3:
+        raise ValueError("max_points must be >= 3")
+
+    # Streaming mode: ?stream=chunks|rows, emitted as NDJSON
+    stream = args.get("stream", None)
+    chunk_size = int_arg(args, "chunk_size", 5000)
+    if stream not in (None, "chunks", "rows"):
+        raise ValueError("stream must be chunks or rows")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be >= 1")
+    return days, max_points, method, stream, chunk_size
+
+
 @app.route("/api/investments/timeseries")
+@conditional(investments_version, timeseries_args)
 def investments_timeseries():
-    days = request.args.get("days", None)
-
-    conn = connect_db()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-
-    if days:
-        cursor.execute("""
-            SELECT timestamp_utc, invested_value, total_returns, portfolio_value
-            FROM investments_timeseries
-            WHERE timestamp_utc >= NOW() - INTERVAL %s DAY
-            ORDER BY timestamp_utc ASC
-        """, (int(days),))
-    else:
-        cursor.execute("""
-            SELECT timestamp_utc, invested_value, total_returns, portfolio_value
-            FROM investments_timeseries
-            ORDER BY timestamp_utc ASC
-        """)
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    timestamps = []
-    invested = []
-    portfolio = []
-    returns = []
-    pnl = []
-
-    for r in rows:
-        try:
-            ts = r["timestamp_utc"].isoformat()
-            i = float(r["invested_value"])
-            p = float(r["portfolio_value"])
-            t = float(r["total_returns"])
-            d = p - i
+    try:
+        days, max_points, method, stream, chunk_size = timeseries_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    epoch, cols = investments.arrays(since=utc_days_ago(days) if days else None)
+
+    # Downsample on portfolio_value (the line that carries the shape) and
+    # keep the same timestamps for every other column
+    if max_points is not None and len(epoch) > max_points:
+        keep = downsample.select(epoch, cols["portfolio_value"], max_points, method)
+        epoch = epoch[keep]
+        cols = {k: v[keep] for k, v in cols.items()}
+
+    if columnar.wants_binary():
+        # Straight from the typed arrays — no per-row work; bad rows arrive as NaN
+        return columnar.columns_response({
+            "timestamp": columnar.epoch_ms(epoch),
+            "invested_value": cols["invested_value"],
+            "portfolio_value": cols["portfolio_value"],
+            "total_returns": cols["total_returns"],
+            "returns_diff": cols["portfolio_value"] - cols["invested_value"],
+        })
 
-            timestamps.append(ts)
-            invested.append(i)
-            portfolio.append(p)
-            returns.append(t)
-            pnl.append(d)
+    if stream:
+        return Response(stream_timeseries(epoch, cols, stream, chunk_size), mimetype="application/x-ndjson")
 
-        except Exception as e:
-            print("BAD ROW:", r, e)  # Debug output
+    return jsonify(timeseries_columns(epoch, cols))
 
-    return jsonify({
-        "timestamps": timestamps,
-        "invested_value": invested,
-        "portfolio_value": portfolio,
-        "total_returns": returns,
-        "returns_diff": pnl
+
+def timeseries_columns(epoch, cols):
+    invested = cols["invested_value"]
+    portfolio = cols["portfolio_value"]
+    returns = cols["total_returns"]
+
+    # Rows with a NULL in any column are left out
+    ok = ~(np.isnan(invested) | np.isnan(portfolio) | np.isnan(returns))
+
+    return {
+        "timestamps": np.datetime_as_string(epoch[ok].astype("datetime64[s]")).tolist(),
+        "invested_value": invested[ok].tolist(),
+        "portfolio_value": portfolio[ok].tolist(),
+        "total_returns": returns[ok].tolist(),
+        "returns_diff": (portfolio[ok] - invested[ok]).tolist()
+    }
+
+
+def stream_timeseries(epoch, series, mode, chunk_size):
+    """
+    NDJSON generator. mode="chunks": one line per `chunk_size` rows, each
+    shaped like the regular response (concatenate the arrays client-side).
+    mode="rows": one object per row. Only one chunk is ever serialized at a time.
+    """
+    for start in range(0, len(epoch), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        cols = timeseries_columns(epoch[chunk], {k: v[chunk] for k, v in series.items()})
+
+        if mode == "chunks":
+            yield json.dumps(cols) + "\n"
+            continue
+
+        keys = list(cols)
+        yield "".join(
+            json.dumps({"timestamp": row[0], **dict(zip(keys[1:], row[1:]))}) + "\n"
+            for row in zip(*cols.values())
+        )
+
+
+@app.route("/api/stream")
+def api_stream():
+    """
+    Server-Sent Events: `ticks`, `kpis` and `reset` (see live.py).
+    Replaces polling /kpis and /api/investments/timeseries. Holds a worker
+    thread per client; asgi.py serves this path natively without one.
+    """
+    def events():
+        q = live_feed.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"   # keeps proxies from closing an idle stream
+        finally:
+            live_feed.unsubscribe(q)
+
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
     })
 
 
+def daily_closes_args(args):
+    """?from / ?to → (since, until) in UTC, either None. Raises ValueError."""
+    return resample.parse_time(args.get("from"), pytz.UTC), resample.parse_time(args.get("to"), pytz.UTC)
+
+
 @app.route("/api/daily_closes_full")
+@conditional(investments_version, daily_closes_args)
 def api_daily_closes_full():
     """
     Computes full OHLC-style daily metrics from investments_timeseries.
     Uses UTC days.
-    """
 
-    conn = connect_db()
-    cur = conn.cursor(pymysql.cursors.DictCursor)
+      from, to  epoch seconds or ISO-8601 (UTC), `to` exclusive; default: the whole history
+    """
+    try:
+        since, until = daily_closes_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Pull last 90 days of intraday data (adjust if needed)
-    cur.execute("""
-        SELECT timestamp_utc, portfolio_value
-        FROM investments_timeseries
-        WHERE timestamp_utc >= NOW() - INTERVAL 90 DAY
-        ORDER BY timestamp_utc ASC
-    """)
-    rows = cur.fetchall()
-    conn.close()
+    # One running open/high/low/close per day from the rollups' daily level,
+    # so the cost is O(days) whatever the range
+    days = resample.ohlc(portfolio_rollups, kpis.DAY, pytz.UTC, since, until)
 
-    if not rows:
+    if not days["bucket"].size:
         return jsonify([])
 
-    # Attach UTC timezone
-    for r in rows:
-        if r["timestamp_utc"].tzinfo is None:
-            r["timestamp_utc"] = r["timestamp_utc"].replace(tzinfo=timezone.utc)
-
-    # Group rows by day
-    days = {}  # key = YYYY-MM-DD, value = list of floats
-
-    for r in rows:
-        day_key = r["timestamp_utc"].strftime("%Y-%m-%d")
-        days.setdefault(day_key, []).append(float(r["portfolio_value"]))
-
-    # Sort days
-    sorted_days = sorted(days.keys())
-
-    output = []
-    cumulative_pnl = 0.0
-    cumulative_pct = 0.0
-    initial_portfolio = days[sorted_days[0]][0]  # first value of entire dataset
-
-    for day in sorted_days:
-        values = days[day]
-
-        start_balance = values[0]
-        high = max(values)
-        low = min(values)
-        close_balance = values[-1]
-
-        spread_usd = high - low
-        volatility_pct = ((high - low) / start_balance) * 100 if start_balance else 0
-
-        return_usd = close_balance - start_balance
-        roi_pct = (return_usd / start_balance) * 100 if start_balance else 0
-
-        # update cumulative values
-        cumulative_pnl += return_usd
-        cumulative_pct = ((close_balance / initial_portfolio) - 1) * 100
-
-        output.append({
-            "date": day,
-            "start_balance": start_balance,
-            "high": high,
-            "low": low,
-            "close_balance": close_balance,
-            "spread_usd": spread_usd,
-            "volatility_pct": volatility_pct,
-            "return_usd": return_usd,
-            "roi_pct": roi_pct,
-            "cum_pnl_usd": cumulative_pnl,
-            "cum_pnl_pct": cumulative_pct
+    start_balance, high, low, close_balance = days["open"], days["high"], days["low"], days["close"]
+    initial_portfolio = start_balance[0]        # first value of the range
+
+    def pct(num, den):
+        return np.divide(num, den, out=np.zeros_like(num), where=den != 0) * 100
+
+    return_usd = close_balance - start_balance
+    cols = {
+        "start_balance": start_balance,
+        "high": high,
+        "low": low,
+        "close_balance": close_balance,
+        "spread_usd": high - low,
+        "volatility_pct": pct(high - low, start_balance),
+        "return_usd": return_usd,
+        "roi_pct": pct(return_usd, start_balance),
+        "cum_pnl_usd": np.cumsum(return_usd),
+        "cum_pnl_pct": (close_balance / initial_portfolio - 1) * 100,
+    }
+
+    if columnar.wants_binary():
+        return columnar.columns_response({
+            "date": columnar.epoch_ms(days["bucket"]),   # UTC day start
+            **cols,
         })
 
-    return jsonify(output)
+    dates = [resample.bucket_label(b, kpis.DAY) for b in days["bucket"].tolist()]
+    lists = {k: v.tolist() for k, v in cols.items()}
+    return jsonify([
+        {"date": date, **{k: v[i] for k, v in lists.items()}}
+        for i, date in enumerate(dates)
+    ])
+
+
+@app.route("/api/historical/series")
+def api_historical_series():
+    """The historical() chart series on its own, as JSON or binary columns."""
+    epoch, cols = historical_roi.arrays()
+
+    if columnar.wants_binary():
+        return columnar.columns_response({
+            "timestamp": columnar.epoch_ms(epoch),
+            "cum_roi": cols["cum_roi"],
+        })
+
+    return jsonify({
+        "labels": historical_labels(epoch),
+        "values": cols["cum_roi"].tolist(),
+    })
+
+
+@app.route("/api/deploys/<int:deploy_id>/series")
+def api_deploy_series(deploy_id):
+    """The deploy_detail() chart series on their own, as JSON or binary columns."""
+    history = known_history(deploy_id)
+    if history is None:
+        history = fetch_deploy_history(deploy_id)
+        if history is None:
+            return jsonify({"error": f"No history for deploy {deploy_id}"}), 404
+
+    if columnar.wants_binary():
+        return columnar.columns_response(deploy_series_columns(history))
+    return jsonify(deploy_series_payload(history))
+
+
+def deploy_series_columns(history):
+    return {
+        "timestamp": columnar.epoch_ms(history.epoch),
+        "balance": history.balance,
+        "roi": history.roi,
+        # one column per asset, missing values as NaN
+        **{name: np.array(s, dtype=np.float64) for name, s in history.asset_series().items()},
+    }
+
+
+def deploy_series_payload(history):
+    return {
+        "timestamps": [t.isoformat() for t in history.timestamps],
+        "balance": history.balance.tolist(),
+        "roi": history.roi.tolist(),
+        "asset_series": history.asset_series(),
+    }
+
+
+def parse_deploy_cursor(text):
+    """'<epoch>[.<microseconds>]-<id>' → (naive UTC datetime, id). Raises ValueError."""
+    ts, _, deploy_id = text.partition("-")
+    seconds, dot, micros = ts.partition(".")
+    if dot and not (len(micros) == 6 and micros.isdigit()):
+        raise ValueError(f"bad microseconds {micros!r}")
+    dt = datetime.fromtimestamp(int(seconds), timezone.utc).replace(tzinfo=None)
+    return dt.replace(microsecond=int(micros or 0)), int(deploy_id)
+
+
+def deploy_cursor(row):
+    # Keep fractional seconds: `timestamp_utc = %s` must match the row exactly
+    ts = row["timestamp_utc"]
+    micros = f".{ts.microsecond:06d}" if ts.microsecond else ""
+    return f"{kpis.epoch_of(ts)}{micros}-{row['id']}"
+
+
+@app.route("/api/deploys")
+def api_deploys():
+    """
+    Deploys, newest first, one keyset page at a time.
+
+      ?fields=R1,R2      extra columns to return (id and timestamp_utc always are)
+      ?limit=50          page size (max 500)
+      ?after=<cursor>    the `next` value from the previous page
+    """
+    try:
+        sql, args, limit = deploys_page_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(deploys_page_payload(fetch_all(sql, args), limit))
+
+
+def deploys_page_query(params):
+    """Query-string params → (sql, args, limit) for one /api/deploys page. Raises ValueError."""
+    fields = [f.strip() for f in params.get("fields", "").split(",") if f.strip()]
+    bad = [f for f in fields if f not in DEPLOY_FIELDS]
+    if bad:
+        raise ValueError(f"unknown fields: {', '.join(bad)}")
+    columns = ["id", "timestamp_utc"] + [f for f in fields if f not in ("id", "timestamp_utc")]
+
+    try:
+        limit = int(params.get("limit", 50))
+    except ValueError:
+        limit = 50
+    limit = min(max(limit, 1), 500)
+
+    where, args = "", []
+    if params.get("after"):
+        try:
+            ts, deploy_id = parse_deploy_cursor(params["after"])
+        except ValueError:
+            raise ValueError("bad cursor")
+        # Seek past the last row of the previous page instead of OFFSET
+        where = "WHERE timestamp_utc < %s OR (timestamp_utc = %s AND id < %s)"
+        args = [ts, ts, deploy_id]
+
+    sql = f"""
+        SELECT {", ".join(columns)}
+        FROM deploys
+        {where}
+        ORDER BY timestamp_utc DESC, id DESC
+        LIMIT %s
+    """
+    # One extra row tells us whether there is a next page
+    return sql, args + [limit + 1], limit
+
+
+def deploys_page_payload(rows, limit):
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "deploys": [{**r, "timestamp_utc": r["timestamp_utc"].isoformat()} for r in rows],
+        "next": deploy_cursor(rows[-1]) if has_more else None,
+    }
+
+
+def int_arg(args, name, default=None):
+    """args[name] as an int; `default` if missing or not an integer (like Flask's type=int)."""
+    try:
+        return int(args[name])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def deploys_summary_args(args):
+    """?ids=1,2,3 / ?limit=N → (set of ids, limit or None). Raises ValueError."""
+    try:
+        ids = {int(x) for x in args.get("ids", "").split(",") if x.strip()}
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    return ids, int_arg(args, "limit")
+
+
+@app.route("/api/deploys/summary")
+@conditional(portfolio_stats_version, deploys_summary_args)
+def api_deploys_summary():
+    """
+    Deploy-level KPIs for every deploy (or ?ids=1,2,3, or the newest ?limit=N),
+    newest first. History comes from one batched query at most.
+    """
+    try:
+        ids, limit = deploys_summary_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    deploys_list = fetch_deploys_list()
+    selected = select_deploys(deploys_list, ids, limit)
+    histories = load_deploy_histories([d["id"] for d in selected], deploys_list)
+    return jsonify(deploys_summary_payload(selected, histories, deploys_list))
+
+
+def select_deploys(deploys_list, ids, limit):
+    selected = [d for d in deploys_list if not ids or d["id"] in ids]
+    return selected[:limit] if limit else selected
+
+
+def deploys_summary_payload(selected, histories, deploys_list):
+    selected = [d for d in selected if d["id"] in histories]
+    summary = deploy_history.summarize([histories[d["id"]] for d in selected])
+    live_id = deploys_list[0]["id"] if deploys_list else None
+
+    out = []
+    for i, d in enumerate(selected):
+        row = {
+            "id": d["id"],
+            "timestamp_utc": d["timestamp_utc"].isoformat(),
+            "closed": d["id"] != live_id,
+        }
+        for key, values in summary.items():
+            row[key] = values[i].item()
+        out.append(row)
+
+    return {"deploys": out}
+
+
+def ohlc_args(args):
+    """?interval / ?tz / ?from / ?to → (interval, tz, since, until). Raises ValueError."""
+    interval = resample.parse_interval(args.get("interval", "1d"))
+    tz = resample.parse_tz(args.get("tz", "utc"))
+    return interval, tz, resample.parse_time(args.get("from"), tz), resample.parse_time(args.get("to"), tz)
+
+
+@app.route("/api/ohlc")
+@conditional(investments_version, ohlc_args)
+def api_ohlc():
+    """
+    Portfolio value OHLC in local-time buckets.
+
+      interval  15m / 1h / 1d ...         (default 1d)
+      tz        utc / phx / IANA name     (default utc)
+      from, to  epoch seconds or ISO-8601, naive values read in `tz`; `to` is exclusive
+    """
+    try:
+        interval, tz, since, until = ohlc_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    buckets = resample.ohlc(portfolio_rollups, interval, tz, since, until)
+
+    return jsonify({
+        "interval": interval,
+        "tz": str(tz),
+        "start": [resample.bucket_label(k, interval) for k in buckets["bucket"].tolist()],
+        "open": buckets["open"].tolist(),
+        "high": buckets["high"].tolist(),
+        "low": buckets["low"].tolist(),
+        "close": buckets["close"].tolist(),
+        "first_ts": buckets["first_ts"].tolist(),
+        "last_ts": buckets["last_ts"].tolist(),
+        "count": buckets["count"].tolist(),
+    })
+
+
+def rolling_args(args):
+    """?windows / ?days / ?max_points → (windows, days or None, max_points). Raises ValueError."""
+    windows = rolling.parse_windows(args.get("windows"))
+    max_points = int_arg(args, "max_points", 1500)
+    if max_points < 2:
+        raise ValueError("max_points must be >= 2")
+    return windows, int_arg(args, "days"), max_points
+
+
+def rolling_request_args(args):
+    """rolling_args() plus ?deploy → (windows, days, max_points, deploy id or None). Raises ValueError."""
+    windows, days, max_points = rolling_args(args)
+    deploy_id = int_arg(args, "deploy")
+    if deploy_id is None and "deploy" in args:
+        raise ValueError("deploy must be an integer id")
+    return windows, days, max_points, deploy_id
+
+
+@app.route("/api/analytics/rolling")
+@conditional(rolling_version, rolling_request_args)
+def api_analytics_rolling():
+    """
+    Rolling Sharpe / Sortino / volatility / drawdown (see rolling.py).
+
+      windows     comma-separated, e.g. 24h,7d,30d    (default)
+      deploy      a deploy id: its portfolio_balance curve instead of the fund's portfolio_value
+      days        only points from the last N days (windows still look back before that)
+      max_points  evenly spaced points per series    (default 1500)
+    """
+    try:
+        windows, days, max_points, deploy_id = rolling_request_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if deploy_id is not None:
+        history = known_history(deploy_id)
+        if history is None:
+            history = fetch_deploy_history(deploy_id)
+        if history is None:
+            return jsonify({"error": f"no history for deploy {deploy_id}"}), 404
+        # A few hundred rows: built per request, nothing to keep up to date
+        view = rolling.RollingView.of(history.epoch, history.balance)
+    else:
+        view = rolling.fund_rolling.current()
+
+    idx, series = rolling_series(view, windows, days, max_points)
+    if columnar.wants_binary():
+        return columnar.columns_response(rolling_columns(view.epoch[idx], series))
+    return jsonify(rolling_payload(view.epoch[idx], series))
+
+
+def rolling_series(view, windows, days, max_points):
+    """(tick indices, {label: {metric: array}}) for one RollingView."""
+    idx = rolling.select(view.epoch, epoch_days_ago(days) if days else None, max_points)
+    return idx, {label: view.series(seconds, idx) for label, seconds in windows}
+
+
+def rolling_columns(epoch, series):
+    return {
+        "timestamp": columnar.epoch_ms(epoch),
+        **{f"{label}_{k}": v for label, cols in series.items() for k, v in cols.items()},
+    }
+
+
+def rolling_payload(epoch, series):
+    return {
+        "timestamps": np.datetime_as_string(epoch.astype("datetime64[s]")).tolist(),
+        "windows": {
+            label: {k: finite_or_none(v) for k, v in cols.items()}
+            for label, cols in series.items()
+        },
+    }
+
+
+@app.route("/api/db/pool")
+def api_db_pool():
+    return jsonify(pool_stats())
+
+
+@app.route("/api/cache")
+def api_cache():
+    return jsonify(cache.stats())
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 
 @app.route("/api/portfolio_stats")
+@conditional(portfolio_stats_version)
 def api_portfolio_stats():
-    conn = connect_db()
-    cur = conn.cursor(pymysql.cursors.DictCursor)
-
-    # 1 — Get latest deploy record
-    cur.execute("SELECT * FROM deploys ORDER BY timestamp_utc DESC LIMIT 1")
-    deploy = cur.fetchone()
-    if not deploy:
-        conn.close()
-        return jsonify([])
+    return jsonify(portfolio_stats_data())
+
+
+@cache.memoize(ttl=300, sources=["deploys", "portfolio_history"])
+def portfolio_stats_data():
+    # Both lookups key off the latest deploy, so they can run side by side
+    deploy, snap = run_parallel(
+        lambda: fetch_one(LATEST_DEPLOY_SQL),
+        lambda: fetch_one(LATEST_SNAPSHOT_SQL),
+    )
+    return portfolio_stats_payload(deploy, snap)
+
+
+# 1 — Latest deploy record
+LATEST_DEPLOY_SQL = "SELECT * FROM deploys ORDER BY timestamp_utc DESC LIMIT 1"
+
+# 2 — Latest portfolio_history snapshot of that deploy
+LATEST_SNAPSHOT_SQL = """
+    SELECT *
+    FROM portfolio_history
+    WHERE deploy_id = (SELECT id FROM deploys ORDER BY timestamp_utc DESC LIMIT 1)
+    ORDER BY timestamp_utc DESC
+    LIMIT 1
+"""
+
+
+def portfolio_stats_payload(deploy, snap):
+    if not deploy or not snap:
+        return []
 
     # Extract tickers: R1..R30
     tickers = []
@@ -803,20 +1130,6 @@ def api_portfolio_stats():
         if deploy.get(key):
             tickers.append(deploy[key])
 
-    # 2 — Get latest portfolio_history snapshot
-    cur.execute("""
-        SELECT *
-        FROM portfolio_history
-        WHERE deploy_id = %s
-        ORDER BY timestamp_utc DESC
-        LIMIT 1
-    """, (deploy["id"],))
-    snap = cur.fetchone()
-    conn.close()
-
-    if not snap:
-        return jsonify([])
-
     results = []
 
     # 3 — Map p1_roi → ticker from R1, p2_roi → R2, etc.
@@ -842,7 +1155,8 @@ def api_portfolio_stats():
     # Sort best → worst
     results.sort(key=lambda x: (x["roi_pct"] is not None, x["roi_pct"]), reverse=True)
 
-    return jsonify(results)
+    return results
+
 
 
 
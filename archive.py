@@ -0,0 +1,133 @@
+"""
+Immutable on-disk archive of closed deploys.
+
+Once a newer deploy exists, a deploy's portfolio_history can't change, so
+it is written out once as plain column files and read back memory-mapped:
+
+    <DEPLOY_ARCHIVE_DIR>/<database>/<deploy_id>/
+        manifest.json    rows, roi column names, first/last timestamp, files
+        epoch.npy        int64 epoch seconds
+        balance.npy      float64
+        roi.npy          float64
+        btc_close.npy    float64
+        assets.npy       float64, len(roi columns) × rows, NaN = missing
+
+np.load(mmap_mode="r") maps the files instead of reading them, so a
+DeployHistory built from the archive costs no copies and no MySQL.
+Each deploy is written to a temp directory and renamed into place, so a
+reader never sees a half-written archive. <database> is a hash of the
+pool's `source`, so deploy ids from another database (a bench or test
+dataset, a restored dump) never resolve to this one's files.
+
+Backfill every closed deploy with `python archive.py`.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import db
+from deploy_history import DeployHistory
+
+ARCHIVE_DIR = os.getenv(
+    "DEPLOY_ARCHIVE_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "3mfunds", "deploys"),
+)
+
+FORMAT_VERSION = 1
+
+FILES = {
+    "epoch": "epoch.npy",
+    "balance": "balance.npy",
+    "roi": "roi.npy",
+    "btc_close": "btc_close.npy",
+    "matrix": "assets.npy",
+}
+
+
+def _root():
+    # Read per call: benchdata.use_sqlite() swaps db.pool at runtime
+    return os.path.join(ARCHIVE_DIR, hashlib.sha1(db.pool.source.encode()).hexdigest()[:16])
+
+
+def _path(deploy_id):
+    return os.path.join(_root(), str(int(deploy_id)))
+
+
+def _manifest(deploy_id):
+    try:
+        with open(os.path.join(_path(deploy_id), "manifest.json")) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return manifest if manifest.get("version") == FORMAT_VERSION else None
+
+
+def has(deploy_id):
+    return _manifest(deploy_id) is not None
+
+
+def load(deploy_id):
+    """Memory-mapped DeployHistory for a closed deploy, or None if it isn't archived."""
+    manifest = _manifest(deploy_id)
+    if manifest is None:
+        return None
+
+    base = _path(deploy_id)
+    arrays = {
+        field: np.load(os.path.join(base, name), mmap_mode="r")
+        for field, name in FILES.items()
+    }
+    return DeployHistory(columns=manifest["columns"], **arrays)
+
+
+def store(deploy_id, history):
+    """Write a closed deploy's history. Existing archives are left untouched."""
+    if has(deploy_id) or not len(history):
+        return
+
+    root = _root()
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{int(deploy_id)}-", dir=root)
+    try:
+        for field, name in FILES.items():
+            np.save(os.path.join(tmp, name), np.ascontiguousarray(getattr(history, field)))
+
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump({
+                "version": FORMAT_VERSION,
+                "deploy_id": int(deploy_id),
+                "source": db.pool.source,
+                "rows": len(history),
+                "first_ts": int(history.epoch[0]),
+                "last_ts": int(history.epoch[-1]),
+                "columns": list(history.columns),
+                "files": FILES,
+            }, f, indent=2)
+
+        os.rename(tmp, _path(deploy_id))
+    except OSError:
+        # Lost a race with another writer (or the disk said no): keep serving from MySQL
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    from db import fetch_all, query_columns
+
+    deploys = fetch_all("SELECT id FROM deploys ORDER BY timestamp_utc DESC")
+    # The newest deploy is still live
+    for d in deploys[1:]:
+        if has(d["id"]):
+            continue
+        cols = query_columns("""
+            SELECT *
+            FROM portfolio_history
+            WHERE deploy_id = %s
+            ORDER BY timestamp_utc ASC
+        """, (d["id"],))
+        history = DeployHistory.from_columns(cols)
+        store(d["id"], history)
+        print(f"archived deploy {d['id']}: {len(history)} rows")
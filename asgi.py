@@ -0,0 +1,386 @@
+"""
+ASGI entry point:  uvicorn asgi:app
+
+  - One asyncio task per series store keeps it fresh over aiomysql, so the
+    in-memory endpoints (/kpis, /api/investments/timeseries, /api/ohlc,
+    /api/daily_closes_full, index) never wait on MySQL inside a request.
+  - The endpoints that still query per request are served natively on
+    the event loop, with their independent queries gathered concurrently.
+    Cache / archive reads and writes of deploy histories go to a thread.
+  - /api/stream is served natively too: an SSE client is a queue on the
+    event loop rather than a thread.
+  - Everything else goes to the Flask app through asgiref's WsgiToAsgi,
+    on a thread pool of its own (WSGI_THREADS).
+
+The plain WSGI app (app:app) keeps working unchanged.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from urllib.parse import parse_qsl
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.http import http_date, parse_date, parse_etags
+
+import adb
+import app as flask_app
+import columnar
+import deploy_history
+import metrics
+import rolling
+from conditional import representation_etag
+from series import investments, historical_roi
+
+log = logging.getLogger(__name__)
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """
+    WsgiToAsgi runs every request on asgiref's one thread-sensitive thread,
+    so one slow Flask request would hold up all the others. This one runs
+    them side by side on `executor`.
+    """
+
+    def __init__(self, wsgi_application, executor):
+        super().__init__(wsgi_application)
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        instance = WsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)
+        run = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func.__get__(instance)
+        instance.run_wsgi_app = sync_to_async(run, thread_sensitive=False, executor=self.executor)
+        await instance(scope, receive, send)
+
+
+# /api/stream is native here, so dashboards can hold a stream open for free
+flask_app.app.config["LIVE_UPDATES"] = True
+
+wsgi = ThreadedWsgiToAsgi(
+    flask_app.app,
+    ThreadPoolExecutor(int(os.getenv("WSGI_THREADS", 32)), thread_name_prefix="wsgi"),
+)
+
+
+# ============ SERIES FOLLOWER ==========================================
+
+
+async def follow_series(store):
+    while True:
+        try:
+            if not store.leads():
+                # Another worker owns the shared buffers; just map what it published
+                await asyncio.to_thread(store.refresh)
+            elif store.reload_due():
+                # Rare (startup / hourly); the unbuffered loader stays on pymysql
+                await asyncio.to_thread(store.reload)
+            else:
+                sql, args = store.tail_query()
+                store.ingest(await adb.fetch_all(sql, args))
+        except Exception:
+            log.exception("series follower (%s)", store.table)
+
+        # A little under min_interval, so request-side refresh() stays a no-op
+        await asyncio.sleep(store.min_interval * 0.8)
+
+
+# ============ HTTP HELPERS ==========================================
+
+
+class Request:
+    def __init__(self, scope, receive=None):
+        self.receive = receive
+        self.path = scope["path"]
+        self.args = parse_qsl(scope.get("query_string", b"").decode(), keep_blank_values=True)
+        self.headers = {k.decode().lower(): v.decode() for k, v in scope.get("headers", [])}
+
+    def wants_binary(self):
+        return columnar.accepts_binary(dict(self.args).get("format"), self.headers.get("accept"))
+
+
+class HTTPError(Exception):
+    """Raised by a build() to answer with a JSON error instead (no validators)."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+async def send_response_start(send, status, headers=()):
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (k.encode(), v.encode()) for k, v in headers
+    ]})
+
+
+async def send_response(send, status, body=b"", headers=()):
+    await send_response_start(send, status, headers)
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, payload, status=200, headers=()):
+    # sort_keys matches Flask's jsonify output
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    await send_response(send, status, body, [("content-type", "application/json"), *headers])
+
+
+async def send_columns(send, columns, headers=()):
+    """Twin of columnar.columns_response()."""
+    with metrics.timed("serialize", metrics.serialize_seconds, "columns"):
+        body = columnar.encode(columns)
+    await send_response(send, 200, body, [("content-type", columnar.MIMETYPE), *headers])
+
+
+class Columns:
+    """Marks a build() result to be sent as binary columns rather than JSON."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+
+async def send_payload(send, payload, headers=()):
+    if isinstance(payload, Columns):
+        return await send_columns(send, payload.columns, headers)
+    await send_json(send, payload, headers=headers)
+
+
+async def send_conditional(send, req, version, last_modified, build):
+    """Async twin of @conditional: 304 without calling build() when the client is current."""
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    etag = representation_etag(req.path, req.args, req.headers.get("accept", ""), version)
+    headers = [("etag", f'"{etag}"'), ("cache-control", "no-cache"), ("vary", "Accept")]
+    if last_modified is not None:
+        headers.append(("last-modified", http_date(last_modified)))
+
+    if "if-none-match" in req.headers:
+        fresh = parse_etags(req.headers["if-none-match"]).contains(etag)
+    else:
+        since = parse_date(req.headers.get("if-modified-since"))
+        fresh = since is not None and last_modified is not None and \
+            last_modified.replace(microsecond=0) <= since
+
+    if fresh:
+        return await send_response(send, 304, headers=headers)
+    try:
+        payload = await build()
+    except HTTPError as e:
+        return await send_json(send, {"error": str(e)}, status=e.status)
+    await send_payload(send, payload, headers)
+
+
+# ============ NATIVE ROUTES ==========================================
+
+
+async def portfolio_stats(req, send):
+    version, last_modified = flask_app.portfolio_stats_validator(
+        await adb.fetch_one(flask_app.PORTFOLIO_STATS_VERSION_SQL)
+    )
+
+    async def build():
+        deploy, snap = await asyncio.gather(
+            adb.fetch_one(flask_app.LATEST_DEPLOY_SQL),
+            adb.fetch_one(flask_app.LATEST_SNAPSHOT_SQL),
+        )
+        return flask_app.portfolio_stats_payload(deploy, snap)
+
+    await send_conditional(send, req, version, last_modified, build)
+
+
+async def deploys_page(req, send):
+    try:
+        sql, args, limit = flask_app.deploys_page_query(dict(req.args))
+    except ValueError as e:
+        return await send_json(send, {"error": str(e)}, status=400)
+
+    await send_json(send, flask_app.deploys_page_payload(await adb.fetch_all(sql, args), limit))
+
+
+async def deploys_list():
+    """deploy_history.deploy_index.get(), with its probe and re-read over adb."""
+    index = deploy_history.deploy_index
+    rows = index.fresh()
+    if rows is not None:
+        return rows
+    head = index.head_of(await adb.fetch_one(deploy_history.DEPLOY_HEAD_SQL))
+    rows = await adb.fetch_all(deploy_history.DEPLOY_LIST_SQL) if index.stale(head) else None
+    return index.update(head, rows)
+
+
+async def load_deploy_history(deploy_id):
+    """Twin of known_history() + fetch_deploy_history(): DeployHistory or None."""
+    history = await asyncio.to_thread(flask_app.known_history, deploy_id)
+    if history is None:
+        cols = await adb.fetch_columns(flask_app.DEPLOY_HISTORY_SQL, (deploy_id,))
+        history = flask_app.history_from_columns(cols)
+    return history
+
+
+async def load_deploy_histories(deploy_ids, deploys_list):
+    """Twin of app.load_deploy_histories()."""
+    histories, missing = await asyncio.to_thread(flask_app.known_histories, deploy_ids)
+    if missing:
+        cols = await adb.fetch_columns(flask_app.deploy_histories_sql(len(missing)), missing)
+        histories.update(await asyncio.to_thread(flask_app.split_histories, cols, deploys_list))
+    return histories
+
+
+async def deploys_summary(req, send):
+    try:
+        ids, limit = flask_app.deploys_summary_args(dict(req.args))
+    except ValueError as e:
+        return await send_json(send, {"error": str(e)}, status=400)
+
+    version, last_modified = flask_app.portfolio_stats_validator(
+        await adb.fetch_one(flask_app.PORTFOLIO_STATS_VERSION_SQL)
+    )
+
+    async def build():
+        deploys = await deploys_list()
+        selected = flask_app.select_deploys(deploys, ids, limit)
+        histories = await load_deploy_histories([d["id"] for d in selected], deploys)
+        return flask_app.deploys_summary_payload(selected, histories, deploys)
+
+    await send_conditional(send, req, version, last_modified, build)
+
+
+async def deploy_series(deploy_id, req, send):
+    history = await load_deploy_history(deploy_id)
+    if history is None:
+        return await send_json(send, {"error": f"No history for deploy {deploy_id}"}, status=404)
+
+    if req.wants_binary():
+        return await send_columns(send, flask_app.deploy_series_columns(history), [("vary", "Accept")])
+    await send_json(send, flask_app.deploy_series_payload(history))
+
+
+async def deploy_rolling(req, send):
+    """/api/analytics/rolling?deploy=<id>; the fund's curve is in memory and stays on Flask."""
+    try:
+        windows, days, max_points, deploy_id = flask_app.rolling_request_args(dict(req.args))
+    except ValueError as e:
+        return await send_json(send, {"error": str(e)}, status=400)
+
+    version, last_modified = flask_app.deploy_history_validator(
+        deploy_id, await adb.fetch_one(flask_app.DEPLOY_HISTORY_VERSION_SQL, (deploy_id,))
+    )
+
+    async def build():
+        history = await load_deploy_history(deploy_id)
+        if history is None:
+            raise HTTPError(404, f"no history for deploy {deploy_id}")
+        view = rolling.RollingView.of(history.epoch, history.balance)
+        idx, series = flask_app.rolling_series(view, windows, days, max_points)
+        if req.wants_binary():
+            return Columns(flask_app.rolling_columns(view.epoch[idx], series))
+        return flask_app.rolling_payload(view.epoch[idx], series)
+
+    await send_conditional(send, req, version, last_modified, build)
+
+
+async def api_stream(req, send):
+    """Twin of app.api_stream(): the feed fills an asyncio queue, no thread waits on it."""
+    q = flask_app.live_feed.subscribe_async()
+
+    async def disconnected():
+        while (await req.receive())["type"] != "http.disconnect":
+            pass
+
+    async def event(chunk):
+        await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+    gone = asyncio.ensure_future(disconnected())
+    try:
+        await send_response_start(send, 200, [
+            ("content-type", "text/event-stream; charset=utf-8"),
+            ("cache-control", "no-cache"),
+            ("x-accel-buffering", "no"),
+        ])
+        await event("retry: 5000\n\n")
+        while True:
+            get = asyncio.ensure_future(q.get())
+            done, _ = await asyncio.wait({get, gone}, timeout=15, return_when=asyncio.FIRST_COMPLETED)
+            if gone in done:
+                get.cancel()
+                return
+            if get in done:
+                await event(get.result())
+            else:
+                get.cancel()
+                await event(": keepalive\n\n")   # keeps proxies from closing an idle stream
+    finally:
+        gone.cancel()
+        flask_app.live_feed.unsubscribe(q)
+
+
+async def timed_route(scope, receive, handler, send):
+    """Same route histogram + Server-Timing header the Flask app adds."""
+    start = time.perf_counter()
+    timings = metrics.begin()
+
+    async def send_timed(message):
+        if message["type"] == "http.response.start":
+            total = time.perf_counter() - start
+            metrics.request_seconds.observe(total, scope["path"], "GET", message["status"])
+            header = ("server-timing", metrics.server_timing(timings, total))
+            message = {**message, "headers": [*message["headers"], tuple(v.encode() for v in header)]}
+        await send(message)
+
+    await handler(Request(scope, receive), send_timed)
+
+
+ROUTES = {
+    "/api/portfolio_stats": portfolio_stats,
+    "/api/deploys": deploys_page,
+    "/api/deploys/summary": deploys_summary,
+    "/api/stream": api_stream,
+}
+
+DEPLOY_SERIES_PATH = re.compile(r"/api/deploys/(\d+)/series")
+
+
+def native_handler(scope):
+    """The handler(req, send) serving this GET natively, or None for the Flask app."""
+    path = scope["path"]
+    if path in ROUTES:
+        return ROUTES[path]
+    m = DEPLOY_SERIES_PATH.fullmatch(path)
+    if m:
+        return lambda req, send: deploy_series(int(m.group(1)), req, send)
+    if path == "/api/analytics/rolling" and "deploy" in dict(Request(scope).args):
+        return deploy_rolling
+    return None
+
+
+# ============ APP ==========================================
+
+
+async def lifespan(receive, send):
+    followers = []
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            followers = [asyncio.create_task(follow_series(s)) for s in (investments, historical_roi)]
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for task in followers:
+                task.cancel()
+            await adb.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    handler = native_handler(scope) if scope["type"] == "http" else None
+    if handler is not None and scope["method"] == "GET":
+        return await timed_route(scope, receive, handler, send)
+
+    await wsgi(scope, receive, send)
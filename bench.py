@@ -0,0 +1,300 @@
+"""
+Benchmarks for the endpoints and helpers that scale with table size.
+
+    python bench.py                              # 10k ticks on SQLite, compare to bench_baseline.json
+    python bench.py --ticks 10000,100000,1000000 # several sizes, one dataset each
+    python bench.py --save                       # (re)write the baseline
+    python bench.py --db mysql --no-generate     # data already in the BENCH_DB_* server
+    python bench.py --db mysql --drop-existing   # (re)generate it there
+
+--db mysql means the scratch server from BENCH_DB_* (see benchdata.py),
+never the app's DB_* database. Generating replaces the tables, so on a
+database you name yourself it needs --drop-existing once they exist.
+
+Each case runs in a fresh process (cold caches, empty series stores, empty
+archive dir) against a dataset from benchdata.py, and records:
+
+    cold_ms        first call
+    warm_p50_ms    median of the next `--repeat` calls (p95 too)
+    peak_kib       growth of peak RSS over the process after setup
+    queries, rows  SQL statements / rows fetched by the cold call, and per warm call
+
+Compared to the baseline, a case regresses when a latency or peak memory
+grows by more than `--tolerance` (and by more than a small absolute floor,
+so sub-millisecond noise doesn't count), or when it runs more queries or
+fetches more rows than before. Any regression → exit status 1.
+
+Latencies and memory are machine-specific: keep the baseline from the
+machine you compare on. Query and row counts hold anywhere.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import benchdata
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+LATENCY_FLOOR_MS = 2.0
+MEMORY_FLOOR_KIB = 2048
+
+
+# ============ CASES ==========================================
+
+
+def _get(path):
+    def call(env):
+        resp = env["client"].get(path)
+        if resp.status_code != 200:
+            raise RuntimeError(f"GET {path} → {resp.status_code}")
+        resp.get_data()          # drain streamed bodies too
+    return call
+
+
+def _reload_series(env):
+    env["series"].investments.reload()
+    env["series"].historical_roi.reload()
+
+
+def _fund_kpis(env):
+    env["app"].fund_kpi_result()
+
+
+def _daily_closes(env):
+    env["app"].get_daily_closes(env["phx"])
+
+
+def _parse_history(env):
+    env["deploy_history"].DeployHistory.from_columns(env["history_columns"]).view()
+
+
+def _fetch_history_columns(env):
+    from db import query_columns
+    env["history_columns"] = query_columns(
+        "SELECT * FROM portfolio_history WHERE deploy_id = %s ORDER BY timestamp_utc ASC",
+        (env["oldest"],),
+    )
+
+
+# name → (helper call or URL, setup or None). URLs may use {latest} / {oldest}
+# deploy ids: the newest deploy is still open, older ones are closed (cacheable).
+CASES = {
+    "series.reload": (_reload_series, None),
+    "app.fund_kpi_result": (_fund_kpis, None),
+    "app.get_daily_closes": (_daily_closes, None),
+    "DeployHistory.from_columns+view": (_parse_history, _fetch_history_columns),
+    "GET /kpis": ("/kpis", None),
+    "GET /": ("/", None),
+    "GET /historical": ("/historical", None),
+    "GET /api/daily_closes_full": ("/api/daily_closes_full", None),
+    "GET /api/investments/timeseries?days=7": ("/api/investments/timeseries?days=7", None),
+    "GET /api/investments/timeseries?max_points=1000": ("/api/investments/timeseries?max_points=1000", None),
+    "GET /api/ohlc?interval=1h": ("/api/ohlc?interval=1h", None),
+    "GET /api/analytics/rolling": ("/api/analytics/rolling", None),
+    "GET /deploys/<open>": ("/deploys/{latest}", None),
+    "GET /deploys/<closed>": ("/deploys/{oldest}", None),
+    "GET /api/deploys/summary": ("/api/deploys/summary", None),
+}
+
+
+# ============ ONE CASE (child process) ==========================================
+
+
+def _max_rss_kib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak     # macOS reports bytes
+
+
+def _deploy_id(order):
+    from db import fetch_one
+    row = fetch_one(f"SELECT id FROM deploys ORDER BY timestamp_utc {order}, id {order} LIMIT 1")
+    return row["id"] if row else 0
+
+
+def run_case(name, db_target, repeat):
+    benchdata.use_target(db_target)
+
+    import pytz
+
+    import app
+    import deploy_history
+    import metrics
+    import series
+
+    env = {
+        "app": app, "series": series, "deploy_history": deploy_history,
+        "client": app.app.test_client(), "phx": pytz.timezone("America/Phoenix"),
+        "latest": _deploy_id("DESC"), "oldest": _deploy_id("ASC"),
+    }
+    call, setup = CASES[name]
+    if isinstance(call, str):
+        call = _get(call.format(latest=env["latest"], oldest=env["oldest"]))
+    if setup is not None:
+        setup(env)
+
+    rss_before = _max_rss_kib()
+    q0, r0 = metrics.sql_totals()
+    started = time.perf_counter()
+    call(env)
+    cold_ms = (time.perf_counter() - started) * 1000
+    q1, r1 = metrics.sql_totals()
+
+    warm = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call(env)
+        warm.append((time.perf_counter() - started) * 1000)
+    q2, r2 = metrics.sql_totals()
+
+    return {
+        "cold_ms": round(cold_ms, 3),
+        "warm_p50_ms": round(statistics.median(warm), 3) if warm else None,
+        "warm_p95_ms": round(sorted(warm)[int(0.95 * (len(warm) - 1))], 3) if warm else None,
+        "peak_kib": _max_rss_kib() - rss_before,
+        "queries": q1 - q0,
+        "rows": r1 - r0,
+        "warm_queries": round((q2 - q1) / repeat, 2) if repeat else None,
+        "warm_rows": round((r2 - r1) / repeat, 2) if repeat else None,
+    }
+
+
+# ============ SUITE ==========================================
+
+
+def run_suite(db_target, repeat, cases):
+    results = {}
+    for name in cases:
+        with tempfile.TemporaryDirectory(prefix="bench-archive-") as archive_dir:
+            env = {**os.environ, "DEPLOY_ARCHIVE_DIR": archive_dir}
+            env.pop("SHARED_SERIES_DIR", None)
+            env.pop("CACHE_URL", None)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--one", name, "--db", db_target,
+                 "--repeat", str(repeat)],
+                env=env, capture_output=True, text=True,
+            )
+        if proc.returncode != 0:
+            results[name] = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        else:
+            results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"  {name:<50} {_summary(results[name])}", flush=True)
+    return results
+
+
+def _summary(r):
+    if "error" in r:
+        return "ERROR " + r["error"]
+    return (f"cold {r['cold_ms']:>9.1f} ms  warm {r['warm_p50_ms'] or 0:>8.1f} ms  "
+            f"peak {r['peak_kib'] / 1024:>7.1f} MiB  {r['queries']} q / {r['rows']} rows")
+
+
+def compare(base, new, tolerance):
+    """List of human-readable regressions of `new` against `base` (same dataset size)."""
+    problems = []
+    for name, b in base.items():
+        n = new.get(name)
+        if n is None or "error" in b:
+            continue
+        if "error" in n:
+            problems.append(f"{name}: {n['error']}")
+            continue
+
+        for key, floor in (("cold_ms", LATENCY_FLOOR_MS), ("warm_p50_ms", LATENCY_FLOOR_MS),
+                           ("peak_kib", MEMORY_FLOOR_KIB)):
+            if b[key] is None or n[key] is None:
+                continue
+            if n[key] > b[key] * (1 + tolerance) and n[key] - b[key] > floor:
+                problems.append(f"{name}: {key} {b[key]} → {n[key]}")
+
+        for key in ("queries", "rows", "warm_queries", "warm_rows"):
+            if b[key] is not None and n[key] is not None and n[key] > b[key]:
+                problems.append(f"{name}: {key} {b[key]} → {n[key]}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard endpoints on synthetic data.")
+    parser.add_argument("--db", default=None, help="sqlite:<path> (default: a temp file) or mysql (BENCH_DB_*)")
+    parser.add_argument("--no-generate", action="store_true", help="use the data already in --db")
+    parser.add_argument("--drop-existing", action="store_true", help="let generation replace existing tables")
+    parser.add_argument("--ticks", default="10000", help="comma-separated sizes, e.g. 10000,1000000")
+    benchdata.add_size_args(parser)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--case", action="append", help="only these cases (repeatable)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    # child-process mode
+    parser.add_argument("--one", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        print(json.dumps(run_case(args.one, args.db, args.repeat)))
+        return 0
+
+    if args.db is None:
+        with tempfile.TemporaryDirectory(prefix="bench-db-") as tmp:
+            # Our own throwaway file: nothing to protect
+            args.drop_existing = True
+            return run(args, f"sqlite:{tmp}/bench.db")
+    try:
+        if args.db == "mysql":
+            benchdata.bench_mysql_settings()
+    except ValueError as e:
+        parser.error(str(e))
+    return run(args, args.db)
+
+
+def run(args, db_target):
+    cases = args.case or list(CASES)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, problems = {}, []
+    drop_existing = args.drop_existing
+    for ticks in [int(t) for t in str(args.ticks).split(",")]:
+        args_for_size = argparse.Namespace(**{**vars(args), "ticks": ticks})
+        sizes = benchdata.size_kwargs(args_for_size)
+        key = ",".join(f"{k}={v}" for k, v in sorted(sizes.items()))
+
+        if not args.no_generate:
+            conn, dialect = benchdata.open_target(db_target)
+            started = time.perf_counter()
+            try:
+                benchdata.generate(conn, dialect, drop_existing=drop_existing, **sizes)
+            finally:
+                conn.close()
+            # The next size replaces what this run just generated
+            drop_existing = True
+            print(f"{key}: generated in {time.perf_counter() - started:.1f}s", flush=True)
+        else:
+            print(f"{key}: using existing data", flush=True)
+
+        results[key] = run_suite(db_target, args.repeat, cases)
+        if key in baseline:
+            problems += [f"[{key}] {p}" for p in compare(baseline[key], results[key], args.tolerance)]
+        else:
+            print(f"{key}: no baseline for this size", flush=True)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    for p in problems:
+        print("REGRESSION", p)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
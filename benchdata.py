@@ -0,0 +1,423 @@
+"""
+Seeded synthetic data for benchmarks (bench.py) and local runs.
+
+Builds the four tables the app reads, at any size:
+
+    investments_timeseries   `ticks` rows, one every `interval` seconds, ending now
+    historical_roi           same timestamps, cum_roi derived from the above
+    deploys                  `deploys` rows spread over the same span, R1..R30
+    portfolio_history        `history_rows` rows per deploy, p1_roi..p30_roi
+
+Same seed + sizes → same values (timestamps are anchored to the current
+interval boundary so the "last N days" endpoints have data to chew on).
+
+Targets:
+    sqlite:<path>   a file the SQLite stand-in below serves to db.py
+    mysql           a scratch server from BENCH_DB_HOST / BENCH_DB_USER /
+                    BENCH_DB_PASS / BENCH_DB_PORT / BENCH_DB_NAME, never the
+                    app's DB_* database (refused if host + name match)
+
+Generating drops and recreates the four tables, so it refuses to touch
+tables that already exist unless given --drop-existing.
+
+    python benchdata.py sqlite:/tmp/3mfunds.db --ticks 1000000
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pymysql
+from dotenv import load_dotenv
+
+ASSETS = 30
+ASSET_NAMES = [
+    "BTC", "ETH", "SOL", "XRP", "BNB", "ADA", "DOGE", "AVAX", "DOT", "LINK",
+    "TRX", "MATIC", "LTC", "BCH", "ATOM", "NEAR", "APT", "ARB", "OP", "FIL",
+    "INJ", "SUI", "SEI", "TIA", "RNDR", "IMX", "STX", "AAVE", "UNI", "MKR",
+]
+HISTORY_INTERVAL = 300
+INSERT_BATCH = 5000
+
+# table → [(column, mysql type)]; SQLite only cares that timestamps say DATETIME
+SCHEMA = {
+    "investments_timeseries": [
+        ("timestamp_utc", "DATETIME NOT NULL"),
+        ("invested_value", "DECIMAL(18,2)"),
+        ("total_returns", "DECIMAL(18,2)"),
+        ("portfolio_value", "DECIMAL(18,2)"),
+    ],
+    "historical_roi": [
+        ("timestamp_utc", "DATETIME NOT NULL"),
+        ("cum_roi", "DECIMAL(12,6)"),
+    ],
+    "deploys": [
+        ("id", "INTEGER PRIMARY KEY"),
+        ("timestamp_utc", "DATETIME NOT NULL"),
+    ] + [(f"R{i}", "VARCHAR(16)") for i in range(1, ASSETS + 1)],
+    "portfolio_history": [
+        ("id", "INTEGER PRIMARY KEY"),
+        ("deploy_id", "INTEGER NOT NULL"),
+        ("timestamp_utc", "DATETIME NOT NULL"),
+        ("portfolio_balance", "DECIMAL(18,2)"),
+        ("portfolio_roi", "DECIMAL(12,6)"),
+        ("portfolio_roi_lev", "DECIMAL(12,6)"),
+        ("BTC_close", "DECIMAL(18,2)"),
+    ] + [(f"p{i}_roi", "VARCHAR(16)") for i in range(1, ASSETS + 1)],
+}
+
+INDEXES = [
+    ("investments_timeseries", "timestamp_utc"),
+    ("historical_roi", "timestamp_utc"),
+    ("deploys", "timestamp_utc, id"),
+    ("portfolio_history", "deploy_id, timestamp_utc"),
+]
+
+
+# ============ GENERATOR ==========================================
+
+
+def _stamps(epoch):
+    return np.datetime_as_string(np.asarray(epoch).astype("datetime64[s]")).astype(object)
+
+
+def _stamp_text(values):
+    return [s.replace("T", " ") for s in values]
+
+
+def investments_rows(rng, ticks, interval, end):
+    """Yields batches of (timestamp_utc, invested, returns, portfolio) tuples, oldest first."""
+    start = end - (ticks - 1) * interval
+    invested, portfolio = 20000.0, 20000.0
+    for lo in range(0, ticks, INSERT_BATCH):
+        n = min(INSERT_BATCH, ticks - lo)
+        epoch = start + (lo + np.arange(n, dtype=np.int64)) * interval
+
+        # Occasional deposits, geometric random walk on top
+        deposits = np.where(rng.random(n) < 1e-4, rng.choice([1000.0, 5000.0], n), 0.0)
+        inv = invested + np.cumsum(deposits)
+        growth = np.cumprod(1 + rng.normal(2e-6, 1.5e-3, n))
+        port = (portfolio + np.cumsum(deposits)) * growth
+        invested, portfolio = float(inv[-1]), float(port[-1])
+
+        yield list(zip(
+            _stamp_text(_stamps(epoch)),
+            np.round(inv, 2).tolist(),
+            np.round(port - inv, 2).tolist(),
+            np.round(port, 2).tolist(),
+        ))
+
+
+def historical_rows(batch):
+    return [(ts, round(p / i - 1, 6)) for ts, i, _, p in batch]
+
+
+def deploy_rows(rng, deploys, start, end, history_rows):
+    # The newest deploy's history ends at `end`, not in the future
+    last = max(start, end - history_rows * HISTORY_INTERVAL)
+    epoch = np.linspace(start, last, deploys).astype(np.int64)
+    epoch -= epoch % 60
+    rows = []
+    for k, ts in enumerate(_stamp_text(_stamps(epoch)), start=1):
+        n = int(rng.integers(10, 21))
+        names = rng.choice(ASSET_NAMES, n, replace=False).tolist()
+        rows.append((k, ts, *names, *[None] * (ASSETS - n)))
+    return rows
+
+
+def deploy_history_rows(rng, deploy, n, first_id):
+    """n portfolio_history rows for one deploy row (as built by deploy_rows)."""
+    deploy_id, ts = deploy[0], deploy[1]
+    assets = sum(name is not None for name in deploy[2:])
+    start = int(np.datetime64(ts.replace(" ", "T"), "s").astype(np.int64))
+    epoch = start + np.arange(n, dtype=np.int64) * HISTORY_INTERVAL
+
+    roi = np.cumsum(rng.normal(0, 0.004, n))
+    balance = 20000.0 * (1 + roi)
+    btc = 60000.0 * np.cumprod(1 + rng.normal(0, 0.002, n))
+    asset_roi = np.cumsum(rng.normal(0, 0.6, (assets, n)), axis=1)
+
+    rows = []
+    for j, stamp in enumerate(_stamp_text(_stamps(epoch))):
+        cells = [f"{asset_roi[a, j]:.2f}%" for a in range(assets)] + [None] * (ASSETS - assets)
+        rows.append((
+            first_id + j, deploy_id, stamp,
+            round(float(balance[j]), 2), round(float(roi[j]), 6), round(float(roi[j] * 3), 6),
+            round(float(btc[j]), 2), *cells,
+        ))
+    return rows
+
+
+# ============ TARGETS ==========================================
+
+
+def existing_tables(cur, dialect):
+    if dialect == "mysql":
+        cur.execute("SHOW TABLES")
+    else:
+        cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    names = {row[0] for row in cur.fetchall()}
+    return [t for t in SCHEMA if t in names]
+
+
+def create_tables(cur, dialect, drop_existing=False):
+    existing = existing_tables(cur, dialect)
+    if existing and not drop_existing:
+        raise RuntimeError(f"{', '.join(existing)} already exist; pass --drop-existing to replace them")
+    for table, columns in SCHEMA.items():
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+        cur.execute(f"CREATE TABLE {table} ({', '.join(f'{c} {t}' for c, t in columns)})")
+    for table, cols in INDEXES:
+        cur.execute(f"CREATE INDEX ix_{table}_{cols.split(',')[0]} ON {table} ({cols})")
+
+
+def _insert(cur, table, rows, mark):
+    cols = [c for c, _ in SCHEMA[table]]
+    cur.executemany(
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join([mark] * len(cols))})",
+        rows,
+    )
+
+
+def generate(conn, dialect, ticks=10_000, interval=60, deploys=30, history_rows=216, seed=42,
+             drop_existing=False):
+    """
+    Fill `conn` (sqlite3 or pymysql) with a fresh synthetic dataset. Returns
+    row counts. Raises RuntimeError if the tables exist and not `drop_existing`.
+    """
+    rng = np.random.default_rng(seed)
+    mark = "%s" if dialect == "mysql" else "?"
+    end = int(time.time()) // interval * interval
+
+    cur = conn.cursor()
+    create_tables(cur, dialect, drop_existing)
+
+    for batch in investments_rows(rng, ticks, interval, end):
+        _insert(cur, "investments_timeseries", batch, mark)
+        _insert(cur, "historical_roi", historical_rows(batch), mark)
+
+    deps = deploy_rows(rng, deploys, end - (ticks - 1) * interval, end, history_rows)
+    _insert(cur, "deploys", deps, mark)
+    for k, deploy in enumerate(deps):
+        rows = deploy_history_rows(rng, deploy, history_rows, k * history_rows + 1)
+        _insert(cur, "portfolio_history", rows, mark)
+
+    conn.commit()
+    cur.close()
+    return {
+        "investments_timeseries": ticks,
+        "historical_roi": ticks,
+        "deploys": deploys,
+        "portfolio_history": deploys * history_rows,
+    }
+
+
+# ============ SQLITE STAND-IN ==========================================
+
+
+_DATETIME = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(\.\d+)?$")
+
+
+def _adapt_datetime(value):
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat(" ")
+
+
+def _value(v):
+    # MAX(...) and subqueries lose the DATETIME type, so match on shape instead
+    if isinstance(v, str) and len(v) >= 19 and _DATETIME.match(v):
+        return datetime.fromisoformat(v)
+    return v
+
+
+class SQLiteCursor:
+    """Just enough of pymysql's cursors for db.py's callers: dict rows or tuples."""
+
+    def __init__(self, raw, dicts=True):
+        self._raw = raw
+        self._dicts = dicts
+        self._names = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    def _row(self, row):
+        if self._dicts:
+            return {k: _value(v) for k, v in zip(self._names, row)}
+        return tuple(_value(v) for v in row)
+
+    def execute(self, sql, args=None):
+        self._raw.execute(sql.replace("%s", "?"), tuple(args or ()))
+        self._names = [d[0] for d in self._raw.description] if self._raw.description else None
+        return self._raw.rowcount
+
+    def executemany(self, sql, rows):
+        self._raw.executemany(sql.replace("%s", "?"), rows)
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        return None if row is None else self._row(row)
+
+    def fetchmany(self, size=None):
+        return [self._row(r) for r in self._raw.fetchmany(size or self._raw.arraysize)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._raw.fetchall()]
+
+    def close(self):
+        self._raw.close()
+
+
+class SQLiteConnection:
+    """A sqlite3 file behind the pymysql connection surface ConnectionPool expects."""
+
+    def __init__(self, path):
+        self._raw = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.open = True
+
+    def cursor(self, cursorclass=None):
+        # The pool's connections default to DictCursor, like db._open_connection()
+        dicts = cursorclass is None or issubclass(cursorclass, pymysql.cursors.DictCursorMixin)
+        return SQLiteCursor(self._raw.cursor(), dicts)
+
+    def ping(self, reconnect=False):
+        self._raw.execute("SELECT 1")
+
+    def commit(self):
+        self._raw.commit()
+
+    def close(self):
+        self.open = False
+        self._raw.close()
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+
+
+def use_sqlite(path, max_size=10):
+    """Point db.py's pool (and so the whole app) at a SQLite file."""
+    import db
+    db.pool = db.ConnectionPool(
+        lambda: SQLiteConnection(path),
+        max_size=max_size,
+        source=f"sqlite:{os.path.abspath(path)}",
+    )
+
+
+# ============ BENCH MYSQL ==========================================
+
+
+def bench_mysql_settings():
+    """pymysql.connect kwargs from BENCH_DB_*. Raises ValueError if unset or pointing at DB_*."""
+    # Compare against the DB_* the app would really use, .env included
+    load_dotenv()
+    missing = [k for k in ("BENCH_DB_HOST", "BENCH_DB_USER", "BENCH_DB_NAME") if not os.getenv(k)]
+    if missing:
+        raise ValueError(f"the mysql target needs {', '.join(missing)} (a scratch database, not DB_*)")
+
+    host, name = os.getenv("BENCH_DB_HOST"), os.getenv("BENCH_DB_NAME")
+    if (host, name) == (os.getenv("DB_HOST"), os.getenv("DB_NAME")):
+        raise ValueError(f"BENCH_DB_HOST/BENCH_DB_NAME point at the app's database {name!r} on {host}")
+
+    settings = {
+        "host": host,
+        "user": os.getenv("BENCH_DB_USER"),
+        "password": os.getenv("BENCH_DB_PASS", ""),
+        "port": int(os.getenv("BENCH_DB_PORT", 3306)),
+        "database": name,
+        "autocommit": True,
+    }
+    if os.getenv("BENCH_DB_SSL"):
+        settings["ssl"] = {"ssl": {}}
+    return settings
+
+
+def use_mysql(max_size=10):
+    """Point db.py's pool (and so the whole app) at the BENCH_DB_* server."""
+    import db
+    settings = bench_mysql_settings()
+    db.pool = db.ConnectionPool(
+        lambda: pymysql.connect(cursorclass=pymysql.cursors.DictCursor, **settings),
+        max_size=max_size,
+        source=f"mysql://{settings['host']}:{settings['port']}/{settings['database']}",
+    )
+
+
+def use_target(target, max_size=10):
+    """Point db.py at 'sqlite:<path>' or 'mysql' (BENCH_DB_*)."""
+    if target.startswith("sqlite:"):
+        use_sqlite(target[len("sqlite:"):], max_size)
+    elif target == "mysql":
+        use_mysql(max_size)
+    else:
+        raise ValueError(f"unknown target {target!r} (want sqlite:<path> or mysql)")
+
+
+def open_target(target):
+    """(connection, dialect) for 'sqlite:<path>' or 'mysql' (BENCH_DB_*)."""
+    if target.startswith("sqlite:"):
+        conn = sqlite3.connect(target[len("sqlite:"):])
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn, "sqlite"
+    if target == "mysql":
+        return pymysql.connect(**bench_mysql_settings()), "mysql"
+    raise ValueError(f"unknown target {target!r} (want sqlite:<path> or mysql)")
+
+
+def add_size_args(parser):
+    """Everything but --ticks, which each CLI defines its own way."""
+    parser.add_argument("--interval", type=int, default=60, help="seconds between ticks")
+    parser.add_argument("--deploys", type=int, default=30)
+    parser.add_argument("--history-rows", type=int, default=216, help="portfolio_history rows per deploy")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def size_kwargs(args):
+    return {
+        "ticks": args.ticks,
+        "interval": args.interval,
+        "deploys": args.deploys,
+        "history_rows": args.history_rows,
+        "seed": args.seed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic 3mfunds dataset.")
+    parser.add_argument("target", help="sqlite:<path> or mysql (BENCH_DB_*)")
+    parser.add_argument("--ticks", type=int, default=10_000)
+    parser.add_argument("--drop-existing", action="store_true", help="replace the tables if they exist")
+    add_size_args(parser)
+    args = parser.parse_args()
+
+    try:
+        conn, dialect = open_target(args.target)
+    except ValueError as e:
+        parser.error(str(e))
+    started = time.perf_counter()
+    try:
+        counts = generate(conn, dialect, drop_existing=args.drop_existing, **size_kwargs(args))
+    except RuntimeError as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+    print(f"generated {counts} in {time.perf_counter() - started:.1f}s")
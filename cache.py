@@ -0,0 +1,206 @@
+"""
+Memoization for results that only change when their source tables do.
+
+    @cache.memoize(ttl=300, sources=["investments_timeseries"])
+    def get_daily_earnings(): ...
+
+Every key includes the current watermark (latest timestamp_utc) of each
+source table, so new rows make old entries unreachable straight away;
+they then age out through the LRU bound or their TTL.
+
+Backends:
+    MemoryBackend   in-process OrderedDict LRU (default)
+    RedisBackend    a local cache server, chosen with CACHE_URL=redis://...
+                    Any client with get / set(ex=) / info works, so tests
+                    can hand it a stand-in such as fakeredis.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from db import fetch_one
+
+MISSING = object()
+
+
+# ============ BACKENDS ==========================================
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()        # key → (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return MISSING
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._data),
+                    "max_entries": self.max_entries, **self._counters}
+
+
+class RedisBackend:
+    """
+    Values are pickled; the size bound is the server's own
+    `maxmemory` + `maxmemory-policy allkeys-lru`, so evictions are read
+    back from its INFO stats.
+    """
+
+    def __init__(self, url=None, client=None, prefix="3mfunds:"):
+        if client is None:
+            import redis   # only needed when CACHE_URL points at a server
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self._count("misses")
+            return MISSING
+        self._count("hits")
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self):
+        try:
+            evictions = self.client.info("stats").get("evicted_keys")
+        except Exception:
+            evictions = None
+        with self._lock:
+            return {"backend": "redis", "evictions": evictions, **self._counters}
+
+
+# ============ WATERMARKS ==========================================
+
+
+class Watermarks:
+    """
+    Latest timestamp_utc per source table. Tables without a registered
+    reader get a `SELECT MAX(timestamp_utc)`, asked at most once every
+    `min_interval` seconds.
+    """
+
+    def __init__(self, min_interval=5):
+        self.min_interval = min_interval
+        self._readers = {}
+        self._intervals = {}
+        self._seen = {}                   # table → (checked_at, watermark)
+        self._lock = threading.Lock()
+
+    def register(self, table, reader, min_interval=None):
+        """
+        Use reader() instead of a MAX() query, e.g. an in-memory store's
+        watermark (pass min_interval=0 when the reader is free).
+        """
+        self._readers[table] = reader
+        if min_interval is not None:
+            self._intervals[table] = min_interval
+
+    def _read(self, table):
+        if table in self._readers:
+            return self._readers[table]()
+        row = fetch_one(f"SELECT MAX(timestamp_utc) AS ts FROM {table}")
+        return row["ts"] if row else None
+
+    def get(self, table):
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(table)
+        if seen is not None and now - seen[0] < self._intervals.get(table, self.min_interval):
+            return seen[1]
+
+        value = self._read(table)
+        with self._lock:
+            self._seen[table] = (now, value)
+        return value
+
+
+# ============ CACHE ==========================================
+
+
+class Cache:
+    def __init__(self, backend, watermarks):
+        self.backend = backend
+        self.watermarks = watermarks
+
+    def key(self, name, args, kwargs, sources):
+        versions = [(s, self.watermarks.get(s)) for s in sources]
+        raw = repr((args, sorted(kwargs.items()), versions)).encode()
+        return f"{name}:{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
+
+    def memoize(self, ttl=300, sources=()):
+        """
+        Cache fn's result per arguments and per watermark of `sources`.
+        Results are shared between callers: treat them as read-only.
+        """
+        def deco(fn):
+            name = f"{fn.__module__}.{fn.__qualname__}"
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                key = self.key(name, args, kwargs, sources)
+                value = self.backend.get(key)
+                if value is MISSING:
+                    value = fn(*args, **kwargs)
+                    self.backend.set(key, value, ttl)
+                return value
+            return wrapper
+        return deco
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def _backend_from_env():
+    url = os.getenv("CACHE_URL")
+    if url and url.startswith("redis"):
+        return RedisBackend(url)
+    return MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", 512)))
+
+
+watermarks = Watermarks(min_interval=float(os.getenv("CACHE_WATERMARK_SECONDS", 5)))
+cache = Cache(_backend_from_env(), watermarks)
@@ -0,0 +1,80 @@
+"""
+Compact binary columnar responses for the chart endpoints.
+
+Layout (all little-endian):
+
+    magic    4s   b"3MC1"
+    ncols    u16
+    reserved u16
+    nrows    u32
+    per column: name_len u8, name (utf-8), dtype u8 (1 = float64, 2 = int64)
+    zero padding to an 8-byte boundary
+    column blocks, nrows * 8 bytes each, in header order
+
+Every block starts on an 8-byte boundary, so the browser can wrap it in a
+Float64Array / BigInt64Array directly (see static/assets/js/columns.js).
+Timestamps are sent as float64 epoch milliseconds, which is what the chart
+library wants anyway.
+
+Clients opt in with `Accept: application/vnd.3mfunds.columns` or `?format=bin`.
+"""
+import struct
+
+import numpy as np
+from flask import Response, request
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import metrics
+
+MIMETYPE = "application/vnd.3mfunds.columns"
+MAGIC = b"3MC1"
+
+DTYPES = {
+    np.dtype("<f8"): 1,
+    np.dtype("<i8"): 2,
+}
+
+
+def wants_binary():
+    return accepts_binary(request.args.get("format"), request.headers.get("Accept"))
+
+
+def accepts_binary(format_arg, accept):
+    """?format= value + Accept header → True if binary columns should be sent."""
+    if format_arg == "bin":
+        return True
+    return parse_accept_header(accept, MIMEAccept).best_match(["application/json", MIMETYPE]) == MIMETYPE
+
+
+def encode(columns):
+    """{name: 1-D array} → bytes. All columns must have the same length."""
+    arrays = []
+    for name, values in columns.items():
+        arr = np.asarray(values)
+        arr = arr.astype("<i8") if arr.dtype.kind in "iu" else arr.astype("<f8")
+        arrays.append((name, arr))
+
+    nrows = len(arrays[0][1]) if arrays else 0
+    if any(len(a) != nrows for _, a in arrays):
+        raise ValueError("columns must all have the same length")
+
+    header = bytearray(struct.pack("<4sHHI", MAGIC, len(arrays), 0, nrows))
+    for name, arr in arrays:
+        raw = name.encode()
+        header += struct.pack("<B", len(raw)) + raw + struct.pack("<B", DTYPES[arr.dtype])
+    header += b"\0" * (-len(header) % 8)
+
+    return bytes(header) + b"".join(arr.tobytes() for _, arr in arrays)
+
+
+def epoch_ms(epoch_seconds):
+    return np.asarray(epoch_seconds, dtype=np.float64) * 1000.0
+
+
+def columns_response(columns):
+    with metrics.timed("serialize", metrics.serialize_seconds, "columns"):
+        body = encode(columns)
+    resp = Response(body, mimetype=MIMETYPE)
+    resp.vary.add("Accept")
+    return resp
@@ -0,0 +1,74 @@
+"""
+Conditional GET for the polled JSON endpoints.
+
+A route wrapped in @conditional(validator) first calls validator(), which
+must be cheap and return (version, last_modified). If the client's
+If-None-Match / If-Modified-Since already match, the view is never called:
+no query, no serialization, just a 304.
+
+The optional `parse_args(request.args)` runs before that and raises
+ValueError for a malformed request, which gets its 400 even when the
+validators match (If-Modified-Since doesn't look at the query string).
+"""
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import Response, jsonify, request
+
+
+def make_etag(*parts):
+    raw = "|".join(str(p) for p in parts).encode()
+    return hashlib.blake2b(raw, digest_size=12).hexdigest()
+
+
+def representation_etag(path, args, accept, version):
+    """Same data seen through different query args / Accept is a different representation."""
+    return make_etag(path, sorted(args), accept, version)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(validator, parse_args=None):
+    def deco(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if parse_args is not None:
+                try:
+                    parse_args(request.args)
+                except ValueError as e:
+                    return jsonify({"error": str(e)}), 400
+
+            version, last_modified = validator(*args, **kwargs)
+            if last_modified is not None and last_modified.tzinfo is None:
+                last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+            etag = representation_etag(
+                request.path,
+                request.args.items(multi=True),
+                request.headers.get("Accept", ""),
+                version,
+            )
+
+            if _not_modified(etag, last_modified):
+                resp = Response(status=304)
+            else:
+                resp = view(*args, **kwargs)
+                if not isinstance(resp, Response) or resp.status_code != 200:
+                    return resp
+
+            resp.set_etag(etag)
+            if last_modified is not None:
+                resp.last_modified = last_modified
+            resp.cache_control.no_cache = True   # always revalidate, never serve blind
+            resp.vary.add("Accept")
+            return resp
+        return wrapper
+    return deco
@@ -1,10 +1,21 @@
 import pymysql
 import os
+import threading
+import time
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+import numpy as np
+from pymysql.constants import FIELD_TYPE
 from dotenv import load_dotenv
 load_dotenv()
 
-print("connecting to db")
-def connect_db():
+import metrics
+
+
+def _open_connection():
     return pymysql.connect(
         host=os.getenv("DB_HOST"),
         user=os.getenv("DB_USER"),
@@ -15,3 +26,500 @@ def connect_db():
         autocommit=True,
         ssl={"ssl": {}},  # DO requires SSL
     )
+
+
+# ============ POOL ==========================================
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pymysql connection.
+
+    close() (and leaving a `with` block) hands the connection back to the
+    pool instead of tearing down the TLS session. Everything else is
+    forwarded to the real connection, so callers use it exactly like the
+    object pymysql.connect() returns.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._broken = False
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._raw.cursor(*args, **kwargs))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Connection-level failures mean the socket can't be trusted anymore
+        if exc_type is not None and issubclass(exc_type, (pymysql.err.OperationalError,
+                                                          pymysql.err.InterfaceError)):
+            self._broken = True
+        self.close()
+        return False
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at, discard=self._broken)
+
+
+class TimedCursor:
+    """
+    Cursor proxy that reports each statement to metrics: time from
+    execute() until the next execute() / close(), fetches included (they
+    are where unbuffered cursors spend their time), and rows fetched.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._sql = None
+        self._seconds = 0.0
+        self._rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._seconds += time.perf_counter() - start
+
+    def _finish(self):
+        if self._sql is not None:
+            metrics.observe_query(self._sql, self._seconds, self._rows)
+        self._sql, self._seconds, self._rows = None, 0.0, 0
+
+    def execute(self, sql, args=None):
+        self._finish()
+        self._sql = sql
+        return self._timed(self._raw.execute, sql, args)
+
+    def fetchone(self):
+        row = self._timed(self._raw.fetchone)
+        self._rows += row is not None
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._raw.fetchmany, size)
+        self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._raw.fetchall)
+        self._rows += len(rows)
+        return rows
+
+    def close(self):
+        self._finish()
+        self._raw.close()
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of pymysql connections.
+
+      - at most `max_size` connections exist at once (idle + checked out)
+      - acquire() blocks up to `timeout` seconds waiting for a free slot
+      - connections older than `recycle` seconds are closed and replaced
+      - connections idle longer than `ping_after` seconds are pinged first
+
+    `source` names the database behind `factory`, for on-disk caches that
+    must not mix datasets (see archive.py).
+    """
+
+    def __init__(self, factory, max_size=10, recycle=1800, ping_after=30, timeout=10, source=""):
+        self._factory = factory
+        self.source = source
+        self.max_size = max_size
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.timeout = timeout
+
+        self._idle = deque()          # (raw, created_at, last_used)
+        self._cond = threading.Condition()
+        self._open = 0                # idle + checked out
+
+        self._counters = {
+            "created": 0,
+            "reused": 0,
+            "recycled": 0,
+            "failed_pings": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+
+    # ---------------------------------------
+    # checkout / checkin
+    # ---------------------------------------
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at, last_used = self._idle.pop()   # LIFO → warmest socket
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    raw = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolTimeout(f"no DB connection free after {self.timeout}s")
+                self._counters["waits"] += 1
+                self._cond.wait(remaining)
+
+        # Network work happens outside the lock
+        if raw is not None:
+            raw = self._check(raw, created_at, last_used)
+            if raw is not None:
+                self._count("reused")
+                return PooledConnection(self, raw, created_at)
+
+        try:
+            raw = self._factory()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        self._count("created")
+        return PooledConnection(self, raw, time.monotonic())
+
+    def _check(self, raw, created_at, last_used):
+        """Return `raw` if it is still usable, otherwise close it and return None."""
+        now = time.monotonic()
+
+        if now - created_at > self.recycle:
+            self._count("recycled")
+            self._close_quietly(raw)
+            return None
+
+        if now - last_used > self.ping_after:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._count("failed_pings")
+                self._close_quietly(raw)
+                return None
+
+        return raw
+
+    def _release(self, raw, created_at, discard=False):
+        if discard or not raw.open:
+            self._close_quietly(raw)
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return
+
+        with self._cond:
+            self._idle.append((raw, created_at, time.monotonic()))
+            self._cond.notify()
+
+    # ---------------------------------------
+    # housekeeping
+    # ---------------------------------------
+    def _count(self, key):
+        with self._cond:
+            self._counters[key] += 1
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "max_size": self.max_size,
+                "open": self._open,
+                "idle": idle,
+                "in_use": self._open - idle,
+                **self._counters,
+            }
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                raw, _, _ = self._idle.pop()
+                self._close_quietly(raw)
+                self._open -= 1
+            self._cond.notify_all()
+
+
+pool = ConnectionPool(
+    _open_connection,
+    max_size=int(os.getenv("DB_POOL_SIZE", 10)),
+    recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    ping_after=int(os.getenv("DB_POOL_PING_AFTER", 30)),
+    timeout=int(os.getenv("DB_POOL_TIMEOUT", 10)),
+    source=f"mysql://{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}",
+)
+
+
+def connect_db():
+    """
+    Check a connection out of the shared pool.
+
+    Use as `with connect_db() as conn:` so it goes back to the pool on every
+    exit path; calling conn.close() does the same thing.
+    """
+    with metrics.timed("acquire", metrics.acquire_seconds):
+        return pool.acquire()
+
+
+def pool_stats():
+    return {**pool.stats(), **single_flight.stats()}
+
+
+# ============ SINGLE-FLIGHT ==========================================
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs
+    fn(), everyone who asks for the same key while it is in flight waits
+    and gets the same result (or exception). Nothing is kept afterwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._counters = {"flights": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters["flights"] += 1
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._calls)}
+
+
+single_flight = SingleFlight()
+
+
+def query_key(sql, args):
+    """Hashable key for a query + its parameters."""
+    if args is None:
+        return sql, None
+    if isinstance(args, dict):
+        return sql, tuple(sorted(args.items()))
+    return sql, tuple(tuple(a) if isinstance(a, list) else a for a in args)
+
+
+# ============ QUERIES ==========================================
+
+
+def query_with(fn, *args):
+    """Run fn(cursor, *args) on a pooled connection and return its result."""
+    with connect_db() as conn, conn.cursor(pymysql.cursors.DictCursor) as cur:
+        return fn(cur, *args)
+
+
+# fetch_all / fetch_one go through single_flight: a burst of identical
+# queries costs one round trip, and every caller gets the same rows back,
+# so treat them as read-only.
+
+def fetch_all(sql, args=None):
+    def run(cur):
+        cur.execute(sql, args)
+        return cur.fetchall()
+    return single_flight.do(("all",) + query_key(sql, args), lambda: query_with(run))
+
+
+def fetch_one(sql, args=None):
+    def run(cur):
+        cur.execute(sql, args)
+        return cur.fetchone()
+    return single_flight.do(("one",) + query_key(sql, args), lambda: query_with(run))
+
+
+# ============ COLUMNS ==========================================
+
+# Column fetches swap these in for the connection's usual decoders: no
+# value gets a Python-level conversion (no Decimal, no datetime), every
+# non-NULL cell arrives as the server's text and is parsed a whole column
+# at a time by NumPy.
+_TEXT_DECODERS = {}
+
+_DATETIME_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP, FIELD_TYPE.DATE}
+_INT_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG,
+              FIELD_TYPE.INT24, FIELD_TYPE.YEAR}
+_FLOAT_TYPES = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL, FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+
+
+def _kind(type_code, values):
+    if type_code in _DATETIME_TYPES:
+        return "datetime"
+    if type_code in _INT_TYPES:
+        return "int"
+    if type_code in _FLOAT_TYPES:
+        return "float"
+    if type_code is None:
+        # Drivers without MySQL type codes (the SQLite stand-in): go by the values
+        sample = next((v for v in values if v is not None), None)
+        if isinstance(sample, datetime):
+            return "datetime"
+        if isinstance(sample, int):
+            return "int"
+        if isinstance(sample, (float, Decimal)):
+            return "float"
+    return "object"
+
+
+def _column(values, kind):
+    """
+    One column's cells → ndarray. datetime → datetime64[us] (NULL = NaT),
+    float → float64 (NULL = NaN), int → int64 (float64 if there are NULLs),
+    anything else stays an object array of str / None.
+    """
+    arr = np.array(values, dtype=object)
+    if kind == "object":
+        return arr
+    null = arr == None   # noqa: E711 — elementwise None test
+    if kind == "datetime":
+        arr[null] = "NaT"
+        return arr.astype("datetime64[us]")
+    if kind == "int" and not null.any():
+        return arr.astype(np.int64)
+    arr[null] = "nan"
+    return arr.astype(np.float64)
+
+
+def query_columns(sql, args=None, batch=10000):
+    """
+    Run a query straight into NumPy columns: {name: ndarray} in SELECT order.
+
+    Rows stream in through an unbuffered tuple cursor `batch` at a time,
+    so neither a dict per row nor the whole result as Python objects
+    ever exists. See _column() for the dtypes.
+    """
+    with connect_db() as conn:
+        raw = conn._raw
+        decoders = getattr(raw, "decoders", None)
+        if decoders is not None:
+            raw.decoders = _TEXT_DECODERS
+        try:
+            with conn.cursor(pymysql.cursors.SSCursor) as cur:
+                cur.execute(sql, args)
+                names = [d[0] for d in cur.description]
+                types = [d[1] for d in cur.description]
+                kinds = None
+                chunks = [[] for _ in names]
+                parse = 0.0
+
+                while True:
+                    rows = cur.fetchmany(batch)
+                    if not rows:
+                        break
+                    started = time.perf_counter()
+                    values = list(zip(*rows))
+                    if kinds is None:
+                        kinds = [_kind(t, v) for t, v in zip(types, values)]
+                    for chunk, v, kind in zip(chunks, values, kinds):
+                        chunk.append(_column(v, kind))
+                    parse += time.perf_counter() - started
+        finally:
+            if decoders is not None:
+                raw.decoders = decoders
+
+    metrics.parse_seconds.observe(parse, "columns")
+    metrics.record("parse", parse)
+
+    if kinds is None:
+        kinds = [_kind(t, ()) for t in types]
+    return {
+        name: np.concatenate(chunk) if len(chunk) > 1 else chunk[0] if chunk else _column([], kind)
+        for name, chunk, kind in zip(names, chunks, kinds)
+    }
+
+
+def columns_from_rows(description, rows):
+    """Tuple rows + their cursor.description → {name: ndarray}, the same dtypes as query_columns()."""
+    values = list(zip(*rows)) if rows else [()] * len(description)
+    return {d[0]: _column(v, _kind(d[1], v)) for d, v in zip(description, values)}
+
+
+def fetch_columns(sql, args=None):
+    """query_columns() through single_flight; the arrays are shared, so don't write to them."""
+    return single_flight.do(("columns",) + query_key(sql, args), lambda: query_columns(sql, args))
+
+
+# Independent queries of one request run here, each on its own pooled
+# connection, so a page costs ~one round trip instead of one per query.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("DB_PARALLELISM", 4)),
+    thread_name_prefix="db",
+)
+
+
+def run_parallel(*calls):
+    """Call each zero-argument function concurrently; results come back in order."""
+    if len(calls) == 1:
+        return [calls[0]()]
+    # Each call gets a copy of our context, so its timings land in this request's
+    futures = [_executor.submit(contextvars.copy_context().run, fn) for fn in calls]
+    return [f.result() for f in futures]
@@ -0,0 +1,304 @@
+"""
+One deploy's portfolio_history, parsed once into arrays.
+
+The per-asset `*_roi` columns arrive as strings like "3.59%", "3.59",
+Decimals or NULL. They are parsed in one vectorized pass into an
+asset × time float64 matrix with NaN for missing values, and every KPI,
+the stop-loss count and the chart series are read off that matrix.
+
+Closed deploys never change, so their finished views are kept for the
+life of the process (see `remember` / `cached`). The sidebar's id/timestamp
+list is cached too, and only re-read when a new deploy shows up.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+import kpis
+import metrics
+from db import fetch_all, fetch_one
+
+STOP_LOSS_TARGET = -0.085
+
+PORTFOLIO_ROI_COLUMNS = ("portfolio_roi", "portfolio_roi_lev")
+
+
+def roi_columns(names):
+    return [c for c in names if c.endswith("_roi")]
+
+
+def _parse_cell(val):
+    """Scalar fallback, same rules as the vectorized path."""
+    if val is None:
+        return np.nan
+    s = str(val).replace("%", "").replace(",", "").strip()
+    try:
+        return float(s) if s else np.nan
+    except ValueError:
+        return np.nan
+
+
+def _parse_text(cells):
+    """Object array of str / None → float64, the same rules as _parse_cell."""
+    if not cells.size:
+        return np.empty(0, dtype=np.float64)
+
+    text = np.char.strip(np.char.replace(np.char.replace(cells.astype(str), "%", ""), ",", ""))
+    text[(cells == None) | (text == "")] = "nan"   # noqa: E711 — elementwise None test
+
+    try:
+        return text.astype(np.float64)
+    except ValueError:
+        # Something unparseable in there: fall back cell by cell
+        return np.vectorize(_parse_cell, otypes=[np.float64])(cells)
+
+
+def parse_roi_matrix(cols, columns):
+    """
+    ROI columns ({name: array}, as from db.query_columns) → float64 matrix
+    shaped (len(columns), rows).
+
+    "3.59%" / "3.59" / 0.0359 all become 0.0359; None, "" and junk become NaN.
+    Numeric columns are taken as they are; only text columns get parsed.
+    """
+    n = len(cols[columns[0]]) if columns else 0
+    out = np.empty((len(columns), n), dtype=np.float64)
+    for i, c in enumerate(columns):
+        col = cols[c]
+        out[i] = _parse_text(col) if col.dtype == object else col
+
+    # Magnitudes above 1 are percents (e.g. 3.5 → 0.035)
+    big = np.abs(out) > 1
+    out[big] /= 100.0
+    return out
+
+
+# ============ HISTORY ==========================================
+
+
+class DeployHistory:
+    """Column arrays for one deploy's portfolio_history rows (ordered by time)."""
+
+    def __init__(self, epoch, balance, roi, btc_close, columns, matrix):
+        self.epoch = epoch                  # int64 epoch seconds
+        self.balance = balance              # float64
+        self.roi = roi                      # float64
+        self.btc_close = btc_close          # float64
+        self.columns = columns              # every *_roi column name
+        self.matrix = matrix                # len(columns) × len(epoch), NaN = missing
+
+    @classmethod
+    def from_columns(cls, cols):
+        """From portfolio_history columns as db.fetch_columns returns them."""
+        with metrics.timed("parse", metrics.parse_seconds, "deploy_history"):
+            columns = roi_columns(cols)
+            return cls(
+                epoch=cols["timestamp_utc"].astype("datetime64[s]").astype(np.int64),
+                balance=cols["portfolio_balance"].astype(np.float64),
+                roi=cols["portfolio_roi"].astype(np.float64),
+                btc_close=cols["BTC_close"].astype(np.float64),
+                columns=columns,
+                matrix=parse_roi_matrix(cols, columns),
+            )
+
+    def __len__(self):
+        return len(self.epoch)
+
+    @property
+    def timestamps(self):
+        """Naive-UTC datetimes, like the rows they came from."""
+        return [datetime.fromtimestamp(int(t), timezone.utc).replace(tzinfo=None) for t in self.epoch]
+
+    def asset_series(self):
+        """{ASSET: [roi decimal or None, ...]} for every per-asset column with any data."""
+        keep = [
+            i for i, c in enumerate(self.columns)
+            if c not in PORTFOLIO_ROI_COLUMNS and not np.isnan(self.matrix[i]).all()
+        ]
+        if not keep:
+            return {}
+
+        block = self.matrix[keep]
+        values = np.where(np.isnan(block), None, block).tolist()
+        return {
+            self.columns[i].replace("_roi", "").upper(): series
+            for i, series in zip(keep, values)
+        }
+
+    def stop_loss_count(self, target=STOP_LOSS_TARGET):
+        """ROI columns whose last value sits on the stop-loss level."""
+        if not len(self):
+            return 0
+        return int(np.count_nonzero(np.abs(self.matrix[:, -1] - target) < 1e-6))
+
+    def kpis(self):
+        if not len(self):
+            return {}
+        return {
+            "total_return_pct": kpis.pct_change(self.balance[0], self.balance[-1]),
+            # Max drawdown on the synthetic 1 + roi curve
+            "max_dd_pct": kpis.max_drawdown(1 + self.roi) * 100,
+            "btc_perf_pct": kpis.pct_change(self.btc_close[0], self.btc_close[-1]),
+            "volatility": kpis.volatility(self.roi),
+            "stop_loss_count": self.stop_loss_count(),
+            "avg_roi_pct": float(np.mean(self.roi)) * 100,
+            "lowest_roi_pct": float(self.roi.min()) * 100,
+        }
+
+    def view(self):
+        """Everything deploy_detail() renders, as plain Python values."""
+        return {
+            "timestamps": [t.isoformat() for t in self.timestamps],
+            "balance": self.balance.tolist(),
+            "roi": self.roi.tolist(),
+            "asset_series": self.asset_series(),
+            **self.kpis(),
+        }
+
+
+# ============ SUMMARY ==========================================
+
+
+def summarize(histories):
+    """
+    Deploy-level KPIs for many (non-empty) deploys at once.
+
+    All series are concatenated and each KPI is one reduceat over the
+    deploy boundaries, so cost is one pass over the rows regardless of how
+    many deploys there are. Returns {kpi: array}, one entry per history.
+    """
+    if not histories:
+        return {}
+
+    sizes = np.array([len(h) for h in histories], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    ends = starts + sizes - 1
+
+    balance = np.concatenate([h.balance for h in histories])
+    roi = np.concatenate([h.roi for h in histories])
+    btc = np.concatenate([h.btc_close for h in histories])
+
+    def pct_change(values):
+        first, last = values[starts], values[ends]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(first != 0, (last / first - 1) * 100, 0.0)
+
+    # Max drawdown on 1 + roi. Lifting each deploy above every value of the
+    # one before lets a single maximum.accumulate restart at each boundary.
+    curve = 1 + roi
+    lift = np.repeat(np.arange(len(histories)), sizes) * (curve.max() - curve.min() + 1)
+    peaks = np.maximum.accumulate(curve + lift) - lift
+    max_dd = np.minimum(np.minimum.reduceat((curve - peaks) / peaks, starts), 0.0)
+
+    # Population std, like kpis.volatility
+    mean = np.add.reduceat(roi, starts) / sizes
+    var = np.add.reduceat((roi - np.repeat(mean, sizes)) ** 2, starts) / sizes
+
+    return {
+        "rows": sizes,
+        "total_return_pct": pct_change(balance),
+        "max_dd_pct": max_dd * 100,
+        "btc_perf_pct": pct_change(btc),
+        "volatility": np.sqrt(var),
+        # Only the last row of each deploy matters here
+        "stop_loss_count": np.array([h.stop_loss_count() for h in histories], dtype=np.int64),
+        "avg_roi_pct": mean * 100,
+        "lowest_roi_pct": np.minimum.reduceat(roi, starts) * 100,
+    }
+
+
+# ============ CACHE ==========================================
+
+# deploy_id → (deploy metadata row, DeployHistory, view). Only closed
+# deploys go in here, and they are never evicted: their rows can't change.
+_closed = {}
+_lock = threading.Lock()
+
+
+def cached(deploy_id):
+    with _lock:
+        return _closed.get(deploy_id)
+
+
+def remember(deploy_id, deploy, history, view):
+    with _lock:
+        _closed[deploy_id] = (deploy, history, view)
+
+
+def is_closed(deploy_id, deploys_list):
+    """A deploy is closed once a newer one exists (deploys_list is newest first)."""
+    return bool(deploys_list) and deploys_list[0]["id"] != deploy_id
+
+
+DEPLOY_HEAD_SQL = """
+    SELECT id, timestamp_utc
+    FROM deploys
+    ORDER BY timestamp_utc DESC, id DESC
+    LIMIT 1
+"""
+
+DEPLOY_LIST_SQL = """
+    SELECT id, timestamp_utc
+    FROM deploys
+    ORDER BY timestamp_utc DESC, id DESC
+"""
+
+
+class DeployIndex:
+    """
+    id + timestamp_utc of every deploy, newest first, for the sidebar.
+
+    Each get() costs at most one indexed LIMIT 1 probe for the newest
+    deploy (none within `min_interval` seconds of the last probe); the full
+    list is only re-read when that probe returns a deploy we haven't seen.
+    Async callers run the same two queries themselves: fresh(), then
+    stale(head) and update(head, rows).
+    """
+
+    def __init__(self, min_interval=5):
+        self.min_interval = min_interval
+        self._list = None
+        self._head = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def fresh(self):
+        """The list if the last probe was within `min_interval`, else None."""
+        if self._list is not None and time.monotonic() - self._checked < self.min_interval:
+            return self._list
+        return None
+
+    @staticmethod
+    def head_of(row):
+        return (row["id"], row["timestamp_utc"]) if row else None
+
+    def stale(self, head):
+        """True if the probe's `head` means the full list must be re-read."""
+        return self._list is None or head != self._head
+
+    def _update(self, head, rows):
+        if rows is not None:
+            self._list = rows
+            self._head = head
+        self._checked = time.monotonic()
+        return self._list
+
+    def update(self, head, rows):
+        """Record a probe (and the re-read list, or None if it wasn't stale); returns the list."""
+        with self._lock:
+            return self._update(head, rows)
+
+    def get(self):
+        # One caller probes; concurrent callers wait for it instead of probing too
+        with self._lock:
+            rows = self.fresh()
+            if rows is not None:
+                return rows
+
+            head = self.head_of(fetch_one(DEPLOY_HEAD_SQL))
+            return self._update(head, fetch_all(DEPLOY_LIST_SQL) if self.stale(head) else None)
+
+
+deploy_index = DeployIndex()
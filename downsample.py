@@ -0,0 +1,89 @@
+"""
+Chart downsampling. Both methods return sorted indices into the input, so
+the caller can pick the same points out of every parallel column.
+"""
+import numpy as np
+
+METHODS = ("lttb", "minmax")
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets. Keeps the first and last point and, for
+    each bucket in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    n_out = max(n_out, 3)
+
+    if n_out >= n:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)   # n_out - 2 buckets
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+
+        # Average point of the next bucket (the last point for the final bucket)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+            avg_x = x[nlo:nhi].mean()
+            avg_y = y[nlo:nhi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+
+    return out
+
+
+def minmax(y, n_out):
+    """
+    Min/max bucketing: split into (n_out - 2) // 2 buckets and keep each bucket's
+    lowest and highest point (in time order), plus the first and last point.
+    Preserves every spike, at the cost of a slightly jagged line.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = y.size
+    if n_out >= n:
+        return np.arange(n)
+
+    buckets = max(1, (n_out - 2) // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    idx = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            seg = y[lo:hi]
+            idx.append(lo + int(np.argmin(seg)))
+            idx.append(lo + int(np.argmax(seg)))
+
+    return np.unique(idx)
+
+
+def select(x, y, max_points, method="lttb"):
+    """
+    Indices of at most max_points points to draw. Points whose y is not
+    finite are never picked.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(np.isfinite(y))
+    if valid.size <= max_points:
+        return valid
+
+    if method == "minmax":
+        keep = minmax(y[valid], max_points)
+    else:
+        keep = lttb(np.asarray(x, dtype=np.float64)[valid], y[valid], max_points)
+
+    return valid[keep]
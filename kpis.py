@@ -0,0 +1,118 @@
+"""
+NumPy KPI engine shared by /kpis and the deploy detail page.
+
+Timestamps are int64 epoch seconds (UTC) and values are float64 arrays, both
+sorted oldest → newest. Point-in-time lookups are binary searches, everything
+else is a single vectorized pass.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+
+DAY = 86400
+
+
+def epoch_of(dt):
+    """Aware or naive-UTC datetime → epoch seconds."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+# ============ PRIMITIVES ==========================================
+
+
+def value_at_or_before(ts, values, target):
+    """Last value with ts <= target, or None if the series starts later."""
+    i = int(np.searchsorted(ts, target, side="right")) - 1
+    return float(values[i]) if i >= 0 else None
+
+
+def max_drawdown(values):
+    """Largest peak-to-trough drop as a fraction (<= 0)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    return min(0.0, float(np.min((values - peaks) / peaks)))
+
+
+def pct_change(first, last):
+    """(last / first - 1) * 100, or 0 when there is no base."""
+    return ((last / first) - 1) * 100 if first else 0
+
+
+def volatility(values):
+    return float(np.std(np.asarray(values, dtype=np.float64)))
+
+
+def daily_closes(ts, values):
+    """Last value of each UTC day → (day_index, closes), where day_index = ts // 86400."""
+    days = ts // DAY
+    if days.size == 0:
+        return days, values[:0]
+    last_of_day = np.flatnonzero(np.diff(days))
+    last_of_day = np.append(last_of_day, days.size - 1)
+    return days[last_of_day], values[last_of_day]
+
+
+# ============ FUND KPIs ==========================================
+
+
+def fund_kpis(ts, eq, start_time, base_capital=20000, closes=None):
+    """
+    Payload for /kpis from the investments_timeseries equity curve.
+    Needs at least two points. Pass precomputed UTC daily `closes` (e.g.
+    from the 1d rollup) to skip the per-tick day grouping.
+    """
+    first_eq = float(eq[0])
+    last_eq = float(eq[-1])
+    now_ts = datetime.fromtimestamp(int(ts[-1]), tz=timezone.utc)
+
+    # 1. Runtime (Days)
+    runtime_days = max(0, int((now_ts - start_time).total_seconds() // DAY))
+
+    # 2. Daily / weekly return %
+    total_return_pct = (last_eq / first_eq - 1) * 100
+    eff_total_return_pct = (last_eq / base_capital - 1) * 100
+    eff_total_return = last_eq - base_capital
+
+    dpr = total_return_pct / runtime_days if runtime_days > 0 else None
+    wpr = dpr * 7 if dpr is not None else None
+
+    # 3. Annual Percentage Return
+    total_days = (int(ts[-1]) - int(ts[0])) / DAY
+    apr = ((last_eq / first_eq) ** (365 / total_days) - 1) * 100 if total_days > 0 else None
+
+    # 4. Returns This Week (Dollars)
+    weekday = now_ts.weekday()   # Monday=0 ... Sunday=6
+    sunday_offset = (weekday + 1) % 7
+    sunday_start = int(ts[-1]) - (int(ts[-1]) % DAY) - sunday_offset * DAY \
+        - now_ts.hour * 3600 - now_ts.minute * 60
+
+    eq_sunday = value_at_or_before(ts, eq, sunday_start)
+    rtw_dollars = last_eq - eq_sunday if eq_sunday else None
+
+    # 5. Lowest Daily Return (LDR)
+    if closes is None:
+        _, closes = daily_closes(ts, eq)
+    daily_returns = (closes[1:] / closes[:-1] - 1) * 100
+    lowest_daily_return = float(daily_returns.min()) if daily_returns.size else None
+
+    # 6. Returns This Month (Dollars)
+    month_start = epoch_of(datetime(now_ts.year, now_ts.month, 1, tzinfo=timezone.utc))
+    eq_month = value_at_or_before(ts, eq, month_start)
+    rtm_dollars = last_eq - eq_month if eq_month else None
+
+    return {
+        "runtime_days": runtime_days,
+        "dpr_pct": dpr,
+        "wpr_pct": wpr,
+        "apr_pct": apr,
+        "rtw_dollars": rtw_dollars,
+        "rtm_dollars": rtm_dollars,
+        "equity": last_eq,
+        "lowest_daily_return": lowest_daily_return,
+        "eff_total_return_pct": eff_total_return_pct,
+        "eff_total_return": eff_total_return,
+    }
@@ -0,0 +1,200 @@
+"""
+Server-Sent Events feed for the dashboards.
+
+One background watcher follows the series store's watermark. When new
+ticks land it builds the events once — the new ticks and whichever KPI
+values changed — and hands the same pre-serialized strings to every
+connected client. DB load depends on the refresh interval, not on how
+many browsers are open. A client is a blocking queue (app.py's WSGI
+route, a worker thread per stream) or an asyncio one (asgi.py, no thread).
+
+Events:
+    ticks   new rows, shaped like /api/investments/timeseries (append them)
+    kpis    /kpis fields whose value changed; the full set on connect
+    reset   the store was reloaded from scratch; refetch everything
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+CLIENT_BACKLOG = 100
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def tick_columns(epoch, cols):
+    """New ticks as timeseries columns (NaN → null)."""
+    def values(arr):
+        return [None if np.isnan(v) else v for v in arr.tolist()]
+
+    return {
+        "timestamps": [
+            datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None).isoformat()
+            for t in epoch.tolist()
+        ],
+        "invested_value": values(cols["invested_value"]),
+        "portfolio_value": values(cols["portfolio_value"]),
+        "total_returns": values(cols["total_returns"]),
+        "returns_diff": values(cols["portfolio_value"] - cols["invested_value"]),
+    }
+
+
+class ClientQueue(queue.Queue):
+    """One blocking consumer's SSE strings (the WSGI route)."""
+
+    def __init__(self):
+        super().__init__(maxsize=CLIENT_BACKLOG)
+
+    def deliver(self, messages):
+        for msg in messages:
+            try:
+                self.put_nowait(msg)
+            except queue.Full:
+                # Client fell too far behind: drop its backlog, make it refetch
+                with self.mutex:
+                    self.queue.clear()
+                self.put_nowait(sse("reset", {}))
+                return
+
+
+class AsyncClientQueue(asyncio.Queue):
+    """
+    One coroutine consumer's SSE strings (asgi.py): the watcher thread hands
+    each batch to the consumer's event loop, which queues it.
+    """
+
+    def __init__(self, loop):
+        super().__init__(maxsize=CLIENT_BACKLOG)
+        self.loop = loop
+
+    def deliver(self, messages):
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, messages)
+        except RuntimeError:
+            pass                      # loop closed: the client is gone
+
+    def _deliver(self, messages):
+        for msg in messages:
+            try:
+                self.put_nowait(msg)
+            except asyncio.QueueFull:
+                while not self.empty():
+                    self.get_nowait()
+                self.put_nowait(sse("reset", {}))
+                return
+
+
+class LiveFeed:
+    """
+    Fan-out of one store's new ticks to any number of SSE clients.
+
+    The watcher thread only runs while someone is subscribed. `kpi_fn()`
+    returns the current KPI dict (or None) and is only called from the
+    watcher, once per batch of new ticks.
+    """
+
+    def __init__(self, store, kpi_fn, interval=5):
+        self.store = store
+        self.kpi_fn = kpi_fn
+        self.interval = interval
+
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pending = []            # (epoch, cols, reset) batches seen since the last drain
+        self._kpis = None             # last KPI dict sent (None while nobody listens)
+
+        store.subscribe(self._on_ticks)
+
+    # ---------------------------------------
+    # clients
+    # ---------------------------------------
+    def subscribe(self):
+        """ClientQueue for a blocking consumer."""
+        return self._add(ClientQueue())
+
+    def subscribe_async(self):
+        """AsyncClientQueue for a coroutine on the running event loop."""
+        return self._add(AsyncClientQueue(asyncio.get_running_loop()))
+
+    def _add(self, q):
+        with self._lock:
+            if self._kpis is not None:
+                q.deliver([sse("kpis", self._kpis)])
+            self._clients.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._clients.discard(q)
+
+    def _broadcast(self, messages):
+        with self._lock:
+            clients = list(self._clients)
+        for q in clients:
+            q.deliver(messages)
+
+    # ---------------------------------------
+    # watcher
+    # ---------------------------------------
+    def _on_ticks(self, epoch, cols, reset):
+        # Called from inside store.refresh(); just queue it, the watcher does the work
+        with self._lock:
+            if self._clients:
+                self._pending.append((epoch, cols, reset))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._clients:
+                    # Nobody saw what happens from here on: the next client
+                    # gets a fresh full set from the next watcher's first drain
+                    self._thread = None
+                    self._kpis = None
+                    self._pending = []
+                    return
+
+            try:
+                self.store.refresh()
+                self._drain()
+            except Exception:
+                log.exception("live feed")
+
+            time.sleep(self.interval)
+
+    def _drain(self):
+        with self._lock:
+            batches, self._pending = self._pending, []
+        if not batches and self._kpis is not None:
+            return
+
+        messages = []
+        if any(reset for _, _, reset in batches):
+            messages.append(sse("reset", {}))
+        elif batches:
+            epoch = np.concatenate([b[0] for b in batches])
+            cols = {k: np.concatenate([b[1][k] for b in batches]) for k in batches[0][1]}
+            messages.append(sse("ticks", tick_columns(epoch, cols)))
+
+        kpis = self.kpi_fn()
+        if kpis is not None:
+            last = self._kpis or {}
+            changed = {k: v for k, v in kpis.items() if last.get(k) != v}
+            self._kpis = kpis
+            if changed:
+                messages.append(sse("kpis", changed))
+
+        self._broadcast(messages)
@@ -0,0 +1,313 @@
+"""
+Load replay: N simulated dashboards doing what the frontend does.
+
+Each dashboard opens a page, then polls the dashboard's data calls every
+`--poll` seconds (staggered, with jitter), revalidating with the
+ETags it got back like a browser would:
+
+    page view   one of PAGES (weighted), then the four calls below
+    poll        /kpis, /api/investments/timeseries?days=N&max_points=1500,
+                /api/daily_closes_full?from=<90 days ago>, /api/portfolio_stats
+    now and then  a range button (new N) or a reload (new page view)
+
+    python loadtest.py --dashboards 50 --poll 5 --duration 60
+    python loadtest.py --url http://127.0.0.1:8000 --dashboards 200
+
+Without --url it serves the app itself (threaded werkzeug, one process)
+on the SQLite stand-in from benchdata.py (or --db). With --url it drives
+whatever is running there, e.g. gunicorn with N workers. DB numbers are
+scraped from /metrics and /api/db/pool. With several workers each scrape
+lands on one of them, so treat those as per-worker samples.
+
+Reports throughput, p50/p99 per endpoint, 304 share, and DB queries,
+connection checkouts and new connections per second.
+"""
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+import benchdata
+
+PAGES = [
+    ("/", 0.6),
+    ("/historical", 0.15),
+    ("/deploys", 0.1),
+    ("/deploys/{deploy}", 0.15),
+]
+POLL = [
+    "/kpis",
+    "/api/investments/timeseries?days={days}&max_points=1500",
+    "/api/daily_closes_full?from={since}",
+    "/api/portfolio_stats",
+]
+RANGES = [1, 3, 7, 30, 90, 180, 365]    # the chart's range buttons
+DEFAULT_RANGE = 3
+
+
+# ============ CLIENT ==========================================
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}                   # endpoint template → [(seconds, status)]
+
+    def add(self, endpoint, seconds, status):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((seconds, status))
+
+    def report(self, elapsed):
+        rows = []
+        total = 0
+        for endpoint, samples in sorted(self.samples.items()):
+            ms = np.array([s for s, _ in samples]) * 1000
+            statuses = [st for _, st in samples]
+            total += len(samples)
+            rows.append({
+                "endpoint": endpoint,
+                "requests": len(samples),
+                "rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                "not_modified": statuses.count(304),
+                "errors": sum(1 for st in statuses if st not in (200, 304)),
+            })
+        everything = np.array([s for v in self.samples.values() for s, _ in v]) * 1000
+        overall = {
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "p50_ms": round(float(np.percentile(everything, 50)), 2) if total else None,
+            "p99_ms": round(float(np.percentile(everything, 99)), 2) if total else None,
+        }
+        return overall, rows
+
+
+class Dashboard(threading.Thread):
+    """One browser tab: keep-alive connection, ETag cache, its own range choice."""
+
+    def __init__(self, base, recorder, args, deploy_ids, stop, seed):
+        super().__init__(daemon=True)
+        self.base = urlsplit(base)
+        self.recorder = recorder
+        self.args = args
+        self.deploy_ids = deploy_ids
+        self.stop = stop
+        self.rng = random.Random(seed)
+        self.days = DEFAULT_RANGE
+        self.etags = {}
+        self.conn = None
+
+    def get(self, template, **params):
+        path = template.format(**params)
+        headers = {"If-None-Match": self.etags[path]} if path in self.etags else {}
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.base.hostname, self.base.port, timeout=60)
+
+        started = time.perf_counter()
+        try:
+            self.conn.request("GET", path, headers=headers)
+            resp = self.conn.getresponse()
+            resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            status = 0
+        self.recorder.add(template, time.perf_counter() - started, status)
+
+        if status == 200 and resp.getheader("ETag"):
+            self.etags[path] = resp.getheader("ETag")
+
+    def page_view(self):
+        page = self.rng.choices([p for p, _ in PAGES], [w for _, w in PAGES])[0]
+        deploy = self.rng.choice(self.deploy_ids) if self.deploy_ids else 1
+        self.get(page, deploy=deploy)
+        if page == "/":
+            self.poll()
+
+    def poll(self):
+        since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - 90 * 86400))
+        for template in POLL:
+            self.get(template, days=self.days, since=since)
+
+    def run(self):
+        interval = self.args.poll
+        # Tabs don't all open in the same instant
+        if self.stop.wait(self.rng.uniform(0, interval)):
+            return
+        self.page_view()
+
+        while not self.stop.wait(interval * self.rng.uniform(0.9, 1.1)):
+            if self.rng.random() < self.args.reload:
+                self.page_view()
+                continue
+            if self.rng.random() < self.args.range_change:
+                self.days = self.rng.choice(RANGES)
+            self.poll()
+
+
+# ============ SERVER-SIDE NUMBERS ==========================================
+
+
+def _fetch(base, path):
+    u = urlsplit(base)
+    conn = http.client.HTTPConnection(u.hostname, u.port, timeout=30)
+    try:
+        conn.request("GET", path)
+        resp = conn.getresponse()
+        return resp.status, resp.read().decode()
+    finally:
+        conn.close()
+
+
+_QUERY_COUNT = re.compile(r"^db_query_duration_seconds_count(?:\{[^}]*\})? (\S+)$", re.MULTILINE)
+
+
+def server_counters(base):
+    """Cumulative query count + pool counters, from /metrics and /api/db/pool."""
+    _, text = _fetch(base, "/metrics")
+    _, pool = _fetch(base, "/api/db/pool")
+    pool = json.loads(pool)
+    return {
+        "queries": sum(float(v) for v in _QUERY_COUNT.findall(text)),
+        "checkouts": pool["created"] + pool["reused"],
+        "created": pool["created"],
+        "coalesced": pool.get("coalesced", 0),
+        "open": pool["open"],
+    }
+
+
+class PoolSampler(threading.Thread):
+    """Peak open connections, sampled once a second."""
+
+    def __init__(self, base, stop):
+        super().__init__(daemon=True)
+        self.base = base
+        self.stop = stop
+        self.peak_open = 0
+        self.peak_in_use = 0
+
+    def run(self):
+        while not self.stop.wait(1.0):
+            try:
+                pool = json.loads(_fetch(self.base, "/api/db/pool")[1])
+            except (OSError, ValueError, http.client.HTTPException):
+                continue
+            self.peak_open = max(self.peak_open, pool["open"])
+            self.peak_in_use = max(self.peak_in_use, pool["in_use"])
+
+
+# ============ MAIN ==========================================
+
+
+def serve_locally(args):
+    """Generate (or reuse) a SQLite dataset and serve the app on a free port."""
+    path = args.db or "/tmp/3mfunds-loadtest.db"
+    if not args.no_generate:
+        conn, dialect = benchdata.open_target(f"sqlite:{path}")
+        try:
+            # The default file is ours to overwrite; one named with --db is not
+            benchdata.generate(conn, dialect, drop_existing=args.drop_existing or args.db is None,
+                               **benchdata.size_kwargs(args))
+        finally:
+            conn.close()
+    benchdata.use_sqlite(path, max_size=args.pool_size)
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def deploy_ids(base):
+    status, body = _fetch(base, "/api/deploys?limit=500")
+    return [d["id"] for d in json.loads(body)["deploys"]] if status == 200 else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the dashboard's request mix.")
+    parser.add_argument("--url", help="drive a running server instead of serving the app here")
+    parser.add_argument("--dashboards", type=int, default=20)
+    parser.add_argument("--poll", type=float, default=5.0, help="seconds between polls")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--reload", type=float, default=0.02, help="chance per poll of a new page view")
+    parser.add_argument("--range-change", type=float, default=0.05, help="chance per poll of a new chart range")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    local = parser.add_argument_group("local server (without --url)")
+    local.add_argument("--db", help="SQLite file (default /tmp/3mfunds-loadtest.db)")
+    local.add_argument("--no-generate", action="store_true", help="reuse the data already in --db")
+    local.add_argument("--drop-existing", action="store_true", help="let generation replace the tables in --db")
+    local.add_argument("--pool-size", type=int, default=10)
+    local.add_argument("--ticks", type=int, default=100_000)
+    benchdata.add_size_args(local)
+    args = parser.parse_args()
+
+    server = None
+    base = args.url
+    if base is None:
+        base, server = serve_locally(args)
+
+    ids = deploy_ids(base)
+    before = server_counters(base)
+    recorder = Recorder()
+    stop = threading.Event()
+    sampler = PoolSampler(base, stop)
+    dashboards = [
+        Dashboard(base, recorder, args, ids, stop, seed=args.seed * 100_003 + k)
+        for k in range(args.dashboards)
+    ]
+
+    started = time.perf_counter()
+    sampler.start()
+    for d in dashboards:
+        d.start()
+    time.sleep(args.duration)
+    stop.set()
+    for d in dashboards:
+        d.join()
+    elapsed = time.perf_counter() - started
+    after = server_counters(base)
+
+    overall, rows = recorder.report(elapsed)
+    db = {
+        "queries_per_s": round((after["queries"] - before["queries"]) / elapsed, 2),
+        "checkouts_per_s": round((after["checkouts"] - before["checkouts"]) / elapsed, 2),
+        "new_connections_per_s": round((after["created"] - before["created"]) / elapsed, 2),
+        "coalesced": after["coalesced"] - before["coalesced"],
+        "peak_open": sampler.peak_open,
+        "peak_in_use": sampler.peak_in_use,
+    }
+
+    if server is not None:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps({"overall": overall, "endpoints": rows, "db": db}, indent=2))
+        return
+
+    print(f"{args.dashboards} dashboards, poll every {args.poll}s, {elapsed:.0f}s against {base}")
+    print(f"{'endpoint':<58}{'req':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'304':>7}{'err':>6}")
+    for r in rows:
+        print(f"{r['endpoint']:<58}{r['requests']:>7}{r['rps']:>9}{r['p50_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['not_modified']:>7}{r['errors']:>6}")
+    print(f"{'total':<58}{overall['requests']:>7}{overall['rps']:>9}{overall['p50_ms']:>9}{overall['p99_ms']:>9}")
+    print(f"db: {db['queries_per_s']} queries/s, {db['checkouts_per_s']} checkouts/s, "
+          f"{db['new_connections_per_s']} new connections/s, {db['coalesced']} coalesced, "
+          f"peak {db['peak_open']} open / {db['peak_in_use']} in use")
+
+
+if __name__ == "__main__":
+    main()
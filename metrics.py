@@ -0,0 +1,232 @@
+"""
+Hot-path timings, exported two ways:
+
+  - Prometheus text at /metrics: latency histograms per route, SQL
+    statement, template render, serialization and connection checkout,
+    plus a counter of rows fetched per statement.
+  - A `Server-Timing` header on every Flask response, summing the same
+    timings for that one request (browser devtools show it per request):
+
+        Server-Timing: acquire;dur=0.4;desc="2x", sql;dur=38.1;desc="2x, 4211 rows",
+                       parse;dur=12.9, render;dur=6.2, total;dur=61.0
+
+Per-request timings live in a context variable, so work done for the
+request on db.run_parallel's threads is counted too (it copies the context).
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import g, request
+from flask.signals import before_render_template, template_rendered
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+# ============ METRICS ==========================================
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}                  # label values → [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, seconds, *labels):
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, le in enumerate(self.buckets):
+                if seconds <= le:
+                    s[i] += 1
+            s[-2] += seconds
+            s[-1] += 1
+
+    def count(self):
+        """Observations so far, all label values together."""
+        with self._lock:
+            return sum(s[-1] for s in self._series.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for labels, s in sorted(series.items()):
+            for le, n in zip([*self.buckets, "+Inf"], [*s[:len(self.buckets)], s[-1]]):
+                lines.append(f"{self.name}_bucket{_labels((*self.labelnames, 'le'), (*labels, le))} {n}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {s[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {s[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for labels, v in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {v}")
+        return lines
+
+
+REGISTRY = []
+
+request_seconds = Histogram("http_request_duration_seconds", "Time spent in the view, per route.",
+                            ("route", "method", "status"))
+sql_seconds = Histogram("db_query_duration_seconds", "Time per SQL statement, execute + fetch.",
+                        ("statement",))
+sql_rows = Counter("db_rows_fetched_total", "Rows fetched, per SQL statement.", ("statement",))
+acquire_seconds = Histogram("db_acquire_duration_seconds", "Time to check a connection out of the pool.")
+render_seconds = Histogram("template_render_duration_seconds", "Jinja render time, per template.",
+                           ("template",))
+serialize_seconds = Histogram("serialize_duration_seconds", "Response body encoding time, per format.",
+                              ("format",))
+parse_seconds = Histogram("parse_duration_seconds", "Time turning query rows into arrays.", ("what",))
+
+
+def sql_totals():
+    """(statements run, rows fetched) by this process so far."""
+    return sql_seconds.count(), sql_rows.total()
+
+
+def render():
+    """The whole registry in Prometheus text format."""
+    return "\n".join(line for m in REGISTRY for line in m.render()) + "\n"
+
+
+# ============ PER-REQUEST TIMINGS ==========================================
+
+
+_timings = ContextVar("timings", default=None)    # list of (name, seconds, rows) for this request
+
+
+def begin():
+    """Start collecting timings for the current request; returns the (live) list."""
+    timings = []
+    _timings.set(timings)
+    return timings
+
+
+def record(name, seconds, rows=None):
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds, rows))     # list.append is atomic; threads may share it
+
+
+@contextmanager
+def timed(name, histogram, *labels):
+    """Time the block into `histogram` and into this request's Server-Timing `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        histogram.observe(seconds, *labels)
+        record(name, seconds)
+
+
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+
+def statement_label(sql):
+    """'SELECT deploys' style label: verb + first table, so label values stay few."""
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else "?"
+    table = _SQL_TABLE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+
+def observe_query(sql, seconds, rows):
+    label = statement_label(sql)
+    sql_seconds.observe(seconds, label)
+    sql_rows.inc(rows, label)
+    record("sql", seconds, rows)
+
+
+def server_timing(timings, total=None):
+    """Header value summing `timings` per name, in first-seen order."""
+    sums = {}
+    for name, seconds, rows in timings:
+        s = sums.setdefault(name, [0.0, 0, None])
+        s[0] += seconds
+        s[1] += 1
+        if rows is not None:
+            s[2] = (s[2] or 0) + rows
+
+    parts = []
+    for name, (seconds, n, rows) in sums.items():
+        desc = [f"{n}x"] if n > 1 else []
+        if rows is not None:
+            desc.append(f"{rows} rows")
+        part = f"{name};dur={seconds * 1000:.1f}"
+        parts.append(part + (f';desc="{", ".join(desc)}"' if desc else ""))
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ============ FLASK ==========================================
+
+
+def init_app(app):
+    """Route timings + Server-Timing header for every request, template render timings."""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_timings = begin()
+
+    @app.after_request
+    def finish_timer(resp):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return resp
+        total = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        request_seconds.observe(total, route, request.method, resp.status_code)
+        # Streamed bodies are produced after this point; `total` covers the view only
+        resp.headers["Server-Timing"] = server_timing(g.metrics_timings, total)
+        return resp
+
+    def before_render(sender, template, context, **extra):
+        g.metrics_render_start = time.perf_counter()
+
+    def rendered(sender, template, context, **extra):
+        start = g.pop("metrics_render_start", None)
+        if start is not None:
+            seconds = time.perf_counter() - start
+            render_seconds.observe(seconds, template.name)
+            record("render", seconds)
+
+    before_render_template.connect(before_render, app, weak=False)
+    template_rendered.connect(rendered, app, weak=False)
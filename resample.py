@@ -0,0 +1,148 @@
+"""
+Timezone-aware resampling on top of the rollup pyramid.
+
+A timezone is turned into a short list of constant-offset segments (one per
+DST regime in the requested range). Each segment is bucketed with a single
+integer offset, so no per-tick timezone conversion ever happens.
+
+A local key is one bucket whatever the interval: the hour repeated when
+clocks fall back lands in the same buckets as its first pass (a 15m
+bucket at 01:15 holds both 01:15s, in time order).
+"""
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pytz
+
+from rollups import FIELDS, combine, concat
+
+DAY = 86400
+
+UNITS = {"m": 60, "h": 3600, "d": DAY}
+
+TZ_ALIASES = {
+    "utc": "UTC",
+    "phx": "America/Phoenix",
+}
+
+
+def parse_interval(text):
+    """'15m' / '1h' / '1d' → seconds. Raises ValueError."""
+    m = re.fullmatch(r"(\d+)([mhd])", (text or "").strip().lower())
+    if not m or int(m.group(1)) == 0:
+        raise ValueError(f"bad interval {text!r} (use e.g. 15m, 1h, 1d)")
+    return int(m.group(1)) * UNITS[m.group(2)]
+
+
+def parse_tz(name):
+    """'utc', 'phx' or an IANA name → tzinfo. Raises ValueError."""
+    try:
+        return pytz.timezone(TZ_ALIASES.get((name or "utc").lower(), name))
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"unknown timezone {name!r}")
+
+
+def parse_time(text, tz):
+    """Epoch seconds or ISO-8601 → epoch seconds. Naive ISO values are read in `tz`."""
+    if text is None or text == "":
+        return None
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = tz.localize(dt) if hasattr(tz, "localize") else dt.replace(tzinfo=tz)
+    return int(dt.timestamp())
+
+
+# ============ OFFSETS ==========================================
+
+
+def _offset_at(tz, t):
+    return int(datetime.fromtimestamp(t, timezone.utc).astimezone(tz).utcoffset().total_seconds())
+
+
+@lru_cache(maxsize=256)
+def _segments(tz, first_day, last_day):
+    """Constant-offset segments covering whole UTC days [first_day, last_day]."""
+    start = first_day * DAY
+    end = (last_day + 1) * DAY
+    segments = []
+    seg_start, seg_off = start, _offset_at(tz, start)
+
+    # Probe once a day; when the offset moved, bisect to the exact second
+    t = start
+    while t < end - 1:
+        probe = min(t + DAY, end - 1)
+        off = _offset_at(tz, probe)
+        if off != seg_off:
+            lo, hi = t, probe
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if _offset_at(tz, mid) == seg_off:
+                    lo = mid
+                else:
+                    hi = mid
+            segments.append((seg_start, hi, seg_off))
+            seg_start, seg_off = hi, off
+        t = probe
+
+    segments.append((seg_start, end, seg_off))
+    return tuple(segments)
+
+
+def offset_segments(tz, start, end):
+    """[(seg_start, seg_end, utc_offset_seconds)] covering [start, end)."""
+    segs = _segments(tz, start // DAY, (end - 1) // DAY)
+    return [(max(a, start), min(b, end), off) for a, b, off in segs if b > start and a < end]
+
+
+def local_offsets(tz, epoch):
+    """Per-tick UTC offsets for a sorted epoch array, without per-tick conversion."""
+    epoch = np.asarray(epoch, dtype=np.int64)
+    if not epoch.size:
+        return np.empty(0, np.int64)
+    segs = offset_segments(tz, int(epoch[0]), int(epoch[-1]) + 1)
+    starts = np.array([a for a, _, _ in segs], dtype=np.int64)
+    offs = np.array([off for _, _, off in segs], dtype=np.int64)
+    return offs[np.searchsorted(starts, epoch, "right") - 1]
+
+
+# ============ RESAMPLE ==========================================
+
+
+def ohlc(pyramid, interval, tz=pytz.UTC, since=None, until=None):
+    """
+    OHLC of the pyramid's column over [since, until) in `interval`-second
+    buckets aligned to local wall-clock time in `tz`. Bucket keys are
+    local-time starts expressed as epoch seconds (i.e. naive local time).
+    """
+    epoch, _ = pyramid.store.arrays()
+    if not epoch.size:
+        return combine(concat([]), interval)
+
+    start = since if since is not None else int(epoch[0])
+    end = until if until is not None else int(epoch[-1]) + 1
+    if end <= start:
+        return combine(concat([]), interval)
+
+    pieces, offsets = [], []
+    for a, b, off in offset_segments(tz, start, end):
+        piece = pyramid.ohlc(interval, a, b, off)
+        pieces.append(piece)
+        offsets.append(np.full(piece["first_ts"].size, off, dtype=np.int64))
+
+    # Buckets cut by a DST switch show up once per segment, and after a
+    # fall-back the repeated local keys aren't even adjacent: group rows by
+    # local key (stable, so each group stays in time order), then merge
+    table = concat(pieces)
+    offsets = np.concatenate(offsets)
+    order = np.argsort((table["first_ts"] + offsets) // interval, kind="stable")
+    return combine({f: table[f][order] for f in FIELDS}, interval, offsets[order])
+
+
+def bucket_label(key, interval):
+    """Local bucket key → 'YYYY-MM-DD' for day-sized buckets, ISO date-time otherwise."""
+    dt = datetime.fromtimestamp(int(key), timezone.utc).replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%d") if interval % DAY == 0 else dt.isoformat(timespec="minutes")
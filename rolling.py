@@ -0,0 +1,284 @@
+"""
+Rolling risk series (Sharpe, Sortino, volatility, drawdown) over trailing
+time windows of an equity curve.
+
+Per-tick returns are kept as prefix sums (of r, r² and min(r, 0)²), so the
+mean / std / downside deviation of any window is two lookups, whatever its
+length. The rolling peak behind the drawdown comes from range_max(), a
+doubling table built one level at a time: O(n log w), O(n) memory.
+
+A window at tick i covers the ticks in (t_i - window, t_i]. Ratios are
+annualized from the window's own tick rate, with a zero risk-free rate;
+volatility is the annualized population std of returns, in percent.
+NULL values are carried forward (a zero return), so rows line up with
+the store's ticks one to one.
+
+RollingSeries follows a SeriesStore. Every column is append-only, so the
+store's leader extends them from new ticks into a buffer from
+store.derived_buffer() that every worker maps; a reader only computes the
+few ticks the leader hasn't published yet.
+"""
+import threading
+
+import numpy as np
+
+import kpis
+from resample import parse_interval
+from series import investments
+
+YEAR = 365 * kpis.DAY
+
+WINDOWS = ("24h", "7d", "30d")
+
+# Returns of the first ticks set the shift (see extend_columns) when a
+# buffer is built; everything appended to it after reuses that shift
+SHIFT_SAMPLE = 1000
+
+
+def parse_windows(text):
+    """'24h,7d' → [('24h', 86400), ('7d', 604800)]. Raises ValueError."""
+    labels = [w.strip() for w in (text or "").split(",") if w.strip()] or list(WINDOWS)
+    return [(label, parse_interval(label)) for label in dict.fromkeys(labels)]
+
+
+# ============ PRIMITIVES ==========================================
+
+
+def range_max(values, lo, hi):
+    """max(values[lo[i]:hi[i] + 1]) for every i (lo <= hi), ignoring NaN."""
+    lo = np.asarray(lo, dtype=np.int64)
+    hi = np.asarray(hi, dtype=np.int64)
+    out = np.empty(lo.size)
+    if not lo.size:
+        return out
+
+    # Level j holds max(values[x:x + 2**j]); a range of length L is covered
+    # by two (overlapping) blocks of the largest 2**j <= L
+    level = np.floor(np.log2(hi - lo + 1)).astype(np.int64)
+    table = np.asarray(values, dtype=np.float64)
+    for j in range(int(level.max()) + 1):
+        q = np.flatnonzero(level == j)
+        if q.size:
+            out[q] = np.fmax(table[lo[q]], table[hi[q] - (1 << j) + 1])
+        table = np.fmax(table[:-(1 << j)], table[(1 << j):])
+    return out
+
+
+def window_starts(epoch, idx, seconds):
+    """First tick inside (t - seconds, t] for each tick index in `idx`."""
+    return np.searchsorted(epoch, epoch[idx] - seconds, "right")
+
+
+def ffill(values, prev=np.nan):
+    """NaN → the last finite value before it (`prev` for leading ones)."""
+    values = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(values)
+    if ok.all():
+        return values
+    last = np.maximum.accumulate(np.where(ok, np.arange(values.size), -1))
+    return np.where(last >= 0, values[np.maximum(last, 0)], prev)
+
+
+def returns(values, prev=None):
+    """Tick-to-tick simple returns of carried-forward values; 0 where there's no base."""
+    if not values.size:
+        return values
+    before = np.r_[values[0] if prev is None else prev, values[:-1]]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = values / before - 1
+    r[~np.isfinite(r)] = 0.0
+    return r
+
+
+def shift_of(values):
+    """Mean of the first returns: subtracted before the r² sums so var = E[r²] - E[r]² doesn't cancel."""
+    r = returns(ffill(values[:SHIFT_SAMPLE]))
+    return float(r[1:].mean()) if r.size > 1 else 0.0
+
+
+def shift_in(head):
+    """The shift a published head was built with: tick 0 has no return, so s1[0] = -shift."""
+    return -float(head["s1"][0])
+
+
+def select(epoch, since=None, max_points=None):
+    """Tick indices from `since` on, thinned to at most `max_points` evenly spaced ones (last kept)."""
+    first = int(np.searchsorted(epoch, since, "left")) if since is not None else 0
+    if max_points is None or epoch.size - first <= max_points:
+        return np.arange(first, epoch.size)
+    return np.unique(np.linspace(first, epoch.size - 1, max_points).round().astype(np.int64))
+
+
+# ============ COLUMNS ==========================================
+
+
+def column_names(tracked):
+    """Buffer layout: epoch first (the int64 column), then one float64 per name."""
+    return ["epoch", "value", "s1", "s2", "d2", *[f"peak_{s}" for s in tracked]]
+
+
+def extend_columns(epoch, values, start, head, shift, tracked=()):
+    """
+    Rolling columns for ticks start.. of a series (`epoch` / `values` are
+    the whole arrays). `head` holds the columns of ticks ..start-1 (it may
+    run longer); it's only read near `start`, and unused when start == 0.
+    """
+    prev = head["value"][start - 1] if start else np.nan
+    v = ffill(values[start:], prev)
+    r = returns(v, prev if start else None)
+
+    def prefix(name, terms):
+        return np.cumsum(terms) + (head[name][start - 1] if start else 0.0)
+
+    cols = {
+        "epoch": np.asarray(epoch[start:], dtype=np.int64),
+        "value": v,
+        "s1": prefix("s1", r - shift),
+        "s2": prefix("s2", (r - shift) ** 2),
+        "d2": prefix("d2", np.minimum(r, 0.0) ** 2),
+    }
+
+    # Each new tick's peak looks back at most one window
+    idx = np.arange(start, epoch.size)
+    for seconds in tracked:
+        if not idx.size:
+            cols[f"peak_{seconds}"] = np.empty(0)
+            continue
+        lo = window_starts(epoch, idx, seconds)
+        base = int(lo[0])
+        window_values = np.concatenate([head["value"][base:start], v]) if base < start else v[base - start:]
+        cols[f"peak_{seconds}"] = range_max(window_values, lo - base, idx - base)
+    return cols
+
+
+class RollingView:
+    """
+    Rolling columns for one read of a curve: `head` (published, ticks
+    ..start-1) and `tail` (computed for this read, ticks start..).
+    """
+
+    def __init__(self, epoch, head, tail, start, shift):
+        self.epoch = epoch
+        self.head = head
+        self.tail = tail
+        self.start = start
+        self.shift = shift
+
+    @classmethod
+    def of(cls, epoch, values):
+        """Everything computed here, for a curve nobody publishes (e.g. one deploy)."""
+        epoch = np.asarray(epoch, dtype=np.int64)
+        shift = shift_of(values)
+        return cls(epoch, {}, extend_columns(epoch, values, 0, None, shift), 0, shift)
+
+    def _take(self, name, ix):
+        if not self.start:
+            return self.tail[name][ix]
+        out = np.empty(ix.size, dtype=self.tail[name].dtype)
+        old = ix < self.start
+        out[old] = self.head[name][ix[old]]
+        out[~old] = self.tail[name][ix[~old] - self.start]
+        return out
+
+    def values(self):
+        if not self.start:
+            return self.tail["value"]
+        return np.concatenate([self.head["value"][:self.start], self.tail["value"]])
+
+    def series(self, seconds, idx):
+        """
+        {sharpe, sortino, volatility_pct, drawdown_pct} at tick indices `idx`
+        over trailing `seconds` windows. NaN where the window holds fewer
+        than two ticks or has no spread.
+        """
+        idx = np.asarray(idx, dtype=np.int64)
+        lo = window_starts(self.epoch, idx, seconds)
+
+        if f"peak_{seconds}" in self.tail:
+            peak = self._take(f"peak_{seconds}", idx)
+        else:
+            peak = range_max(self.values(), lo, idx)
+
+        # Returns inside the window are those of ticks lo+1 .. i
+        n = (idx - lo).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_shifted = (self._take("s1", idx) - self._take("s1", lo)) / n
+            mean = mean_shifted + self.shift
+            s2 = self._take("s2", idx)
+            variance = (s2 - self._take("s2", lo)) / n - mean_shifted ** 2
+            # Differences of long prefix sums carry rounding noise of about
+            # eps * s2: a window below that has no spread (e.g. a NULL gap)
+            variance[variance <= 64 * np.finfo(np.float64).eps * s2 / n] = 0.0
+            std = np.sqrt(variance)
+            downside = np.sqrt((self._take("d2", idx) - self._take("d2", lo)) / n)
+            annualize = np.sqrt(n * YEAR / (self.epoch[idx] - self.epoch[lo]))
+
+            out = {
+                "sharpe": mean / std * annualize,
+                "sortino": mean / downside * annualize,
+                "volatility_pct": std * annualize * 100,
+                "drawdown_pct": (self._take("value", idx) / peak - 1) * 100,
+            }
+
+        for key in ("sharpe", "sortino", "volatility_pct"):
+            out[key][n < 2] = np.nan
+        for v in out.values():
+            v[~np.isfinite(v)] = np.nan
+        return out
+
+
+# ============ STORE FOLLOWER ==========================================
+
+
+class RollingSeries:
+    """Rolling columns for one SeriesStore column, extended as the store takes new ticks."""
+
+    def __init__(self, store, column, windows=WINDOWS):
+        self.store = store
+        self.column = column
+        self.tracked = tuple(parse_interval(w) for w in windows)     # windows with stored peaks
+        self.buffer = store.derived_buffer(f"{column}.rolling", column_names(self.tracked))
+        self._lock = threading.Lock()
+        store.subscribe(self._on_ticks)
+
+    def _on_ticks(self, epoch, cols, reset):
+        if not self.store.publishing():
+            return                  # the leader extends the columns; we map them
+        epoch, cols = self.store.peek()
+        values = cols[self.column]
+        generation = self.store.generation
+
+        with self._lock:
+            view = None if reset else self.buffer.view()
+            if view is None or view[0] != generation:
+                new = extend_columns(epoch, values, 0, None, shift_of(values), self.tracked)
+                self.buffer.reset(new["epoch"], new, generation)
+                return
+
+            _, published, head = view
+            start = published.size
+            if epoch.size > start:
+                # Not shift_of(values): its sample grows with a short series
+                shift = shift_in(head) if start else shift_of(values)
+                new = extend_columns(epoch, values, start, head, shift, self.tracked)
+                self.buffer.append(new["epoch"], new)
+
+    def current(self):
+        """RollingView over the store's ticks as of now (refreshing first)."""
+        epoch, cols = self.store.arrays()
+        values = cols[self.column]
+        generation = self.store.generation
+
+        view = self.buffer.view()
+        if view is None or view[0] != generation:
+            # Not built for this load yet (the leader is on it): all computed here
+            head, start = {}, 0
+        else:
+            _, published, head = view
+            start = min(published.size, epoch.size)
+        shift = shift_in(head) if start else shift_of(values)
+        tail = extend_columns(epoch, values, start, head, shift, self.tracked)
+        return RollingView(epoch, head, tail, start, shift)
+
+
+fund_rolling = RollingSeries(investments, "portfolio_value")
@@ -0,0 +1,218 @@
+"""
+OHLC rollup pyramid (1m / 1h / 1d) over a SeriesStore column.
+
+Each level keeps, per bucket: open/high/low/close, first/last tick time and
+tick count, as parallel NumPy arrays. Only closed buckets (a later tick
+exists) are stored, so a level is append-only: the store's leader extends
+it from new ticks on every refresh and rebuilds it on a full reload, into a
+buffer from store.derived_buffer() that every worker maps. The open last
+bucket is rebuilt from raw ticks on each read, at most one bucket's worth.
+
+ohlc() answers a range query at any interval that is a multiple of one of
+the levels: the aligned middle of the range comes from the coarsest level
+that fits, the ragged edges from finer levels and finally raw ticks.
+"""
+import threading
+
+import numpy as np
+
+from series import investments
+
+RESOLUTIONS = (("1m", 60), ("1h", 3600), ("1d", 86400))
+
+FIELDS = ("bucket", "open", "high", "low", "close", "first_ts", "last_ts", "count")
+
+# Stored as float64 in the buffers (exact below 2**53), int64 in tables
+INT_FIELDS = ("bucket", "first_ts", "last_ts", "count")
+
+
+# ============ AGGREGATION ==========================================
+
+
+def _empty():
+    return {
+        "bucket": np.empty(0, np.int64),
+        "open": np.empty(0), "high": np.empty(0), "low": np.empty(0), "close": np.empty(0),
+        "first_ts": np.empty(0, np.int64), "last_ts": np.empty(0, np.int64),
+        "count": np.empty(0, np.int64),
+    }
+
+
+def from_ticks(epoch, values):
+    """One pseudo-bucket per tick, so raw ticks and rollup rows combine the same way."""
+    ok = np.isfinite(values)
+    epoch, values = epoch[ok], values[ok]
+    return {
+        "bucket": epoch,
+        "open": values, "high": values, "low": values, "close": values,
+        "first_ts": epoch, "last_ts": epoch,
+        "count": np.ones(epoch.size, np.int64),
+    }
+
+
+def combine(table, seconds, offset=0):
+    """
+    Regroup rows of `table` (time-ordered) into `seconds`-wide buckets.
+    Bucket keys are local-time starts: floor((first_ts + offset) / seconds) * seconds.
+    `offset` is a UTC offset in seconds, either one value or one per row.
+    """
+    n = table["first_ts"].size
+    if n == 0:
+        return _empty()
+
+    keys = (table["first_ts"] + offset) // seconds * seconds
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    return {
+        "bucket": keys[starts],
+        "open": table["open"][starts],
+        "high": np.maximum.reduceat(table["high"], starts),
+        "low": np.minimum.reduceat(table["low"], starts),
+        "close": table["close"][ends],
+        "first_ts": table["first_ts"][starts],
+        "last_ts": table["last_ts"][ends],
+        "count": np.add.reduceat(table["count"], starts),
+    }
+
+
+def concat(tables):
+    tables = [t for t in tables if t["first_ts"].size]
+    if not tables:
+        return _empty()
+    return {f: np.concatenate([t[f] for t in tables]) for f in FIELDS}
+
+
+def _slice(table, lo, hi):
+    return {f: table[f][lo:hi] for f in FIELDS}
+
+
+# ============ LEVELS ==========================================
+
+
+def _between(table, start, end):
+    """Rows of a bucket table with start <= bucket < end (None = open-ended), as int/float arrays."""
+    b = table["bucket"]
+    lo = int(np.searchsorted(b, start, "left")) if start is not None else 0
+    hi = int(np.searchsorted(b, end, "left")) if end is not None else b.size
+    return {f: table[f][lo:hi].astype(np.int64 if f in INT_FIELDS else np.float64, copy=False) for f in FIELDS}
+
+
+class LevelSnapshot:
+    """One level as of one read: the stored closed buckets plus the open tail."""
+
+    def __init__(self, seconds, closed, tail):
+        self.seconds = seconds
+        self.closed = closed
+        self.tail = tail
+
+    def between(self, start, end):
+        """Buckets fully inside [start, end) — both ends must be bucket-aligned."""
+        return concat([_between(self.closed, start, end), _between(self.tail, start, end)])
+
+
+class Rollup:
+    """One resolution level. Buckets are UTC-aligned."""
+
+    def __init__(self, name, seconds, buffer):
+        self.name = name
+        self.seconds = seconds
+        self.buffer = buffer
+
+    def _open_from(self, epoch, closed):
+        """Index of the first tick after the last closed bucket."""
+        if not closed.size:
+            return 0
+        return int(np.searchsorted(epoch, closed[-1] + self.seconds, "left"))
+
+    def publish(self, epoch, values, generation, reset):
+        """Store the buckets closed by the series' ticks so far (leader only)."""
+        view = None if reset else self.buffer.view()
+        if view is None or view[0] != generation:
+            table = combine(from_ticks(epoch, values), self.seconds)
+            closed = _slice(table, 0, -1) if table["bucket"].size else table
+            self.buffer.reset(closed["bucket"], closed, generation)
+            return
+
+        # Only the ticks of the open bucket and later can close anything
+        start = self._open_from(epoch, view[1])
+        table = combine(from_ticks(epoch[start:], values[start:]), self.seconds)
+        if table["bucket"].size > 1:
+            closed = _slice(table, 0, -1)
+            self.buffer.append(closed["bucket"], closed)
+
+    def snapshot(self, epoch, values, generation):
+        view = self.buffer.view()
+        if view is None or view[0] != generation:
+            # Not built for this load yet (the leader is on it): all from ticks
+            return LevelSnapshot(self.seconds, _empty(), combine(from_ticks(epoch, values), self.seconds))
+
+        _, buckets, cols = view
+        start = self._open_from(epoch, buckets)
+        tail = combine(from_ticks(epoch[start:], values[start:]), self.seconds)
+        return LevelSnapshot(self.seconds, {"bucket": buckets, **cols}, tail)
+
+
+class RollupPyramid:
+
+    def __init__(self, store, column):
+        self.store = store
+        self.column = column
+        self.levels = [
+            Rollup(name, seconds, store.derived_buffer(f"{column}.{name}", list(FIELDS)))
+            for name, seconds in RESOLUTIONS
+        ]
+        self._lock = threading.Lock()
+        store.subscribe(self._on_ticks)
+
+    def _on_ticks(self, epoch, cols, reset):
+        if not self.store.publishing():
+            return                  # the leader builds the levels; we map them
+        all_epoch, all_cols = self.store.peek()
+        with self._lock:
+            for level in self.levels:
+                level.publish(all_epoch, all_cols[self.column], self.store.generation, reset)
+
+    # ---------------------------------------
+    # queries
+    # ---------------------------------------
+    def _usable(self, interval, offset):
+        """Levels whose buckets nest inside `interval` buckets shifted by `offset`, fine → coarse."""
+        return [lvl for lvl in self.levels if interval % lvl.seconds == 0 and offset % lvl.seconds == 0]
+
+    def ohlc(self, interval, since=None, until=None, offset=0):
+        """
+        OHLC over [since, until) (epoch seconds, None = open-ended) in
+        `interval`-second buckets. `offset` shifts bucket edges to local
+        time, e.g. -25200 for Phoenix days.
+        """
+        epoch, cols = self.store.arrays()
+        values = cols[self.column]
+        generation = self.store.generation
+        levels = [lvl.snapshot(epoch, values, generation) for lvl in self._usable(interval, offset)]
+        return combine(concat(self._collect(levels, epoch, values, since, until)), interval, offset)
+
+    def _collect(self, levels, epoch, values, since, until):
+        if not levels:
+            lo = int(np.searchsorted(epoch, since, "left")) if since is not None else 0
+            hi = int(np.searchsorted(epoch, until, "left")) if until is not None else epoch.size
+            return [from_ticks(epoch[lo:hi], values[lo:hi])]
+
+        level, finer = levels[-1], levels[:-1]
+        s = level.seconds
+        a = -(-since // s) * s if since is not None else None     # first aligned edge
+        b = until // s * s if until is not None else None          # last aligned edge
+
+        if a is not None and b is not None and a >= b:
+            return self._collect(finer, epoch, values, since, until)
+
+        pieces = []
+        if a is not None and a != since:
+            pieces += self._collect(finer, epoch, values, since, a)
+        pieces.append(level.between(a, b))
+        if b is not None and b != until:
+            pieces += self._collect(finer, epoch, values, b, until)
+        return pieces
+
+
+portfolio_rollups = RollupPyramid(investments, "portfolio_value")
@@ -0,0 +1,357 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from db import query_columns
+from shared import LocalColumns, SharedColumns
+
+log = logging.getLogger(__name__)
+
+LOAD_BATCH = 10000
+
+# Set (ideally to a tmpfs path) when running several worker processes
+SHARED_SERIES_DIR = os.getenv("SHARED_SERIES_DIR")
+
+# How long a worker waits for the leader's first load before serving an empty series
+FIRST_LOAD_WAIT = float(os.getenv("SERIES_FIRST_LOAD_WAIT", 60))
+
+
+def to_epoch(values):
+    """Naive-UTC datetimes (or a single datetime) → int64 epoch seconds."""
+    return np.asarray(values, dtype="datetime64[s]").astype(np.int64)
+
+
+def _columns(rows, names):
+    # Dict rows from other drivers (see ingest()); our own queries use query_columns
+    with metrics.timed("parse", metrics.parse_seconds, "series"):
+        epoch = to_epoch([r["timestamp_utc"] for r in rows])
+        cols = {
+            name: np.array([np.nan if r[name] is None else float(r[name]) for r in rows], dtype=np.float64)
+            for name in names
+        }
+    return epoch, cols
+
+
+def _freeze(arr):
+    arr.flags.writeable = False
+    return arr
+
+
+class SeriesStore:
+    """
+    Process-level copy of an append-only timeseries table.
+
+    The first read loads the whole table. After that each refresh only asks
+    MySQL for rows newer than the last `timestamp_utc` we've seen (the
+    watermark), so query cost tracks new rows instead of table size.
+
+    The data is held as an int64 epoch-seconds array plus one float64 array
+    per numeric column (NaN for NULL), see arrays(). latest() builds
+    DictCursor-shaped dicts from them on demand. Arrays handed out are
+    read-only and stay valid after later refreshes.
+
+    With `shared` (a SharedColumns), only the process holding its lock talks
+    to MySQL; it publishes the columns into a memory-mapped file and every
+    process, itself included, serves views of that one buffer. Each process
+    runs a refresher thread: in the leader it keeps the buffer current
+    whether or not that worker gets requests, elsewhere it maps what was
+    published and takes the lock over if the leader goes away. Arrays
+    derived from the series live in buffers from derived_buffer(), written
+    by the leader's listeners (see publishing()).
+
+    Late inserts with a timestamp at or before the watermark are only picked
+    up by a full reload, which happens every `full_reload_every` seconds.
+    """
+
+    def __init__(self, table, columns, min_interval=5, full_reload_every=3600, shared=None):
+        self.table = table
+        self.columns = columns
+        self.min_interval = min_interval
+        self.full_reload_every = full_reload_every
+        self.shared = shared
+
+        self._numeric = [c for c in columns if c != "timestamp_utc"]
+        self._epoch, self._cols = self._empty_columns()
+        self._resets = 0                       # full loads seen (shared buffers count them too)
+        self._tail_from = None                 # exact timestamp_utc of the last row fetched
+        self._listeners = []
+        self._lock = threading.Lock()          # guards _epoch/_cols
+        self._fetch_lock = threading.Lock()    # one loader at a time; readers never wait on MySQL
+        self._last_refresh = float("-inf")
+        self._last_full_load = float("-inf")
+        self._refresher_pid = None
+
+    # ---------------------------------------
+    # loading
+    # ---------------------------------------
+    def subscribe(self, fn):
+        """
+        Call fn(epoch, cols, reset) with every batch of new ticks. reset=True
+        means the batch is the whole table (first load or full reload).
+        """
+        self._listeners.append(fn)
+        if len(self._epoch):
+            fn(self._epoch, self._cols, True)
+
+    def _notify(self, epoch, cols, reset):
+        # One broken listener must not starve the others (or fail the refresh)
+        for fn in self._listeners:
+            try:
+                fn(epoch, cols, reset)
+            except Exception:
+                log.exception("series listener (%s)", self.table)
+
+    def _empty_columns(self):
+        return _columns([], self._numeric)
+
+    @property
+    def watermark(self):
+        """Naive-UTC datetime of the newest tick (whole seconds), or None."""
+        epoch = self._epoch
+        return epoch[-1].astype("datetime64[s]").item() if len(epoch) else None
+
+    def leads(self):
+        """True if this process is the one that queries MySQL for this store."""
+        return self.shared is None or self.shared.try_lead()
+
+    def publishing(self):
+        """True if listeners are being called by the leader, i.e. should write derived buffers."""
+        return self.shared is None or self.shared.leading
+
+    @property
+    def generation(self):
+        """Full loads seen so far; derived buffers are only valid for the generation they were built from."""
+        return self._resets
+
+    def derived_buffer(self, name, names):
+        """Column buffer for arrays derived from this series: shared like the series, or in-process."""
+        if self.shared is None:
+            return LocalColumns(names)
+        return SharedColumns(f"{self.shared.path}.{name}", names)
+
+    def _select(self):
+        cols = ", ".join(["timestamp_utc"] + [c for c in self.columns if c != "timestamp_utc"])
+        return f"SELECT {cols} FROM {self.table}"
+
+    def reload(self):
+        with self._fetch_lock:
+            self._reload()
+
+    def _query(self, sql, args=None):
+        """(epoch, cols, exact last timestamp_utc or None), read straight into columns."""
+        result = query_columns(sql, args, batch=LOAD_BATCH)
+        stamps = result["timestamp_utc"]
+        epoch = stamps.astype("datetime64[s]").astype(np.int64)
+        cols = {k: result[k].astype(np.float64, copy=False) for k in self._numeric}
+        return epoch, cols, stamps[-1].item() if len(stamps) else None
+
+    def _reload(self):
+        # Unbuffered: the driver never holds the whole result next to our copy
+        epoch, cols, last = self._query(self._select() + " ORDER BY timestamp_utc ASC")
+
+        resets = self._resets + 1
+        if self.shared is not None:
+            self.shared.reset(epoch, cols, resets)
+            _, epoch, cols = self.shared.view()
+
+        with self._lock:
+            self._epoch = _freeze(epoch)
+            self._cols = {k: _freeze(v) for k, v in cols.items()}
+            self._resets = resets
+            self._tail_from = last
+        self._last_full_load = self._last_refresh = time.monotonic()
+        self._notify(self._epoch, self._cols, True)
+
+    def refresh(self, force=False):
+        """Pull rows past the watermark. Cheap no-op inside `min_interval`."""
+        self._start_refresher()
+        if not force and time.monotonic() - self._last_refresh < self.min_interval:
+            return
+
+        with self._fetch_lock:
+            # Another thread may have refreshed while we waited for the lock
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.min_interval:
+                return
+            if not self.leads() and self._wait_for_leader():
+                return self._follow()
+            if self.reload_due():
+                return self._reload()
+
+            epoch, cols, last = self._query(*self.tail_query())
+            if last is not None:
+                self._append(epoch, cols, last)
+            self._last_refresh = time.monotonic()
+
+    def _start_refresher(self):
+        # Per process: threads don't survive a fork, so check the pid
+        if self.shared is None or self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        threading.Thread(target=self._refresh_loop, name=f"series-{self.table}", daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("series refresher (%s)", self.table)
+            # A little under min_interval, so request-side refresh() stays a no-op
+            time.sleep(self.min_interval * 0.8)
+
+    def _wait_for_leader(self):
+        """
+        Before the first full load is published, wait for it instead of
+        serving an empty series. False if we took the lock over meanwhile
+        (the leader died), so the caller loads it itself.
+        """
+        if self._resets:
+            return True
+        deadline = time.monotonic() + FIRST_LOAD_WAIT
+        while self.shared.view() is None and time.monotonic() < deadline:
+            if self.shared.try_lead():
+                return False
+            time.sleep(0.05)
+        return True
+
+    def reload_due(self):
+        return self._tail_from is None or time.monotonic() - self._last_full_load > self.full_reload_every
+
+    def tail_query(self):
+        """(sql, args) for the rows past the watermark."""
+        return (
+            self._select() + " WHERE timestamp_utc > %s ORDER BY timestamp_utc ASC",
+            (self._tail_from,),
+        )
+
+    def ingest(self, new_rows):
+        """
+        Append rows fetched elsewhere with tail_query() (e.g. by the async
+        driver). Returns False without doing anything if a refresh is
+        already in flight; the rows will be picked up by that one or the next.
+        """
+        if not self._fetch_lock.acquire(blocking=False):
+            return False
+        try:
+            # Drop anything a concurrent refresh already appended
+            since = self._tail_from
+            self._ingest([r for r in new_rows if since is None or r["timestamp_utc"] > since])
+        finally:
+            self._fetch_lock.release()
+        return True
+
+    def _ingest(self, new_rows):
+        if new_rows:
+            epoch, cols = _columns(new_rows, self._numeric)
+            self._append(epoch, cols, new_rows[-1]["timestamp_utc"])
+        self._last_refresh = time.monotonic()
+
+    def _append(self, epoch, cols, last):
+        if self.shared is not None:
+            self.shared.append(epoch, cols)
+            _, all_epoch, all_cols = self.shared.view()
+        else:
+            # Fresh arrays each time, so slices handed out earlier stay valid
+            all_epoch = np.concatenate([self._epoch, epoch])
+            all_cols = {k: np.concatenate([self._cols[k], cols[k]]) for k in self._cols}
+
+        with self._lock:
+            self._epoch = _freeze(all_epoch)
+            self._cols = {k: _freeze(v) for k, v in all_cols.items()}
+            self._tail_from = last
+        self._notify(epoch, cols, False)
+
+    def _follow(self):
+        """Non-leader refresh: pick up whatever the leader has published."""
+        snap = self.shared.view()
+        if snap is not None:
+            resets, epoch, cols = snap
+            with self._lock:
+                old = len(self._epoch)
+                reset = resets != self._resets
+                self._epoch, self._cols, self._resets = epoch, cols, resets
+
+            if reset:
+                self._notify(epoch, cols, True)
+            elif len(epoch) > old:
+                self._notify(epoch[old:], {k: v[old:] for k, v in cols.items()}, False)
+        self._last_refresh = time.monotonic()
+
+    # ---------------------------------------
+    # reads (all refresh first)
+    # ---------------------------------------
+    def _bounds(self, epoch, since, until):
+        lo = int(np.searchsorted(epoch, to_epoch(since), "left")) if since is not None else 0
+        hi = int(np.searchsorted(epoch, to_epoch(until), "right")) if until is not None else len(epoch)
+        return lo, hi
+
+    def _row(self, epoch, cols, i):
+        row = {"timestamp_utc": epoch[i].astype("datetime64[s]").item()}
+        for k in self._numeric:
+            v = float(cols[k][i])
+            row[k] = None if v != v else v
+        return row
+
+    def arrays(self, since=None, until=None):
+        """
+        (epoch_seconds, {column: float64}) for since <= timestamp_utc <= until.
+        The arrays are read-only and shared.
+        """
+        self.refresh()
+        with self._lock:
+            epoch, cols = self._epoch, self._cols
+        lo, hi = self._bounds(epoch, since, until)
+        return epoch[lo:hi], {k: v[lo:hi] for k, v in cols.items()}
+
+    def peek(self):
+        """(epoch, cols) as they are now, without refreshing (safe inside listeners)."""
+        with self._lock:
+            return self._epoch, self._cols
+
+    def latest(self):
+        self.refresh()
+        with self._lock:
+            epoch, cols = self._epoch, self._cols
+        return self._row(epoch, cols, -1) if len(epoch) else None
+
+    def first_at_or_after(self, ts):
+        self.refresh()
+        with self._lock:
+            epoch, cols = self._epoch, self._cols
+        i, _ = self._bounds(epoch, ts, None)
+        return self._row(epoch, cols, i) if i < len(epoch) else None
+
+    def __len__(self):
+        return len(self._epoch)
+
+
+def _shared(table, columns):
+    if not SHARED_SERIES_DIR:
+        return None
+    names = ["epoch"] + [c for c in columns if c != "timestamp_utc"]
+    return SharedColumns(os.path.join(SHARED_SERIES_DIR, table), names)
+
+
+INVESTMENTS_COLUMNS = ["timestamp_utc", "invested_value", "total_returns", "portfolio_value"]
+HISTORICAL_COLUMNS = ["timestamp_utc", "cum_roi"]
+
+investments = SeriesStore(
+    "investments_timeseries",
+    INVESTMENTS_COLUMNS,
+    min_interval=float(os.getenv("SERIES_REFRESH_SECONDS", 5)),
+    shared=_shared("investments_timeseries", INVESTMENTS_COLUMNS),
+)
+
+historical_roi = SeriesStore(
+    "historical_roi",
+    HISTORICAL_COLUMNS,
+    min_interval=float(os.getenv("SERIES_REFRESH_SECONDS", 5)),
+    shared=_shared("historical_roi", HISTORICAL_COLUMNS),
+)
@@ -0,0 +1,230 @@
+"""
+Cross-process column buffers for the series stores.
+
+With several gunicorn workers, one process (whoever holds the flock on
+`<path>.lock`) queries MySQL and writes the columns into a memory-mapped
+file; every worker maps the same file read-only and hands out views of
+it. The arrays exist once in the page cache no matter how many workers
+there are. Put the files on tmpfs (e.g. SHARED_SERIES_DIR=/dev/shm/3mfunds).
+
+File layout (little-endian):
+
+    magic    4s   b"3MSH"
+    version  u32
+    ncols    u32
+    pad      u32
+    capacity u64  rows each column block has room for
+    length   u64  rows published so far
+    resets   u64  bumped on every full reload (readers start over)
+    zero padding to HEADER_SIZE
+    column blocks, capacity * 8 bytes each: int64 epoch, then float64s
+
+Appends write the new rows first and bump `length` last, so readers never
+see a row before it is complete. When the capacity runs out the writer
+builds a bigger file and renames it over the old one; readers notice the
+new inode and remap. Views handed out earlier keep the old mapping alive.
+
+The same buffers hold arrays derived from a series (rollup levels, rolling
+state), computed once by the leader. LocalColumns is the single-process
+stand-in with the same interface.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b"3MSH"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIQQQ")
+HEADER_SIZE = 64
+LENGTH_OFFSET = 24
+MIN_CAPACITY = 4096
+
+
+class SharedColumns:
+    def __init__(self, path, names):
+        self.path = path
+        self.names = names                # first one is the int64 epoch column
+        self._lock_fd = None
+        self._file = None
+        self._map = None
+        self._ino = None
+        self._arrays = None
+        self._capacity = 0
+        self._writable = False
+        # view() from request threads must not remap halfway through a reset or append
+        self._mutex = threading.Lock()
+
+    # ---------------------------------------
+    # leadership
+    # ---------------------------------------
+    @property
+    def leading(self):
+        """True if this process holds the lock (never tries to take it)."""
+        return self._lock_fd is not None
+
+    def try_lead(self):
+        """True if this process is (or just became) the single writer."""
+        if self._lock_fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # Held until the process exits; then another worker takes over
+        self._lock_fd = fd
+        return True
+
+    # ---------------------------------------
+    # mapping
+    # ---------------------------------------
+    def _attach(self, f, writable):
+        size = os.fstat(f.fileno()).st_size
+        mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, ncols, _, capacity, _, _ = HEADER.unpack_from(mm)
+        if magic != MAGIC or version != VERSION or ncols != len(self.names):
+            mm.close()
+            raise ValueError(f"{self.path} is not a {len(self.names)}-column buffer")
+
+        arrays = []
+        for k in range(ncols):
+            dtype = np.int64 if k == 0 else np.float64
+            arrays.append(np.frombuffer(mm, dtype=dtype, count=capacity, offset=HEADER_SIZE + k * capacity * 8))
+
+        self._file, self._map, self._arrays, self._capacity = f, mm, arrays, capacity
+        self._ino = os.fstat(f.fileno()).st_ino
+        self._writable = writable
+
+    def _header(self):
+        _, _, _, _, _, length, resets = HEADER.unpack_from(self._map)
+        return length, resets
+
+    def _snapshot(self):
+        length, resets = self._header()
+        epoch = self._arrays[0][:length]
+        cols = {name: arr[:length] for name, arr in zip(self.names[1:], self._arrays[1:])}
+        for arr in (epoch, *cols.values()):
+            arr.flags.writeable = False
+        return resets, epoch, cols
+
+    def view(self):
+        """(resets, epoch, {name: float64}) as read-only views, or None if nothing is published."""
+        with self._mutex:
+            # The writer's own mapping is always the newest: never swap it for a read-only one
+            if not self._writable:
+                try:
+                    ino = os.stat(self.path).st_ino
+                except FileNotFoundError:
+                    return None
+                if ino != self._ino:
+                    writable = self.leading
+                    self._attach(open(self.path, "r+b" if writable else "rb"), writable)
+            return self._snapshot()
+
+    # ---------------------------------------
+    # writing (leader only)
+    # ---------------------------------------
+    def reset(self, epoch, cols, resets):
+        """Publish a whole new series in a fresh file."""
+        with self._mutex:
+            self._reset(epoch, cols, resets)
+
+    def append(self, epoch, cols):
+        """Publish rows past the current end."""
+        with self._mutex:
+            self._append(epoch, cols)
+
+    def _reset(self, epoch, cols, resets):
+        n = len(epoch)
+        capacity = max(MIN_CAPACITY, 2 * n)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+
+        with open(tmp, "wb") as f:
+            f.truncate(HEADER_SIZE + len(self.names) * capacity * 8)
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.names), 0, capacity, 0, resets))
+
+        f = open(tmp, "r+b")
+        self._attach(f, writable=True)
+        self._arrays[0][:n] = epoch
+        for arr, name in zip(self._arrays[1:], self.names[1:]):
+            arr[:n] = cols[name]
+        struct.pack_into("<Q", self._map, LENGTH_OFFSET, n)
+        os.rename(tmp, self.path)
+
+    def _append(self, epoch, cols):
+        length, resets = self._header()
+        m = len(epoch)
+        if length + m > self._capacity:
+            # Out of room: same series, bigger file (readers just remap)
+            _, old_epoch, old_cols = self._snapshot()
+            return self._reset(
+                np.concatenate([old_epoch, epoch]),
+                {k: np.concatenate([old_cols[k], cols[k]]) for k in old_cols},
+                resets,
+            )
+
+        self._arrays[0][length:length + m] = epoch
+        for arr, name in zip(self._arrays[1:], self.names[1:]):
+            arr[length:length + m] = cols[name]
+        # Length last: the rows above are complete before anyone can see them
+        struct.pack_into("<Q", self._map, LENGTH_OFFSET, length + m)
+
+
+class LocalColumns:
+    """
+    In-process SharedColumns: same reset / append / view, no file. Columns
+    grow by doubling, and appends write past the published length, so
+    views handed out earlier never change.
+    """
+
+    leading = True
+
+    def __init__(self, names):
+        self.names = names
+        self._lock = threading.Lock()
+        self._state = None                 # (resets, arrays, length), swapped whole
+
+    def try_lead(self):
+        return True
+
+    def view(self):
+        state = self._state
+        if state is None:
+            return None
+        resets, arrays, length = state
+        epoch = arrays[0][:length]
+        cols = {name: arr[:length] for name, arr in zip(self.names[1:], arrays[1:])}
+        for arr in (epoch, *cols.values()):
+            arr.flags.writeable = False
+        return resets, epoch, cols
+
+    def reset(self, epoch, cols, resets):
+        n = len(epoch)
+        capacity = max(MIN_CAPACITY, 2 * n)
+        arrays = [np.empty(capacity, np.int64)] + [np.empty(capacity) for _ in self.names[1:]]
+        arrays[0][:n] = epoch
+        for arr, name in zip(arrays[1:], self.names[1:]):
+            arr[:n] = cols[name]
+        with self._lock:
+            self._state = (resets, arrays, n)
+
+    def append(self, epoch, cols):
+        with self._lock:
+            resets, arrays, length = self._state
+            m = len(epoch)
+            if length + m > arrays[0].size:
+                capacity = 2 * (length + m)
+                grown = [np.empty(capacity, a.dtype) for a in arrays]
+                for new, old in zip(grown, arrays):
+                    new[:length] = old[:length]
+                arrays = grown
+            arrays[0][length:length + m] = epoch
+            for arr, name in zip(arrays[1:], self.names[1:]):
+                arr[length:length + m] = cols[name]
+            self._state = (resets, arrays, length + m)
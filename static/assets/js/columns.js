@@ -0,0 +1,48 @@
+// =====================================================
+//  BINARY COLUMNAR DECODER
+//  Pairs with columnar.py — request with
+//      fetch(url, { headers: { Accept: COLUMNS_MIMETYPE } })
+//  and pass the ArrayBuffer to decodeColumns().
+// =====================================================
+const COLUMNS_MIMETYPE = "application/vnd.3mfunds.columns";
+
+function decodeColumns(buffer) {
+    const view = new DataView(buffer);
+
+    const magic = String.fromCharCode(
+        view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3)
+    );
+    if (magic !== "3MC1") throw new Error("not a columns payload: " + magic);
+
+    const ncols = view.getUint16(4, true);
+    const nrows = view.getUint32(8, true);
+
+    // ---------- Header: names + dtypes ----------
+    const decoder = new TextDecoder();
+    const meta = [];
+    let pos = 12;
+    for (let c = 0; c < ncols; c++) {
+        const len = view.getUint8(pos);
+        const name = decoder.decode(new Uint8Array(buffer, pos + 1, len));
+        const dtype = view.getUint8(pos + 1 + len);
+        meta.push({ name, dtype });
+        pos += len + 2;
+    }
+    pos += (8 - (pos % 8)) % 8;
+
+    // ---------- Blocks: zero-copy typed array views ----------
+    const out = {};
+    for (const { name, dtype } of meta) {
+        out[name] = dtype === 2
+            ? new BigInt64Array(buffer, pos, nrows)
+            : new Float64Array(buffer, pos, nrows);
+        pos += nrows * 8;
+    }
+    return out;
+}
+
+function fetchColumns(url) {
+    return fetch(url, { headers: { Accept: COLUMNS_MIMETYPE } })
+        .then(r => r.arrayBuffer())
+        .then(decodeColumns);
+}
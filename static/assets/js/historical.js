@@ -3,18 +3,25 @@
 // ===============================
 
 document.addEventListener("DOMContentLoaded", function () {
-    const div = document.getElementById("hist-series");
-    if (!div) return;
-
-    const payload = JSON.parse(div.dataset.json);
-    const fullLabels = payload.labels;   // "YYYY-MM-DD HH:MM"
-    const fullValues = payload.values;   // floats (%)
+    if (!document.getElementById("hist-chart")) return;
+
+    // Binary columns (columns.js): epoch ms + cum_roi, NULLs as NaN
+    fetchColumns("/api/historical/series").then(cols => {
+        const fullTS = [];
+        const fullValues = [];   // floats (%)
+        cols.timestamp.forEach((t, i) => {
+            if (Number.isFinite(cols.cum_roi[i])) {
+                fullTS.push(t);
+                fullValues.push(cols.cum_roi[i]);
+            }
+        });
+        renderHistorical(fullTS, fullValues);
+    });
+});
 
-    // Convert labels → timestamps (ms)
-    const fullTS = fullLabels.map(ts => new Date(ts).getTime());
 
-    console.log("Historical labels:", fullLabels.length);
-    console.log("Historical values:", fullValues.length);
+function renderHistorical(fullTS, fullValues) {
+    console.log("Historical points:", fullTS.length);
 
     let histChart = null;
 
@@ -250,4 +257,4 @@ document.addEventListener("DOMContentLoaded", function () {
             btn.classList.remove("btn-primary-light");
         }
     });
-});
+}
@@ -0,0 +1,21 @@
+// =====================================================
+//  LIVE FEED (Server-Sent Events)
+//  Pairs with /api/stream (live.py). Instead of polling
+//  /kpis and /api/investments/timeseries:
+//
+//      subscribeLive({
+//          ticks: cols => { /* append cols.timestamps, cols.portfolio_value, ... */ },
+//          kpis:  changed => { /* only the fields that changed */ },
+//          reset: () => { /* refetch everything */ },
+//      });
+// =====================================================
+function subscribeLive(handlers) {
+    const source = new EventSource("/api/stream");
+
+    for (const event of ["ticks", "kpis", "reset"]) {
+        if (!handlers[event]) continue;
+        source.addEventListener(event, e => handlers[event](JSON.parse(e.data)));
+    }
+    // EventSource reconnects on its own (server sends retry: 5000)
+    return source;
+}
@@ -2,6 +2,9 @@
 //  GLOBAL VARIABLES
 // =====================================================
 let chart2 = null;
+let mainChartDays = 3;
+let mainSeries = null;          // { invested, portfolio } pairs on chart2
+let kpiState = {};
 
 // =====================================================
 //  MINI SPARKLINE CHARTS
@@ -54,6 +57,15 @@ function safePairs(tsArray, dataArray) {
     ]).filter(row => Number.isFinite(row[1]));
 }
 
+// Binary columns (columns.js): epoch-ms timestamps, NULLs as NaN
+function columnPairs(tsColumn, dataColumn) {
+    const out = [];
+    for (let i = 0; i < tsColumn.length; i++) {
+        if (Number.isFinite(dataColumn[i])) out.push([tsColumn[i], dataColumn[i]]);
+    }
+    return out;
+}
+
 
 // =====================================================
 //  STACKING LOGIC
@@ -74,12 +86,12 @@ function updateStacking() {
 //  MAIN CHART LOADER
 // =====================================================
 window.loadMainChart = function(days) {
-    fetch(`/api/investments/timeseries?days=${days}`)
-        .then(r => r.json())
-        .then(data => {
+    mainChartDays = days;
+    fetchColumns(`/api/investments/timeseries?days=${days}&max_points=1500`)
+        .then(cols => {
 
-            const investedSeries  = safePairs(data.timestamps, data.invested_value);
-            const portfolioSeries = safePairs(data.timestamps, data.portfolio_value);
+            const investedSeries  = columnPairs(cols.timestamp, cols.invested_value);
+            const portfolioSeries = columnPairs(cols.timestamp, cols.portfolio_value);
 
             // ---------- KPI Update ----------
             if (portfolioSeries.length > 1) {
@@ -104,6 +116,7 @@ window.loadMainChart = function(days) {
             }
 
             if (chart2) chart2.destroy();
+            mainSeries = { invested: investedSeries, portfolio: portfolioSeries };
 
             const target = document.getElementById("totalInvestmentsStats");
             target.innerHTML = "";
@@ -218,6 +231,15 @@ document.getElementById("kpi-return-label").innerText = "3D Return";
 //  KPI LOADER (UPDATED WITH TOTAL RETURN KPI)
 // =====================================================
 function loadKPIs() {
+    fetch("/kpis")
+        .then(r => r.json())
+        .then(k => {
+            kpiState = k;
+            renderKPIs(k);
+        });
+}
+
+function renderKPIs(k) {
 
     function formatDollarChange(v) {
         if (v === null || v === undefined) return "--";
@@ -235,77 +257,110 @@ function loadKPIs() {
         return `<span class="text-muted" style="font-weight:400">$0.00</span>`;
     }
 
-    fetch("/kpis")
-        .then(r => r.json())
-        .then(k => {
-
-            document.getElementById("kpi-runtime").innerText =
-                k.runtime_days + " days";
-
-            document.getElementById("kpi-dpr").innerHTML =
-                k.dpr_pct !== null
-                ? `<span class="${k.dpr_pct >= 0 ? "text-success" : "text-danger"}" style="font-weight:400">
-                        ${k.dpr_pct.toFixed(2)}%
-                   </span>`
-                : "--";
-
-            document.getElementById("kpi-wpr").innerHTML =
-                k.wpr_pct !== null
-                ? `<span class="${k.wpr_pct >= 0 ? "text-success" : "text-danger"}" style="font-weight:400">
-                        ${k.wpr_pct.toFixed(2)}%
-                   </span>`
-                : "--";
-
-            document.getElementById("kpi-maxdd").innerHTML =
-                k.max_dd_pct !== null
-                ? `<span class="text-danger" style="font-weight:400">
-                        -${Math.abs(k.lowest_daily_return).toFixed(2)}%
-                   </span>`
-                : "--";
-
-            document.getElementById("kpi-week").innerHTML =
-                formatDollarChange(k.rtw_dollars);
-
-            document.getElementById("kpi-month").innerHTML =
-                formatDollarChange(k.rtm_dollars);
-
-            if (k.eff_total_return_pct !== null && k.eff_total_return_pct !== undefined) {
-                let tr = k.eff_total_return_pct;
-                let abs = Math.abs(tr).toFixed(2);
-                let sign = tr >= 0 ? "+" : "-";
-                let cls = tr >= 0 ? "text-success" : "text-danger";
-
-                document.getElementById("kpi-total-return-rate").innerHTML = `
-                    <span class="${cls}" style="font-weight:400">
-                        ${sign}${abs}%
-                    </span>
-                `;
-            }
+    document.getElementById("kpi-runtime").innerText =
+        k.runtime_days + " days";
+
+    document.getElementById("kpi-dpr").innerHTML =
+        k.dpr_pct !== null
+        ? `<span class="${k.dpr_pct >= 0 ? "text-success" : "text-danger"}" style="font-weight:400">
+                ${k.dpr_pct.toFixed(2)}%
+           </span>`
+        : "--";
+
+    document.getElementById("kpi-wpr").innerHTML =
+        k.wpr_pct !== null
+        ? `<span class="${k.wpr_pct >= 0 ? "text-success" : "text-danger"}" style="font-weight:400">
+                ${k.wpr_pct.toFixed(2)}%
+           </span>`
+        : "--";
+
+    document.getElementById("kpi-maxdd").innerHTML =
+        k.max_dd_pct !== null
+        ? `<span class="text-danger" style="font-weight:400">
+                -${Math.abs(k.lowest_daily_return).toFixed(2)}%
+           </span>`
+        : "--";
+
+    document.getElementById("kpi-week").innerHTML =
+        formatDollarChange(k.rtw_dollars);
+
+    document.getElementById("kpi-month").innerHTML =
+        formatDollarChange(k.rtm_dollars);
+
+    if (k.eff_total_return_pct !== null && k.eff_total_return_pct !== undefined) {
+        let tr = k.eff_total_return_pct;
+        let abs = Math.abs(tr).toFixed(2);
+        let sign = tr >= 0 ? "+" : "-";
+        let cls = tr >= 0 ? "text-success" : "text-danger";
+
+        document.getElementById("kpi-total-return-rate").innerHTML = `
+            <span class="${cls}" style="font-weight:400">
+                ${sign}${abs}%
+            </span>
+        `;
+    }
 
-            if (k.eff_total_return !== null && k.eff_total_return !== undefined) {
-                let tr = k.eff_total_return;
+    if (k.eff_total_return !== null && k.eff_total_return !== undefined) {
+        let tr = k.eff_total_return;
 
-                // Round to 2 decimals, then convert to comma format
-                let abs = Number(Math.abs(tr).toFixed(2)).toLocaleString(undefined, {
-                    minimumFractionDigits: 2,
-                    maximumFractionDigits: 2
-                });
+        // Round to 2 decimals, then convert to comma format
+        let abs = Number(Math.abs(tr).toFixed(2)).toLocaleString(undefined, {
+            minimumFractionDigits: 2,
+            maximumFractionDigits: 2
+        });
 
-                let sign = tr >= 0 ? "+" : "-";
-                let cls = tr >= 0 ? "text-success" : "text-danger";
+        let sign = tr >= 0 ? "+" : "-";
+        let cls = tr >= 0 ? "text-success" : "text-danger";
 
-                document.getElementById("kpi-total-return").innerHTML = `
-                    <span class="${cls}" style="font-weight:400">
-                        ${sign}$${abs}
-                    </span>
-                `;
-            }
-        });
+        document.getElementById("kpi-total-return").innerHTML = `
+            <span class="${cls}" style="font-weight:400">
+                ${sign}$${abs}
+            </span>
+        `;
+    }
 }
 
 loadKPIs();
 
 
+// =====================================================
+//  LIVE UPDATES (live.js)
+// =====================================================
+// Past this many points, refetch the window downsampled instead of appending
+const LIVE_MAX_POINTS = 3000;
+
+// live.js is only on the page when the server has live updates on
+if (typeof subscribeLive === "function") subscribeLive({
+    ticks: cols => {
+        if (!chart2 || !mainSeries) return;
+        // Naive UTC ISO strings: read them as UTC, like the binary timestamps
+        const stamps = cols.timestamps.map(ts => ts + "Z");
+        const invested  = mainSeries.invested.concat(safePairs(stamps, cols.invested_value));
+        const portfolio = mainSeries.portfolio.concat(safePairs(stamps, cols.portfolio_value));
+        if (portfolio.length > LIVE_MAX_POINTS) return loadMainChart(mainChartDays);
+
+        // Keep to the chart's window: drop what scrolled out of it
+        if (!portfolio.length) return;
+        const from = portfolio[portfolio.length - 1][0] - mainChartDays * 86400000;
+        const inWindow = pair => pair[0] >= from;
+        mainSeries = { invested: invested.filter(inWindow), portfolio: portfolio.filter(inWindow) };
+        chart2.updateSeries([
+            { name: "Invested Capital", type: "area", data: mainSeries.invested },
+            { name: "Portfolio Value", type: "area", data: mainSeries.portfolio }
+        ], false);
+    },
+    // The full set on connect, then only the fields that changed
+    kpis: changed => {
+        kpiState = { ...kpiState, ...changed };
+        renderKPIs(kpiState);
+    },
+    reset: () => {
+        loadMainChart(mainChartDays);
+        loadKPIs();
+    }
+});
+
+
 // =====================================================
 //  EARNINGS CHART
 // =====================================================
@@ -378,7 +433,9 @@ document.addEventListener("DOMContentLoaded", function () {
 //  DAILY CLOSES TABLE
 // =====================================================
 function loadDailyClosesTable() {
-    fetch("/api/daily_closes_full")
+    // Cumulative columns count from the first day of the range: keep it at 90 days
+    const from = new Date(Date.now() - 90 * 86400000).toISOString().slice(0, 10);
+    fetch(`/api/daily_closes_full?from=${from}`)
         .then(r => r.json())
         .then(rows => {
 
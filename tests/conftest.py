@@ -0,0 +1,87 @@
+"""
+Shared fixtures: the app's modules sit at the repo root, `bench_db`
+points db.py's pool at a small benchdata SQLite file, the deploy archive
+goes to a temp dir, and TickStore stands in for a SeriesStore.
+"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive  # noqa: E402
+import benchdata  # noqa: E402
+from shared import LocalColumns  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def archive_dir(tmp_path_factory):
+    # Never the real archive: tests write synthetic deploys
+    path = str(tmp_path_factory.mktemp("archive"))
+    os.environ["DEPLOY_ARCHIVE_DIR"] = archive.ARCHIVE_DIR = path
+    return path
+
+
+@pytest.fixture(scope="session")
+def bench_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("bench") / "bench.db")
+    conn = sqlite3.connect(path)
+    benchdata.generate(conn, "sqlite", ticks=2000, deploys=12, history_rows=24)
+    conn.commit()
+    conn.close()
+    benchdata.use_sqlite(path)
+    return path
+
+
+class TickStore:
+    """
+    The parts of SeriesStore the rollups and rolling columns use, fed by
+    hand: push() appends ticks, reload() starts a new generation.
+    """
+
+    def __init__(self, column="portfolio_value"):
+        self.column = column
+        self.epoch = np.empty(0, np.int64)
+        self.values = np.empty(0)
+        self.generation = 0
+        self._listeners = []
+
+    def subscribe(self, fn):
+        self._listeners.append(fn)
+
+    def publishing(self):
+        return True
+
+    def derived_buffer(self, name, names):
+        return LocalColumns(names)
+
+    def peek(self):
+        return self.epoch, {self.column: self.values}
+
+    def arrays(self):
+        return self.peek()
+
+    def push(self, epoch, values):
+        self.epoch = np.r_[self.epoch, np.asarray(epoch, np.int64)]
+        self.values = np.r_[self.values, np.asarray(values, np.float64)]
+        for fn in self._listeners:
+            fn(np.asarray(epoch, np.int64), {self.column: np.asarray(values, np.float64)}, False)
+
+    def reload(self):
+        self.generation += 1
+        for fn in self._listeners:
+            fn(self.epoch, {self.column: self.values}, True)
+
+
+def random_ticks(start, end, seed=0, step=20):
+    """Ticks `step` seconds apart on average, with gaps and a few NaNs, in [start, end)."""
+    rng = np.random.default_rng(seed)
+    epoch = np.cumsum(rng.integers(1, 2 * step, size=2 * (end - start) // step)) + start
+    epoch = epoch[epoch < end]
+    epoch = epoch[rng.random(epoch.size) > 0.05]
+    values = 1000 + np.cumsum(rng.normal(0, 1, epoch.size))
+    values[rng.random(epoch.size) < 0.01] = np.nan
+    return epoch, values
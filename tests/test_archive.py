@@ -0,0 +1,38 @@
+import numpy as np
+
+import archive
+import db
+from deploy_history import DeployHistory
+
+
+def history(rows=5):
+    epoch = 1_700_000_000 + 60 * np.arange(rows, dtype=np.int64)
+    return DeployHistory(
+        epoch=epoch,
+        balance=np.linspace(100, 110, rows),
+        roi=np.linspace(0, 0.1, rows),
+        btc_close=np.full(rows, 30_000.0),
+        columns=["BTC_roi", "ETH_roi"],
+        matrix=np.vstack([np.linspace(0, 0.2, rows), np.full(rows, np.nan)]),
+    )
+
+
+def test_archive_round_trip(archive_dir):
+    assert archive.ARCHIVE_DIR == archive_dir
+    archive.store(901, history())
+    loaded = archive.load(901)
+    want = history()
+    assert loaded.columns == want.columns
+    for field in ("epoch", "balance", "roi", "btc_close", "matrix"):
+        np.testing.assert_array_equal(getattr(loaded, field), getattr(want, field))
+
+
+def test_archive_is_keyed_by_database(monkeypatch):
+    archive.store(902, history())
+    assert archive.has(902)
+
+    # Same deploy id, other database: not its files
+    other = db.ConnectionPool(lambda: None, source="sqlite:/elsewhere.db")
+    monkeypatch.setattr(db, "pool", other)
+    assert not archive.has(902)
+    assert archive.load(902) is None
@@ -0,0 +1,149 @@
+"""
+The native ASGI routes against the Flask ones, on the benchdata SQLite
+file. adb's queries are answered by db.py in a thread (no MySQL here).
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import db
+
+
+@pytest.fixture(scope="module")
+def apps(bench_db):
+    import adb
+    import app
+    import asgi
+
+    patch = pytest.MonkeyPatch()
+    for name in ("fetch_one", "fetch_all", "fetch_columns"):
+        sync = getattr(db, name)
+        patch.setattr(adb, name, lambda sql, args=None, sync=sync: asyncio.to_thread(sync, sql, args))
+    yield app.app.test_client(), asgi
+    patch.undo()
+
+
+def call(asgi, path, query=b"", headers=()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "path": path, "query_string": query,
+             "headers": [(k.encode(), v.encode()) for k, v in headers]}
+    asyncio.run(asgi.app(scope, receive, send))
+    start, body = messages[0], b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body
+
+
+def deploy_ids(client):
+    return [d["id"] for d in client.get("/api/deploys?limit=500").get_json()["deploys"]]
+
+
+@pytest.mark.parametrize("query", ["", "limit=3", "ids=1,2,999", "ids=x"])
+def test_deploys_summary(apps, query):
+    client, asgi = apps
+    status, headers, body = call(asgi, "/api/deploys/summary", query.encode())
+    want = client.get(f"/api/deploys/summary?{query}")
+    assert status == want.status_code
+    assert json.loads(body) == want.get_json()
+    if status == 200:
+        assert headers["etag"] == want.headers["ETag"]
+        assert call(asgi, "/api/deploys/summary", query.encode(), [("if-none-match", headers["etag"])])[0] == 304
+
+
+def test_deploy_series(apps):
+    client, asgi = apps
+    for deploy_id in deploy_ids(client)[-3:] + [999_999]:
+        path = f"/api/deploys/{deploy_id}/series"
+        status, _, body = call(asgi, path)
+        want = client.get(path)
+        assert (status, json.loads(body)) == (want.status_code, want.get_json())
+
+    path = f"/api/deploys/{deploy_ids(client)[-1]}/series"
+    status, headers, body = call(asgi, path, b"format=bin")
+    want = client.get(path + "?format=bin")
+    assert (status, headers["content-type"], body) == (200, want.mimetype, want.data)
+
+
+@pytest.mark.parametrize("query", ["windows=6h", "windows=1h,6h&max_points=20", "max_points=1", "windows=3x"])
+def test_deploy_rolling(apps, query):
+    client, asgi = apps
+    deploy_id = deploy_ids(client)[-1]
+    for q in (f"deploy={deploy_id}&{query}", f"deploy=999999&{query}", "deploy=x"):
+        status, headers, body = call(asgi, "/api/analytics/rolling", q.encode())
+        want = client.get(f"/api/analytics/rolling?{q}")
+        assert (status, json.loads(body)) == (want.status_code, want.get_json()), q
+        if status == 200:
+            assert headers["etag"] == want.headers["ETag"]
+
+
+def test_rolling_binary(apps):
+    client, asgi = apps
+    q = f"deploy={deploy_ids(client)[-1]}&format=bin"
+    status, headers, body = call(asgi, "/api/analytics/rolling", q.encode())
+    want = client.get(f"/api/analytics/rolling?{q}")
+    assert (status, headers["content-type"], body) == (200, want.mimetype, want.data)
+
+
+def test_fund_rolling_stays_on_flask(apps):
+    _, asgi = apps
+    assert asgi.native_handler({"path": "/api/analytics/rolling", "query_string": b"days=3"}) is None
+    assert asgi.native_handler({"path": "/api/deploys/7/series", "query_string": b""}) is not None
+
+
+def test_columns_from_rows_matches_query_columns(bench_db):
+    sql = "SELECT * FROM portfolio_history WHERE deploy_id = %s ORDER BY timestamp_utc"
+    want = db.query_columns(sql, (1,))
+    with db.connect_db() as conn, conn.cursor(db.pymysql.cursors.Cursor) as cur:
+        cur.execute(sql, (1,))
+        got = db.columns_from_rows(cur.description, cur.fetchall())
+    assert list(got) == list(want)
+    for name in want:
+        assert got[name].dtype == want[name].dtype, name
+        np.testing.assert_array_equal(got[name], want[name], err_msg=name)
+
+
+def test_kpis_answer_while_a_stream_is_open(apps):
+    client, asgi = apps
+    import app
+    import live
+
+    async def scenario():
+        stream, closed = [], asyncio.Event()
+
+        async def receive():
+            await closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            stream.append(message)
+
+        scope = {"type": "http", "http_version": "1.1", "method": "GET", "path": "/api/stream",
+                 "query_string": b"", "headers": []}
+        task = asyncio.create_task(asgi.app(scope, receive, send))
+        while len(stream) < 2:
+            await asyncio.sleep(0.01)
+        assert stream[0]["status"] == 200
+        assert stream[1]["body"] == b"retry: 5000\n\n"
+
+        # The stream holds no thread: a WSGI route still answers
+        kpis = await asyncio.wait_for(asyncio.to_thread(call, asgi, "/kpis"), 10)
+
+        app.live_feed._broadcast([live.sse("kpis", {"probe": 1})])
+        while not any(b"probe" in m.get("body", b"") for m in stream):
+            await asyncio.sleep(0.01)
+
+        closed.set()
+        await asyncio.wait_for(task, 5)
+        assert app.live_feed._clients == set()
+        return kpis
+
+    status, _, body = asyncio.run(scenario())
+    want = client.get("/kpis")
+    assert (status, json.loads(body)) == (want.status_code, want.get_json())
@@ -0,0 +1,105 @@
+import time
+
+from cache import Cache, MemoryBackend, RedisBackend, Watermarks
+
+
+def counting(cache, **memoize):
+    calls = []
+
+    @cache.memoize(**memoize)
+    def load(*args):
+        calls.append(args)
+        return {"args": args, "call": len(calls)}
+
+    return load, calls
+
+
+def cache_on(table="t", max_entries=512):
+    marks = {table: 1}
+    watermarks = Watermarks(min_interval=60)
+    watermarks.register(table, lambda: marks[table], min_interval=0)
+    return Cache(MemoryBackend(max_entries), watermarks), marks
+
+
+def test_new_rows_make_entries_unreachable():
+    cache, marks = cache_on()
+    load, calls = counting(cache, ttl=60, sources=["t"])
+    assert load(1) is load(1)
+    assert len(calls) == 1
+
+    marks["t"] = 2
+    assert load(1)["call"] == 2
+    assert load(1)["call"] == 2
+    assert cache.stats()["hits"] == 2
+
+
+def test_unrelated_sources_do_not_invalidate():
+    cache, marks = cache_on()
+    load, calls = counting(cache, ttl=60, sources=[])
+    load()
+    marks["t"] = 2
+    load()
+    assert len(calls) == 1
+
+
+def test_entries_expire_after_their_ttl():
+    cache, _ = cache_on()
+    load, calls = counting(cache, ttl=0.05, sources=["t"])
+    load()
+    load()
+    time.sleep(0.1)
+    load()
+    assert len(calls) == 2
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache, _ = cache_on(max_entries=2)
+    load, calls = counting(cache, ttl=60, sources=["t"])
+    load(1), load(2)
+    load(1)                                 # 2 is now the oldest
+    load(3)
+    load(1)
+    assert calls == [(1,), (2,), (3,)]
+
+    load(2)
+    assert calls[-1] == (2,)
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["entries"] == 2
+
+
+def test_watermark_reads_are_rate_limited():
+    reads = []
+    watermarks = Watermarks(min_interval=60)
+    watermarks.register("t", lambda: reads.append(1) or len(reads))
+    assert watermarks.get("t") == watermarks.get("t") == 1
+    assert len(reads) == 1
+
+
+class DictRedis:
+    """Just what RedisBackend uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def info(self, section):
+        return {"evicted_keys": 0}
+
+
+def test_redis_backend_round_trips_and_invalidates():
+    marks = {"t": 1}
+    watermarks = Watermarks()
+    watermarks.register("t", lambda: marks["t"], min_interval=0)
+    cache = Cache(RedisBackend(client=DictRedis()), watermarks)
+    load, calls = counting(cache, ttl=60, sources=["t"])
+
+    assert load(1) == load(1) == {"args": (1,), "call": 1}
+    marks["t"] = 2
+    assert load(1)["call"] == 2
+    assert cache.stats() == {"backend": "redis", "evictions": 0, "hits": 1, "misses": 2}
@@ -0,0 +1,66 @@
+import struct
+
+import numpy as np
+import pytest
+
+import columnar
+
+
+def decode(body):
+    """The columns.js decoder, in Python."""
+    magic, ncols, _, nrows = struct.unpack_from("<4sHHI", body)
+    assert magic == columnar.MAGIC
+    pos, meta = 12, []
+    for _ in range(ncols):
+        (n,) = struct.unpack_from("<B", body, pos)
+        name = body[pos + 1:pos + 1 + n].decode()
+        (dtype,) = struct.unpack_from("<B", body, pos + 1 + n)
+        meta.append((name, "<i8" if dtype == 2 else "<f8"))
+        pos += n + 2
+    pos += -pos % 8
+    out = {}
+    for name, dtype in meta:
+        out[name] = np.frombuffer(body, dtype, nrows, pos)
+        pos += nrows * 8
+    return out
+
+
+@pytest.fixture(scope="module")
+def client(bench_db):
+    import app
+    return app.app.test_client()
+
+
+def test_round_trip():
+    cols = {"t": np.arange(5, dtype=np.int64), "v": np.array([1.5, np.nan, 3, 4, 5])}
+    got = decode(columnar.encode(cols))
+    np.testing.assert_array_equal(got["t"], cols["t"])
+    np.testing.assert_array_equal(got["v"], cols["v"])
+
+
+@pytest.mark.parametrize("accept, fmt, binary", [
+    (None, None, False),
+    ("*/*", None, False),
+    (columnar.MIMETYPE, None, True),
+    (f"{columnar.MIMETYPE}, application/json;q=0.5", None, True),
+    ("application/json", "bin", True),
+])
+def test_accepts_binary(accept, fmt, binary):
+    assert columnar.accepts_binary(fmt, accept) is binary
+
+
+def test_timeseries_binary_matches_json(client):
+    url = "/api/investments/timeseries?days=3&max_points=500"
+    cols = decode(client.get(url, headers={"Accept": columnar.MIMETYPE}).data)
+    body = client.get(url).get_json()
+    ok = np.isfinite(cols["invested_value"]) & np.isfinite(cols["portfolio_value"]) & np.isfinite(cols["total_returns"])
+    stamps = np.datetime_as_string((cols["timestamp"][ok] // 1000).astype("datetime64[s]")).tolist()
+    assert stamps == body["timestamps"]
+    np.testing.assert_array_equal(cols["portfolio_value"][ok], body["portfolio_value"])
+
+
+def test_historical_series_binary_matches_json(client):
+    cols = decode(client.get("/api/historical/series?format=bin").data)
+    body = client.get("/api/historical/series").get_json()
+    assert len(cols["timestamp"]) == len(body["labels"])
+    np.testing.assert_array_equal(cols["cum_roi"], body["values"])
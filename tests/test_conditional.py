@@ -0,0 +1,36 @@
+import pytest
+
+FUTURE = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+
+@pytest.fixture(scope="module")
+def client(bench_db):
+    import app
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize("path", [
+    "/api/investments/timeseries?method=nope",
+    "/api/investments/timeseries?days=x",
+    "/api/daily_closes_full?from=garbage",
+    "/api/deploys/summary?ids=x",
+    "/api/ohlc?interval=7q",
+    "/api/analytics/rolling?windows=3x",
+    "/api/analytics/rolling?deploy=x",
+])
+def test_malformed_request_is_a_400_not_a_304(client, path):
+    resp = client.get(path, headers={"If-Modified-Since": FUTURE})
+    assert resp.status_code == 400
+    assert "error" in resp.get_json()
+
+
+@pytest.mark.parametrize("path", [
+    "/api/investments/timeseries?days=3",
+    "/api/ohlc?interval=1h",
+    "/api/deploys/summary?limit=2",
+])
+def test_valid_request_still_revalidates(client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    assert client.get(path, headers={"If-Modified-Since": FUTURE}).status_code == 304
+    assert client.get(path, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
@@ -0,0 +1,179 @@
+import threading
+
+import pymysql
+import pytest
+
+from db import ConnectionPool, PoolTimeout, SingleFlight
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = True
+        self.dead = False          # the server went away: ping fails
+
+    def ping(self, reconnect=False):
+        if self.dead:
+            raise pymysql.err.OperationalError(2006, "MySQL server has gone away")
+
+    def close(self):
+        self.open = False
+
+
+def pool_of(**kwargs):
+    made = []
+
+    def factory():
+        made.append(FakeConnection())
+        return made[-1]
+
+    return ConnectionPool(factory, **kwargs), made
+
+
+# ============ POOL ==========================================
+
+
+def test_released_connection_is_reused():
+    pool, made = pool_of()
+    with pool.acquire() as conn:
+        first = conn._raw
+    with pool.acquire() as conn:
+        assert conn._raw is first
+    assert len(made) == 1
+    assert pool.stats()["created"] == 1 and pool.stats()["reused"] == 1
+
+
+def test_connection_error_discards_the_connection():
+    pool, made = pool_of()
+    with pytest.raises(pymysql.err.OperationalError):
+        with pool.acquire():
+            raise pymysql.err.OperationalError(2013, "Lost connection")
+    assert not made[0].open
+
+    with pool.acquire() as conn:
+        assert conn._raw is made[1]
+    assert pool.stats()["open"] == 1
+
+
+def test_closed_by_the_server_is_not_handed_out():
+    pool, made = pool_of()
+    conn = pool.acquire()
+    made[0].open = False
+    conn.close()
+    assert pool.acquire()._raw is made[1]
+
+
+def test_failed_ping_is_not_handed_out():
+    pool, made = pool_of(ping_after=-1)
+    pool.acquire().close()
+    made[0].dead = True
+    assert pool.acquire()._raw is made[1]
+    assert not made[0].open
+    assert pool.stats()["failed_pings"] == 1
+
+
+def test_old_connections_are_recycled():
+    pool, made = pool_of(recycle=-1)
+    pool.acquire().close()
+    assert pool.acquire()._raw is made[1]
+    assert pool.stats()["recycled"] == 1
+
+
+def test_bounded_and_waiters_get_the_released_connection():
+    pool, made = pool_of(max_size=1, timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+
+    pool.timeout = 5
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    held.close()
+    waiter.join(5)
+    assert got[0]._raw is made[0]
+    assert len(made) == 1
+
+
+def test_release_is_idempotent():
+    pool, _ = pool_of(max_size=1)
+    conn = pool.acquire()
+    conn.close()
+    conn.close()
+    assert pool.stats()["idle"] == 1 and pool.stats()["open"] == 1
+
+
+# ============ SINGLE-FLIGHT ==========================================
+
+
+def run_together(flight, key, fn, callers):
+    """Start `callers` threads on flight.do(key, fn); returns (results, errors) once all finish."""
+    results, errors = [None] * callers, [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as e:             # noqa: BLE001 - compared below
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for t in threads:
+        t.start()
+    return threads, results, errors
+
+
+def wait_coalesced(flight, n):
+    for _ in range(500):
+        if flight.stats()["coalesced"] >= n:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("callers never joined the flight")
+
+
+def test_concurrent_callers_share_one_call():
+    flight, gate, calls = SingleFlight(), threading.Event(), []
+
+    def query():
+        calls.append(1)
+        gate.wait(5)
+        return {"rows": [1, 2, 3]}
+
+    threads, results, errors = run_together(flight, "k", query, 8)
+    wait_coalesced(flight, 7)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert errors == [None] * 8
+    assert all(r is results[0] for r in results)
+    assert flight.stats() == {"flights": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter():
+    flight, gate = SingleFlight(), threading.Event()
+    boom = RuntimeError("query failed")
+
+    def query():
+        gate.wait(5)
+        raise boom
+
+    threads, results, errors = run_together(flight, "k", query, 5)
+    wait_coalesced(flight, 4)
+    gate.set()
+    for t in threads:
+        t.join(5)
+
+    assert errors == [boom] * 5
+    # Nothing is kept: the next call runs again
+    assert flight.do("k", lambda: "fresh") == "fresh"
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flight, gate = SingleFlight(), threading.Event()
+    threads, _, _ = run_together(flight, "slow", lambda: gate.wait(5), 1)
+    try:
+        assert flight.do("fast", lambda: 42) == 42
+    finally:
+        gate.set()
+        for t in threads:
+            t.join(5)
@@ -0,0 +1,178 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+import db
+from app import parse_roi_decimal
+from deploy_history import DeployHistory, parse_roi_matrix, roi_columns, summarize
+
+CELLS = [
+    "3.59%", "3.59", 0.0359, "-8.5%", " 12 ", "1,234.5", "0.5", "-1", "1", "100%",
+    Decimal("2.5"), 7, "1e-3", "12%%", "inf", "nan",
+    None, "", "%", "junk", "3.5.1", "--2",
+]
+
+
+def reference(cells):
+    return np.array([np.nan if (v := parse_roi_decimal(c)) is None else v for c in cells])
+
+
+def objects(cells):
+    col = np.empty(len(cells), dtype=object)
+    col[:] = cells
+    return col
+
+
+@pytest.mark.parametrize("cells", [
+    CELLS,
+    [c for c in CELLS if isinstance(c, str) and c not in ("junk", "3.5.1", "--2")],   # vectorized path
+    ["junk"] * 3,
+    [],
+])
+def test_text_cells_parse_like_parse_roi_decimal(cells):
+    got = parse_roi_matrix({"a_roi": objects(cells)}, ["a_roi"])
+    assert got.shape == (1, len(cells))
+    np.testing.assert_array_equal(got[0], reference(cells))
+
+
+@pytest.mark.parametrize("values", [
+    np.array([0.0359, 3.59, -8.5, 1.0, -1.0, np.nan, 250.0]),
+    np.array([0, 1, 2, -7]),
+])
+def test_numeric_columns_parse_like_parse_roi_decimal(values):
+    got = parse_roi_matrix({"a_roi": values}, ["a_roi"])
+    np.testing.assert_array_equal(got[0], reference(values.tolist()))
+
+
+def history_of(rows):
+    """DeployHistory from row dicts, the way query_columns would hand them over."""
+    cols = {k: objects([r[k] for r in rows]) for k in rows[0]}
+    cols["timestamp_utc"] = np.array([r["timestamp_utc"] for r in rows], dtype="datetime64[s]")
+    for k in ("portfolio_balance", "portfolio_roi", "BTC_close"):
+        cols[k] = cols[k].astype(np.float64)
+    return DeployHistory.from_columns(cols)
+
+
+def reference_asset_series(rows):
+    series = {}
+    for col in [c for c in rows[0] if c.endswith("_roi") and c not in ("portfolio_roi", "portfolio_roi_lev")]:
+        values = [parse_roi_decimal(r[col]) for r in rows]
+        if any(v is not None for v in values):
+            series[col.replace("_roi", "").upper()] = values
+    return series
+
+
+def test_missing_assets_and_malformed_rows():
+    rows = [
+        {"timestamp_utc": f"2025-01-01T00:0{i}:00", "portfolio_balance": 100.0 + i,
+         "portfolio_roi": 0.01 * i, "portfolio_roi_lev": 0.03 * i, "BTC_close": 1.0,
+         "btc_roi": cells[0], "eth_roi": cells[1], "sol_roi": cells[2], "dead_roi": None, "junk_roi": "n/a"}
+        for i, cells in enumerate([
+            ("1.5%", None, ""),
+            ("junk", "2%", "0.4"),
+            (None, "", "-8.5%"),
+            ("1,000", "-0.2", None),
+        ])
+    ]
+    history = history_of(rows)
+    assert history.columns == roi_columns(rows[0])
+    assert history.asset_series() == reference_asset_series(rows)
+    assert "DEAD" not in history.asset_series() and "JUNK" not in history.asset_series()
+
+
+def test_bench_matrix_matches_cell_by_cell(bench_db):
+    sql = "SELECT * FROM portfolio_history WHERE deploy_id = %s ORDER BY timestamp_utc ASC"
+    rows = db.fetch_all(sql, (1,))
+    history = DeployHistory.from_columns(db.query_columns(sql, (1,)))
+    for i, col in enumerate(history.columns):
+        np.testing.assert_array_equal(history.matrix[i], reference([r[col] for r in rows]), err_msg=col)
+    assert history.asset_series() == reference_asset_series(rows)
+
+
+# ============ SUMMARY / CACHE ==========================================
+
+
+def random_history(rng, n):
+    epoch = 1_700_000_000 + 300 * np.arange(n, dtype=np.int64)
+    roi = np.cumsum(rng.normal(0, 0.05, n))
+    return DeployHistory(
+        epoch=epoch,
+        balance=20000 * (1 + roi),
+        roi=roi,
+        btc_close=60000 * np.cumprod(1 + rng.normal(0, 0.01, n)),
+        columns=["btc_roi", "eth_roi"],
+        matrix=rng.choice([-0.085, 0.01, np.nan], (2, n)),
+    )
+
+
+def test_summarize_matches_per_deploy_kpis():
+    rng = np.random.default_rng(13)
+    histories = [random_history(rng, n) for n in (1, 2, 216, 5, 1, 300, 3)]
+    # No base to compare against, and a curve far below the others
+    histories[2].balance[0] = 0.0
+    histories[4].roi[:] = -0.9
+    histories[5].roi -= 3
+
+    summary = summarize(histories)
+    np.testing.assert_array_equal(summary["rows"], [len(h) for h in histories])
+    for i, history in enumerate(histories):
+        for key, want in history.kpis().items():
+            assert summary[key][i] == pytest.approx(want, rel=1e-9, abs=1e-9), (i, key)
+
+
+@pytest.fixture
+def own_db(tmp_path, monkeypatch):
+    """A dataset of our own (deploys get added), a fresh deploy index and cache."""
+    import sqlite3
+
+    import benchdata
+    import deploy_history
+
+    path = str(tmp_path / "deploys.db")
+    conn = sqlite3.connect(path)
+    benchdata.generate(conn, "sqlite", ticks=50, deploys=3, history_rows=6)
+    conn.close()
+
+    monkeypatch.setattr(db, "pool", db.pool)
+    benchdata.use_sqlite(path)
+    monkeypatch.setattr(deploy_history, "deploy_index", deploy_history.DeployIndex(min_interval=0))
+    monkeypatch.setattr(deploy_history, "_closed", {})
+    return sqlite3.connect(path, isolation_level=None)
+
+
+def test_closed_deploys_are_cached_for_good(own_db, monkeypatch):
+    import app
+    import deploy_history
+
+    client = app.app.test_client()
+    first = client.get("/deploys/1").get_data(as_text=True)
+    assert deploy_history.cached(1) is not None
+
+    # Its rows can't change any more: served from memory, not the archive or MySQL
+    own_db.execute("DELETE FROM portfolio_history WHERE deploy_id = 1")
+    monkeypatch.setattr(app.archive, "load", lambda deploy_id: pytest.fail("archive read"))
+    assert client.get("/deploys/1").get_data(as_text=True) == first
+
+
+def test_live_deploy_is_cached_once_it_closes(own_db):
+    import app
+    import deploy_history
+
+    client = app.app.test_client()
+    client.get("/deploys/3")
+    assert deploy_history.cached(3) is None          # still live
+
+    # A last row lands, then a newer deploy closes it
+    own_db.execute("""
+        INSERT INTO portfolio_history (id, deploy_id, timestamp_utc, portfolio_balance, portfolio_roi,
+                                       portfolio_roi_lev, BTC_close)
+        VALUES (1000, 3, '2100-01-01 00:00:00', 1.0, -0.5, -1.5, 1.0)
+    """)
+    own_db.execute("INSERT INTO deploys (id, timestamp_utc) VALUES (4, '2100-01-02 00:00:00')")
+    client.get("/deploys/3")
+
+    _, history, view = deploy_history.cached(3)
+    assert len(history) == 7
+    assert view["roi"][-1] == -0.5
+    assert deploy_history.cached(4) is None
@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def client(bench_db):
+    # Deploys sharing a second (and a microsecond) with others, so pages
+    # have to seek past exact timestamps and break ties on id
+    conn = sqlite3.connect(bench_db)
+    (last,) = conn.execute("SELECT MAX(timestamp_utc) FROM deploys").fetchone()
+    base = datetime.fromisoformat(last) + timedelta(hours=1)
+    (next_id,) = conn.execute("SELECT MAX(id) + 1 FROM deploys").fetchone()
+    stamps = [base, base, base.replace(microsecond=250000), base.replace(microsecond=250000),
+              base.replace(microsecond=999999), base + timedelta(seconds=1)]
+    conn.executemany(
+        "INSERT INTO deploys (id, timestamp_utc) VALUES (?, ?)",
+        [(next_id + i, ts.isoformat(" ")) for i, ts in enumerate(stamps)],
+    )
+    conn.commit()
+    conn.close()
+
+    import app
+    return app.app.test_client()
+
+
+def all_deploys(client):
+    body = client.get("/api/deploys?limit=500").get_json()
+    assert body["next"] is None
+    return [(d["id"], d["timestamp_utc"]) for d in body["deploys"]]
+
+
+def walk(client, limit):
+    seen, after = [], None
+    while True:
+        url = f"/api/deploys?limit={limit}" + (f"&after={after}" if after else "")
+        body = client.get(url).get_json()
+        seen += [(d["id"], d["timestamp_utc"]) for d in body["deploys"]]
+        after = body["next"]
+        if after is None:
+            return seen
+
+
+def test_single_page_is_newest_first(client):
+    rows = all_deploys(client)
+    keys = [(datetime.fromisoformat(ts), i) for i, ts in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 7])
+def test_pages_cover_every_deploy_once(client, limit):
+    assert walk(client, limit) == all_deploys(client)
+
+
+def test_cursor_keeps_microseconds(client):
+    import app
+    ts = datetime(2030, 1, 2, 3, 4, 5, 250000)
+    cursor = app.deploy_cursor({"timestamp_utc": ts, "id": 7})
+    assert app.parse_deploy_cursor(cursor) == (ts, 7)
+    whole = ts.replace(microsecond=0)
+    assert app.parse_deploy_cursor(app.deploy_cursor({"timestamp_utc": whole, "id": 7})) == (whole, 7)
+
+
+@pytest.mark.parametrize("cursor", ["x-1", "1700000000.25-1", "1700000000.abcdef-1", "1700000000-"])
+def test_bad_cursor_is_rejected(client, cursor):
+    assert client.get(f"/api/deploys?after={cursor}").status_code == 400
@@ -0,0 +1,155 @@
+"""
+The NumPy KPI engine against the per-row formulas /kpis and the deploy
+detail page used before it (kept here as the reference, with the ROI
+parser they used, app.parse_roi_decimal), on the benchdata dataset.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import db
+from app import parse_roi_decimal
+
+
+def reference_fund_kpis(rows, start_time):
+    for r in rows:
+        r["timestamp_utc"] = r["timestamp_utc"].replace(tzinfo=timezone.utc)
+
+    ts = [r["timestamp_utc"] for r in rows]
+    eq = [float(r["portfolio_value"]) for r in rows]
+    first_eq, last_eq, now_ts = eq[0], eq[-1], ts[-1]
+
+    def equity_at_or_before(target):
+        prior = [r for r in rows if r["timestamp_utc"] <= target]
+        return float(prior[-1]["portfolio_value"]) if prior else None
+
+    runtime_days = max(0, int((now_ts - start_time).total_seconds() // 86400))
+    total_return_pct = (last_eq / first_eq - 1) * 100
+    dpr = total_return_pct / runtime_days if runtime_days > 0 else None
+    wpr = dpr * 7 if dpr is not None else None
+    total_days = (now_ts - ts[0]).total_seconds() / 86400
+    apr = ((last_eq / first_eq) ** (365 / total_days) - 1) * 100 if total_days > 0 else None
+
+    sunday_offset = (now_ts.weekday() + 1) % 7
+    sunday_start = datetime(now_ts.year, now_ts.month, now_ts.day, tzinfo=timezone.utc) \
+        - timedelta(days=sunday_offset, hours=now_ts.hour, minutes=now_ts.minute)
+    eq_sunday = equity_at_or_before(sunday_start)
+
+    by_day = {}
+    for t, e in zip(ts, eq):
+        by_day[t.date()] = e
+    daily_vals = [by_day[d] for d in sorted(by_day)]
+    daily_returns = [(daily_vals[i] / daily_vals[i - 1] - 1) * 100 for i in range(1, len(daily_vals))]
+
+    eq_month = equity_at_or_before(datetime(now_ts.year, now_ts.month, 1, tzinfo=timezone.utc))
+
+    return {
+        "runtime_days": runtime_days,
+        "dpr_pct": dpr,
+        "wpr_pct": wpr,
+        "apr_pct": apr,
+        "rtw_dollars": last_eq - eq_sunday if eq_sunday else None,
+        "rtm_dollars": last_eq - eq_month if eq_month else None,
+        "equity": last_eq,
+        "lowest_daily_return": min(daily_returns) if daily_returns else None,
+        "eff_total_return_pct": (last_eq / 20000 - 1) * 100,
+        "eff_total_return": last_eq - 20000,
+    }
+
+
+def reference_deploy_kpis(rows):
+    balance = [float(r["portfolio_balance"]) for r in rows]
+    roi = [float(r["portfolio_roi"]) for r in rows]
+
+    initial_bal, final_bal = balance[0], balance[-1]
+    total_return_pct = ((final_bal / initial_bal) - 1) * 100 if initial_bal else 0
+
+    equity_curve = [1 + r for r in roi]
+    running_max = equity_curve[0]
+    max_dd = 0.0
+    for v in equity_curve:
+        if v > running_max:
+            running_max = v
+        dd = (v - running_max) / running_max
+        if dd < max_dd:
+            max_dd = dd
+
+    btc_vals = [float(r["BTC_close"]) for r in rows]
+    btc_perf_pct = ((btc_vals[-1] / btc_vals[0]) - 1) * 100 if btc_vals[0] else 0
+
+    roi_floats = np.array([float(x) for x in roi])
+
+    stop_loss_count = 0
+    for col in [c for c in rows[0].keys() if c.endswith("_roi")]:
+        normalized = parse_roi_decimal(rows[-1][col])
+        if normalized is not None and abs(normalized - -0.085) < 1e-6:
+            stop_loss_count += 1
+
+    return {
+        "total_return_pct": total_return_pct,
+        "max_dd_pct": max_dd * 100,
+        "btc_perf_pct": btc_perf_pct,
+        "volatility": float(np.std(roi_floats)),
+        "stop_loss_count": stop_loss_count,
+        "avg_roi_pct": float(np.mean(roi_floats)) * 100,
+        "lowest_roi_pct": min(roi) * 100,
+    }
+
+
+def assert_close(got, want):
+    assert got.keys() == want.keys()
+    for key, value in want.items():
+        if value is None:
+            assert got[key] is None, key
+        else:
+            assert got[key] == pytest.approx(value, rel=1e-9, abs=1e-9), key
+
+
+def test_fund_kpis_match_the_reference(bench_db):
+    import app
+    import kpis
+
+    rows = db.fetch_all("SELECT timestamp_utc, portfolio_value FROM investments_timeseries ORDER BY timestamp_utc")
+    want = reference_fund_kpis(rows, app.START_TIME)
+
+    epoch = np.array([kpis.epoch_of(r["timestamp_utc"]) for r in rows], dtype=np.int64)
+    eq = np.array([float(r["portfolio_value"]) for r in rows])
+    assert_close(kpis.fund_kpis(epoch, eq, app.START_TIME), want)
+
+    # What /kpis serves: the store's arrays, daily closes from the 1d rollup
+    assert_close(app.fund_kpi_result(), want)
+
+
+def test_deploy_kpis_match_the_reference(bench_db):
+    from deploy_history import DeployHistory, summarize
+
+    ids = [d["id"] for d in db.fetch_all("SELECT id FROM deploys ORDER BY id")]
+    histories = []
+    for deploy_id in ids:
+        sql = "SELECT * FROM portfolio_history WHERE deploy_id = %s ORDER BY timestamp_utc ASC"
+        rows = db.fetch_all(sql, (deploy_id,))
+        if not rows:
+            continue                # the detail page renders empty charts, no KPIs
+        want = reference_deploy_kpis(rows)
+        history = DeployHistory.from_columns(db.query_columns(sql, (deploy_id,)))
+        assert_close(history.kpis(), want)
+        histories.append((history, want))
+
+    summary = summarize([h for h, _ in histories])
+    for i, (_, want) in enumerate(histories):
+        assert_close({k: summary[k][i].item() for k in want}, want)
+
+
+def test_stop_losses_counted_like_the_reference():
+    from deploy_history import DeployHistory
+
+    # Bench deploys never end on the stop-loss level; these do, in every spelling
+    cells = ["-8.5%", "-8.50", -0.085, "-8.4%", None, "", "junk"]
+    row = {"timestamp_utc": datetime(2025, 1, 1), "portfolio_balance": 100.0, "portfolio_roi": 0.0,
+           "BTC_close": 1.0, **{f"a{i}_roi": c for i, c in enumerate(cells)}}
+    cols = {k: np.array([v], dtype=object if k.startswith("a") else None) for k, v in row.items()}
+    cols["timestamp_utc"] = cols["timestamp_utc"].astype("datetime64[s]")
+
+    history = DeployHistory.from_columns(cols)
+    assert history.stop_loss_count() == reference_deploy_kpis([row])["stop_loss_count"] == 3
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+
+import live
+
+
+class QuietStore:
+    def subscribe(self, fn):
+        pass
+
+    def refresh(self):
+        pass
+
+
+def next_event(q, timeout=2):
+    msg = q.get(timeout=timeout)
+    event, data = msg.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def wait_idle(feed, timeout=2):
+    deadline = time.monotonic() + timeout
+    while feed._thread is not None:
+        assert time.monotonic() < deadline, "watcher still running"
+        time.sleep(0.01)
+
+
+def test_first_client_gets_every_kpi():
+    feed = live.LiveFeed(QuietStore(), lambda: {"a": 1, "b": 2}, interval=0.01)
+    q = feed.subscribe()
+    assert next_event(q) == ("kpis", {"a": 1, "b": 2})
+    feed.unsubscribe(q)
+    wait_idle(feed)
+
+
+def test_client_after_idle_gets_fresh_kpis():
+    current = {"a": 1, "b": 2}
+    feed = live.LiveFeed(QuietStore(), lambda: dict(current), interval=0.01)
+    q = feed.subscribe()
+    assert next_event(q) == ("kpis", {"a": 1, "b": 2})
+    feed.unsubscribe(q)
+    wait_idle(feed)
+
+    # Changed while nobody was connected: no stale set on connect, and the
+    # new watcher doesn't skip its first drain
+    current["a"] = 5
+    q = feed.subscribe()
+    assert next_event(q) == ("kpis", {"a": 5, "b": 2})
+    feed.unsubscribe(q)
+    wait_idle(feed)
+
+
+def test_async_client_fed_from_the_watcher_thread():
+    feed = live.LiveFeed(QuietStore(), lambda: {"a": 1}, interval=0.01)
+
+    async def scenario():
+        q = feed.subscribe_async()
+        first = await asyncio.wait_for(q.get(), 2)
+
+        # A client too far behind is told to start over instead of queueing forever
+        q._deliver([live.sse("kpis", {"n": n}) for n in range(live.CLIENT_BACKLOG + 1)])
+        backlog = [q.get_nowait() for _ in range(q.qsize())]
+        feed.unsubscribe(q)
+        return first, backlog
+
+    first, backlog = asyncio.run(scenario())
+    assert first == live.sse("kpis", {"a": 1})
+    assert backlog[-1] == live.sse("reset", {})
+    wait_idle(feed)
+
+
+def test_dashboard_loads_the_feed_only_when_enabled(bench_db, monkeypatch):
+    import app
+
+    client = app.app.test_client()
+    for enabled in (False, True):
+        monkeypatch.setitem(app.app.config, "LIVE_UPDATES", enabled)
+        page = client.get("/").get_data(as_text=True)
+        assert ("assets/js/live.js" in page) == enabled
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import resample
+from conftest import TickStore, random_ticks
+from rollups import RollupPyramid
+
+NY = resample.parse_tz("America/New_York")
+
+# 2025-11-02 06:00 UTC: New York falls back from EDT (-4h) to EST (-5h)
+FALL_BACK = int(datetime(2025, 11, 2, 6, tzinfo=timezone.utc).timestamp())
+# 2025-03-09 07:00 UTC: New York springs forward from EST to EDT
+SPRING_FORWARD = int(datetime(2025, 3, 9, 7, tzinfo=timezone.utc).timestamp())
+
+
+def local_buckets(epoch, values, tz, interval):
+    """OHLC by local key, one datetime conversion per tick."""
+    out = {}
+    for t, v in zip(epoch.tolist(), values.tolist()):
+        if v != v:
+            continue
+        local = datetime.fromtimestamp(t, timezone.utc).astimezone(tz).replace(tzinfo=timezone.utc)
+        key = int(local.timestamp()) // interval * interval
+        if key not in out:
+            out[key] = {"open": v, "high": v, "low": v, "close": v, "count": 0}
+        b = out[key]
+        b["high"], b["low"], b["close"] = max(b["high"], v), min(b["low"], v), v
+        b["count"] += 1
+    return out
+
+
+@pytest.mark.parametrize("switch, before, after", [
+    (FALL_BACK, -4 * 3600, -5 * 3600),
+    (SPRING_FORWARD, -5 * 3600, -4 * 3600),
+])
+def test_offset_segments_split_at_the_switch(switch, before, after):
+    segs = resample.offset_segments(NY, switch - 86400, switch + 86400)
+    assert segs == [(switch - 86400, switch, before), (switch, switch + 86400, after)]
+
+
+def test_offset_segments_clip_to_range():
+    segs = resample.offset_segments(NY, FALL_BACK - 10, FALL_BACK + 10)
+    assert segs == [(FALL_BACK - 10, FALL_BACK, -4 * 3600), (FALL_BACK, FALL_BACK + 10, -5 * 3600)]
+    assert resample.offset_segments(NY, FALL_BACK + 10, FALL_BACK + 20) == [(FALL_BACK + 10, FALL_BACK + 20, -5 * 3600)]
+
+
+def test_local_offsets_per_tick():
+    epoch = np.array([FALL_BACK - 1, FALL_BACK, FALL_BACK + 1])
+    assert resample.local_offsets(NY, epoch).tolist() == [-4 * 3600, -5 * 3600, -5 * 3600]
+
+
+@pytest.fixture(scope="module")
+def pyramid():
+    store = TickStore()
+    store.push(*random_ticks(FALL_BACK - 2 * 86400, FALL_BACK + 2 * 86400))
+    pyramid = RollupPyramid(store, store.column)
+    store.reload()
+    return pyramid
+
+
+@pytest.mark.parametrize("interval", ["1m", "15m", "1h", "4h", "1d"])
+def test_fall_back_merges_repeated_local_keys(pyramid, interval):
+    seconds = resample.parse_interval(interval)
+    epoch, cols = pyramid.store.arrays()
+    got = resample.ohlc(pyramid, seconds, NY)
+
+    assert (np.diff(got["bucket"]) > 0).all()
+    want = local_buckets(epoch, cols[pyramid.column], NY, seconds)
+    assert got["bucket"].tolist() == sorted(want)
+    for f in ("open", "high", "low", "close", "count"):
+        assert got[f].tolist() == [want[k][f] for k in got["bucket"].tolist()], f
+
+
+def test_repeated_hour_holds_both_passes(pyramid):
+    epoch, cols = pyramid.store.arrays()
+    got = resample.ohlc(pyramid, 900, NY, FALL_BACK - 3600, FALL_BACK + 3600)
+    # 01:00-01:59 local happens twice: four 15m buckets, each spanning both passes
+    assert got["bucket"].size == 4
+    assert (got["first_ts"] < FALL_BACK).all() and (got["last_ts"] >= FALL_BACK).all()
+    inside = (epoch >= FALL_BACK - 3600) & (epoch < FALL_BACK + 3600)
+    assert got["count"].sum() == np.isfinite(cols[pyramid.column][inside]).sum()
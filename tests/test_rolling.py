@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import rolling
+from conftest import TickStore, random_ticks
+
+START = 1_700_000_000
+END = START + 3 * 86400
+WINDOWS = [3600, 6 * 3600, 86400]
+
+
+def naive(epoch, values, seconds):
+    """Every metric for every tick, one window at a time."""
+    v = rolling.ffill(values)
+    r = np.zeros(v.size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r[1:] = v[1:] / v[:-1] - 1
+    r[~np.isfinite(r)] = 0.0
+
+    out = {k: np.full(v.size, np.nan) for k in ("sharpe", "sortino", "volatility_pct", "drawdown_pct")}
+    for i in range(v.size):
+        lo = int(np.searchsorted(epoch, epoch[i] - seconds, "right"))
+        peak = np.fmax.reduce(v[lo:i + 1])
+        out["drawdown_pct"][i] = (v[i] / peak - 1) * 100
+        window = r[lo + 1:i + 1]
+        if window.size < 2:
+            continue
+        annualize = np.sqrt(window.size * rolling.YEAR / (epoch[i] - epoch[lo]))
+        std = window.std()
+        downside = np.sqrt(np.mean(np.minimum(window, 0) ** 2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out["sharpe"][i] = window.mean() / std * annualize
+            out["sortino"][i] = window.mean() / downside * annualize
+        out["volatility_pct"][i] = std * annualize * 100
+    for v in out.values():
+        v[~np.isfinite(v)] = np.nan
+    return out
+
+
+def assert_matches(view, epoch, values, seconds):
+    got = view.series(seconds, np.arange(epoch.size))
+    want = naive(epoch, values, seconds)
+    for key in want:
+        np.testing.assert_allclose(got[key], want[key], rtol=1e-6, atol=1e-9, err_msg=key)
+
+
+def ticks():
+    epoch, values = random_ticks(START, END, seed=25, step=120)
+    values[:3] = np.nan                    # leading NULLs: no base yet
+    return epoch, values
+
+
+@pytest.mark.parametrize("seconds", WINDOWS)
+def test_full_build_matches_naive(seconds):
+    epoch, values = ticks()
+    assert_matches(rolling.RollingView.of(epoch, values), epoch, values, seconds)
+
+
+@pytest.mark.parametrize("first", [5, 400, 1500])
+def test_incremental_appends_match_naive(first):
+    epoch, values = ticks()
+    store = TickStore()
+    store.push(epoch[:first], values[:first])
+    series = rolling.RollingSeries(store, store.column, windows=("1h", "6h", "1d"))
+    store.reload()
+
+    # Batches longer than the shorter windows, so new peaks look back past the published end
+    bounds = list(range(first, epoch.size, 97)) + [epoch.size]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        store.push(epoch[lo:hi], values[lo:hi])
+    for seconds in WINDOWS:
+        assert_matches(series.current(), epoch, values, seconds)
+
+
+def test_unpublished_tail_matches_naive():
+    epoch, values = ticks()
+    store = TickStore()
+    store.push(epoch[:300], values[:300])
+    series = rolling.RollingSeries(store, store.column, windows=("6h",))
+    store.reload()
+
+    # Ticks the leader hasn't folded in yet: current() computes them itself
+    store.epoch, store.values = epoch, values
+    for seconds in WINDOWS:
+        assert_matches(series.current(), epoch, values, seconds)
+
+
+def test_range_max_matches_max():
+    rng = np.random.default_rng(7)
+    values = rng.normal(size=2000)
+    values[rng.random(values.size) < 0.05] = np.nan
+    values[100:140] = np.nan               # ranges with nothing but NaN
+    lo = rng.integers(0, values.size, 5000)
+    hi = np.minimum(lo + rng.geometric(0.01, lo.size) - 1, values.size - 1)
+    lo = np.r_[lo, 0, 7, 100, 0]
+    hi = np.r_[hi, values.size - 1, 7, 139, 0]
+
+    want = [np.fmax.reduce(values[a:b + 1]) for a, b in zip(lo, hi)]
+    np.testing.assert_array_equal(rolling.range_max(values, lo, hi), want)
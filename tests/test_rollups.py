@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from conftest import TickStore, random_ticks
+from rollups import FIELDS, RollupPyramid, combine, from_ticks
+
+START = 1_700_000_000 // 86400 * 86400
+END = START + 5 * 86400 + 12_345          # ends mid-bucket at every level
+
+
+def brute(store, interval, since, until, offset):
+    epoch, values = store.epoch, store.values
+    keep = np.ones(epoch.size, bool)
+    if since is not None:
+        keep &= epoch >= since
+    if until is not None:
+        keep &= epoch < until
+    return combine(from_ticks(epoch[keep], values[keep]), interval, offset)
+
+
+def assert_same(got, want):
+    for f in FIELDS:
+        np.testing.assert_array_equal(got[f], want[f], err_msg=f)
+
+
+@pytest.fixture(scope="module")
+def pyramid():
+    store = TickStore()
+    store.push(*random_ticks(START, END, seed=1))
+    pyramid = RollupPyramid(store, store.column)
+    store.reload()
+    return pyramid
+
+
+@pytest.mark.parametrize("interval", [60, 300, 3600, 7200, 86400])
+@pytest.mark.parametrize("offset", [0, -5 * 3600, 19800])
+def test_ragged_ranges_match_ticks(pyramid, interval, offset):
+    rng = np.random.default_rng(abs(interval + offset))
+    edges = [None, START - 100, START, END, END + 100]
+    edges += rng.integers(START, END, size=6).tolist()
+    for since in edges:
+        for until in edges:
+            if since is not None and until is not None and until <= since:
+                continue
+            assert_same(pyramid.ohlc(interval, since, until, offset),
+                        brute(pyramid.store, interval, since, until, offset))
+
+
+def test_unpublished_levels_fall_back_to_ticks(pyramid):
+    store = TickStore()
+    store.push(pyramid.store.epoch, pyramid.store.values)
+    fresh = RollupPyramid(store, store.column)       # subscribed after the ticks: nothing published
+    assert all(level.buffer.view() is None for level in fresh.levels)
+    assert_same(fresh.ohlc(3600, START + 1234, END - 77), brute(store, 3600, START + 1234, END - 77, 0))
+
+
+def test_incremental_publish_matches_full_reset():
+    epoch, values = random_ticks(START, END, seed=2)
+    rng = np.random.default_rng(3)
+    cuts = np.sort(rng.choice(np.arange(1, epoch.size), size=40, replace=False))
+
+    grown = TickStore()
+    incremental = RollupPyramid(grown, grown.column)
+    for lo, hi in zip(np.r_[0, cuts], np.r_[cuts, epoch.size]):
+        grown.push(epoch[lo:hi], values[lo:hi])
+
+    full = TickStore()
+    full.push(epoch, values)
+    reloaded = RollupPyramid(full, full.column)
+    full.reload()
+
+    for a, b in zip(incremental.levels, reloaded.levels):
+        _, buckets_a, cols_a = a.buffer.view()
+        _, buckets_b, cols_b = b.buffer.view()
+        np.testing.assert_array_equal(buckets_a, buckets_b, err_msg=a.name)
+        for f in cols_b:
+            np.testing.assert_array_equal(cols_a[f], cols_b[f], err_msg=f"{a.name} {f}")
+    assert_same(incremental.ohlc(3600, START + 999), reloaded.ohlc(3600, START + 999))
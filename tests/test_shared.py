@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+
+from series import SeriesStore
+from shared import MIN_CAPACITY, SharedColumns
+
+NAMES = ["epoch", "value"]
+
+
+def rows(start, n):
+    epoch = np.arange(start, start + n, dtype=np.int64)
+    return epoch, {"value": epoch.astype(np.float64)}
+
+
+def test_views_while_the_writer_resets_and_grows(tmp_path):
+    buf = SharedColumns(str(tmp_path / "series"), NAMES)
+    assert buf.try_lead()
+    buf.reset(*rows(0, 10), resets=1)
+
+    stop, errors = threading.Event(), []
+
+    def read():
+        while not stop.is_set():
+            try:
+                _, epoch, cols = buf.view()
+                assert np.array_equal(epoch, np.arange(epoch.size))
+                assert np.array_equal(cols["value"], epoch)
+            except Exception as e:             # noqa: BLE001 - reported below
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for t in readers:
+        t.start()
+    try:
+        n = 10
+        # Appends past the capacity swap files; resets swap them outright
+        for step in range(60):
+            if step % 20 == 19:
+                buf.reset(*rows(0, n), resets=step)
+            m = MIN_CAPACITY // 7
+            buf.append(*rows(n, m))
+            n += m
+    finally:
+        stop.set()
+        for t in readers:
+            t.join()
+
+    assert not errors, errors[0]
+    assert buf.view()[1].size == n
+
+
+def test_leader_takes_over_a_published_file_writable(tmp_path):
+    path = str(tmp_path / "series")
+    old = SharedColumns(path, NAMES)
+    old.reset(*rows(0, 10), resets=3)
+
+    # The lock holder finds the old leader's file and keeps appending to it
+    new = SharedColumns(path, NAMES)
+    assert new.try_lead()
+    assert new.view()[0] == 3
+    new.append(*rows(10, 5))
+    _, epoch, cols = SharedColumns(path, NAMES).view()
+    np.testing.assert_array_equal(epoch, np.arange(15))
+    np.testing.assert_array_equal(cols["value"], np.arange(15.0))
+
+
+def test_failing_listener_does_not_starve_the_rest(caplog):
+    store = SeriesStore("t", ["timestamp_utc", "value"])
+    seen = []
+
+    def broken(epoch, cols, reset):
+        raise RuntimeError("boom")
+
+    store.subscribe(broken)
+    store.subscribe(lambda epoch, cols, reset: seen.append(reset))
+    store._notify(*rows(0, 3), True)
+
+    assert seen == [True]
+    assert "series listener (t)" in caplog.text